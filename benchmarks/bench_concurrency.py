@@ -0,0 +1,244 @@
+"""
+Sync (WSGI) vs async (ASGI) throughput under I/O-bound load.
+
+Drives Django's real WSGIHandler and ASGIHandler in-process -- no sockets,
+no test client -- with the same number of concurrent clients:
+
+* sync:  the sync views behind ``--workers`` worker slots, like gunicorn
+         sync workers; a client waits for a free worker.
+* async: ``core.async_views`` on one event loop, like a single uvicorn
+         worker; every request in flight gets its own DB thread.
+
+Every SQL query sleeps ``--db-latency-ms`` first to stand in for the network
+round trip to a remote database (the local SQLite test DB answers in
+microseconds, which would make the run CPU-bound). The page cache is off so
+each request does its queries.
+
+Expect the async run to win only while waiting dominates: at a few ms per
+query both modes are limited by rendering on one core (the GIL), and the
+sync run comes out ahead. Raise the latency to see where async pays off.
+
+Usage:
+    python -m benchmarks.bench_concurrency [--scale small] [--requests 200] [--clients 32]
+                                           [--workers 4] [--db-latency-ms 20] [--no-save]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mmsafaris.settings')
+django.setup()
+
+from django.core.handlers.asgi import ASGIHandler  # noqa: E402
+from django.core.handlers.wsgi import WSGIHandler  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from benchmarks.bench_views import RESULTS_DIR  # noqa: E402
+from benchmarks.fixtures import SCALES, generate  # noqa: E402
+from core import async_views, prerender, views  # noqa: E402
+from core.models import Tour  # noqa: E402
+from core.urls import page_patterns  # noqa: E402
+
+
+def urlconf(name, pages):
+    module = types.ModuleType(name)
+    module.urlpatterns = page_patterns(pages)
+    return module
+
+
+SYNC_URLCONF = urlconf('bench_sync_urls', views)
+ASYNC_URLCONF = urlconf('bench_async_urls', async_views)
+
+
+def build_scenarios():
+    tour = Tour.objects.order_by('pk').first()
+    return {
+        'home': reverse('home'),
+        'tours': reverse('tours'),
+        'tours_search': f"{reverse('tours')}?q=elephants+camp",
+        'tour_detail': tour.get_absolute_url(),
+        'booking_get': reverse('booking', args=[tour.slug]),
+    }
+
+
+def add_db_latency(seconds):
+    def slow_query(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(slow_query)
+
+    # Every thread opens its own connection; the main thread's stays fast.
+    connection_created.connect(install, weak=False)
+
+
+def summarise(timings, wall):
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'rps': round(len(timings) / wall, 1),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(cuts[94], 2),
+    }
+
+
+# --- Sync: WSGI handler behind N worker slots --------------------------------
+
+def run_sync(path, requests, clients, workers):
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    slots = threading.BoundedSemaphore(workers)
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    def one(_):
+        environ = factory.get(path).environ
+        started = time.perf_counter()
+        with slots:
+            response = handler(environ, start_response)
+            b''.join(response)
+            response.close()
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        timings = list(pool.map(one, range(requests)))
+    return summarise(timings, time.perf_counter() - started), set(statuses)
+
+
+# --- Async: ASGI handler on one event loop -----------------------------------
+
+async def _asgi_get(handler, path):
+    url = urlsplit(path)
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'root_path': '',
+        'path': url.path, 'raw_path': url.path.encode(), 'query_string': url.query.encode(),
+        'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    body_sent = False
+    status = None
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Future()  # the client never disconnects
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await handler(scope, receive, send)
+    return status
+
+
+async def run_async(path, requests, clients):
+    handler = ASGIHandler()
+    in_flight = asyncio.Semaphore(clients)
+    statuses = set()
+
+    async def one():
+        async with in_flight:
+            started = time.perf_counter()
+            statuses.add(await _asgi_get(handler, path))
+            return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    timings = await asyncio.gather(*(one() for _ in range(requests)))
+    return summarise(timings, time.perf_counter() - started), statuses
+
+
+def report(results):
+    header = f"{'scenario':<16}{'sync req/s':>12}{'async req/s':>13}{'speedup':>9}{'sync p95':>11}{'async p95':>11}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        sync, async_ = r['sync'], r['async']
+        speedup = async_['rps'] / sync['rps'] if sync['rps'] else 0
+        print(
+            f"{name:<16}{sync['rps']:>12}{async_['rps']:>13}{speedup:>8.1f}x"
+            f"{sync['p95_ms']:>9.1f}ms{async_['p95_ms']:>9.1f}ms"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and mode')
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent clients')
+    parser.add_argument('--workers', type=int, default=4, help='Sync worker slots')
+    parser.add_argument('--db-latency-ms', type=float, default=20.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', help='Comma-separated scenario names')
+    parser.add_argument('--no-save', action='store_true', help="Don't write a results file")
+    args = parser.parse_args(argv)
+
+    setup_test_environment()
+    override_settings(
+        STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    ).enable()
+    prerender.PRERENDER_DIR = Path(tempfile.mkdtemp())  # measure the views, not snapshots
+    # Test databases for every alias; the replica alias mirrors the primary.
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        generate(**SCALES[args.scale], seed=args.seed)
+        scenarios = build_scenarios()
+        if args.only:
+            wanted = set(args.only.split(','))
+            scenarios = {name: path for name, path in scenarios.items() if name in wanted}
+        add_db_latency(args.db_latency_ms / 1000)
+
+        results = {}
+        for name, path in scenarios.items():
+            with override_settings(ROOT_URLCONF=SYNC_URLCONF):
+                sync, sync_statuses = run_sync(path, args.requests, args.clients, args.workers)
+            with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+                async_, async_statuses = asyncio.run(run_async(path, args.requests, args.clients))
+            if sync_statuses | async_statuses != {200}:
+                raise SystemExit(f'{name}: unexpected status {sync_statuses | async_statuses}')
+            results[name] = {'sync': sync, 'async': async_}
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    print(f'{args.clients} clients, {args.workers} sync workers, {args.db_latency_ms}ms per query')
+    report(results)
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = RESULTS_DIR / f'{stamp}-concurrency.json'
+        path.write_text(json.dumps({
+            'scale': args.scale, 'requests': args.requests, 'clients': args.clients,
+            'workers': args.workers, 'db_latency_ms': args.db_latency_ms,
+            'database': connection.vendor, 'scenarios': results,
+        }, indent=2))
+        print(f'Saved {path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""
+Micro-benchmarks and query budgets for every public view.
+
+Runs each scenario through Django's test client against a throwaway test
+database filled by ``benchmarks.fixtures`` and reports latency percentiles,
+throughput and query counts. Results are saved as JSON under
+``benchmarks/results/`` and compared with the previous run at the same scale.
+
+Usage:
+    python -m benchmarks.bench_views [--scale small|medium|large] [--iterations 50]
+                                     [--only tours,tour_detail] [--no-save]
+
+Exits non-zero if any scenario issues more queries than its budget.
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mmsafaris.settings')
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases,
+)
+from django.urls import reverse  # noqa: E402
+
+from benchmarks.fixtures import SCALES, generate  # noqa: E402
+from core import prerender, selectors, throttling  # noqa: E402
+from core.models import Tour  # noqa: E402
+from core.pagination import KeysetPaginator  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+class Scenario:
+    def __init__(self, name, path, budget, method='get', data=None, cached=False, headers=None):
+        self.name = name
+        self.path = path            # str or callable(iteration) -> str
+        self.budget = budget        # max queries per request
+        self.method = method
+        self.data = data            # dict or callable(iteration) -> dict
+        self.cached = cached        # keep the page cache warm between iterations
+        self.headers = headers or {}
+
+    def resolve(self, value, i):
+        return value(i) if callable(value) else value
+
+
+def build_scenarios():
+    tour = Tour.objects.order_by('pk').first()
+    detail_url = tour.get_absolute_url()
+    deep_cursor = _cursor_after(600)
+    booking_date = datetime.date.today() + datetime.timedelta(days=400)
+
+    def booking_data(i):
+        return {
+            'full_name': f'Bench {i}', 'email': f'bench{i}@example.com', 'phone': '+254700000000',
+            'number_of_people': 1, 'preferred_date': booking_date + datetime.timedelta(days=i),
+        }
+
+    def contact_data(i):
+        return {'name': f'Bench {i}', 'email': f'bench{i}@example.com', 'subject': 'Hi', 'message': 'Hello'}
+
+    api_detail = reverse('api_tour_detail', args=[tour.slug])
+    etag = Client().get(api_detail)['ETag']
+
+    return [
+        Scenario('home', reverse('home'), budget=1),
+        Scenario('home_cached', reverse('home'), budget=0, cached=True),
+        Scenario('tours', reverse('tours'), budget=2),
+        Scenario('tours_filtered', f"{reverse('tours')}?difficulty=easy&max_price=4000", budget=2),
+        Scenario('tours_faceted', f"{reverse('tours')}?min_price=2000&max_price=3999.99&min_days=4&max_days=7&group_size=4",
+                 budget=2),
+        Scenario('tours_search', f"{reverse('tours')}?q=elephants+camp", budget=3),
+        Scenario('tours_deep_page', f"{reverse('tours_page')}?cursor={deep_cursor}", budget=1),
+        Scenario('tour_detail', detail_url, budget=3),
+        Scenario('tour_detail_cached', detail_url, budget=0, cached=True),
+        Scenario('booking_get', reverse('booking', args=[tour.slug]), budget=1),
+        Scenario('booking_post', reverse('booking', args=[tour.slug]), budget=16, method='post', data=booking_data),
+        Scenario('about', reverse('about'), budget=0),
+        Scenario('contact_get', reverse('contact'), budget=0),
+        Scenario('contact_post', reverse('contact'), budget=4, method='post', data=contact_data),
+        Scenario('api_list', reverse('api_tour_list'), budget=2),
+        Scenario('api_detail', api_detail, budget=4),
+        Scenario('api_detail_304', api_detail, budget=1, headers={'HTTP_IF_NONE_MATCH': etag}),
+    ]
+
+
+def _cursor_after(n):
+    queryset, ordering = selectors.filtered_tours({})
+    paginator = KeysetPaginator(queryset, ordering, per_page=1)
+    obj = queryset.order_by(*ordering)[min(n, queryset.count() - 1)]
+    return paginator.encode_cursor(obj)
+
+
+def run_scenario(scenario, iterations, warmup=3):
+    client = Client()
+    timings = []
+    queries = []
+    status = None
+    for i in range(warmup + iterations):
+        if not scenario.cached:
+            cache.clear()
+        path = scenario.resolve(scenario.path, i)
+        data = scenario.resolve(scenario.data, i)
+        request = getattr(client, scenario.method)
+        # Catalogue reads go to the replica alias, everything else to default.
+        with ExitStack() as stack:
+            captures = [stack.enter_context(CaptureQueriesContext(conn)) for conn in connections.all()]
+            start = time.perf_counter()
+            response = request(path, data, **scenario.headers) if data else request(path, **scenario.headers)
+            elapsed = time.perf_counter() - start
+        status = response.status_code
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(sum(len(ctx.captured_queries) for ctx in captures))
+
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'status': status,
+        'iterations': iterations,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(cuts[94], 3),
+        'p99_ms': round(cuts[98], 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'rps': round(1000 / statistics.fmean(timings), 1),
+        'queries': max(queries),
+        'budget': scenario.budget,
+    }
+
+
+def previous_results(scale):
+    runs = sorted(RESULTS_DIR.glob(f'*-{scale}.json'))
+    if not runs:
+        return None, None
+    return runs[-1].name, json.loads(runs[-1].read_text())
+
+
+def report(results, baseline):
+    header = f"{'scenario':<20}{'status':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'req/s':>9}{'queries':>9}  vs prev p50"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        delta = ''
+        prev = (baseline or {}).get('scenarios', {}).get(name)
+        if prev and prev['p50_ms']:
+            delta = f"{(r['p50_ms'] - prev['p50_ms']) / prev['p50_ms'] * 100:+.1f}%"
+        flag = '' if r['queries'] <= r['budget'] else f" OVER BUDGET ({r['budget']})"
+        print(
+            f"{name:<20}{r['status']:>7}{r['p50_ms']:>9.2f}ms{r['p95_ms']:>8.2f}ms{r['p99_ms']:>8.2f}ms"
+            f"{r['rps']:>9}{r['queries']:>9}{flag}  {delta}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', help='Comma-separated scenario names')
+    parser.add_argument('--no-save', action='store_true', help="Don't write a results file")
+    args = parser.parse_args(argv)
+
+    setup_test_environment()
+    # Hashed static names need collectstatic; benchmarks measure views, not assets.
+    override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage').enable()
+    # The POST scenarios repeat one submission far past the spam limits.
+    throttling.THROTTLE_ENABLED = False
+    # Measure the views, not snapshots a local prerender_pages run left behind.
+    prerender.PRERENDER_DIR = Path(tempfile.mkdtemp())
+    # Test databases for every alias; the replica alias mirrors the primary.
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        started = time.perf_counter()
+        generate(**SCALES[args.scale], seed=args.seed)
+        print(f'Generated {args.scale} dataset in {time.perf_counter() - started:.1f}s')
+
+        scenarios = build_scenarios()
+        if args.only:
+            wanted = set(args.only.split(','))
+            scenarios = [s for s in scenarios if s.name in wanted]
+        results = {s.name: run_scenario(s, args.iterations) for s in scenarios}
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    baseline_name, baseline = previous_results(args.scale)
+    if baseline_name:
+        print(f'Comparing with {baseline_name}')
+    report(results, baseline)
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = RESULTS_DIR / f'{stamp}-{args.scale}.json'
+        path.write_text(json.dumps({
+            'scale': args.scale, 'dataset': SCALES[args.scale], 'iterations': args.iterations,
+            'database': connection.vendor, 'scenarios': results,
+        }, indent=2))
+        print(f'Saved {path}')
+
+    return 1 if any(r['queries'] > r['budget'] for r in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
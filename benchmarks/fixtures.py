@@ -0,0 +1,94 @@
+"""
+Synthetic catalogue data at benchmark scale.
+
+    from benchmarks.fixtures import SCALES, generate
+    generate(**SCALES['medium'], seed=42)
+
+Everything is written with ``bulk_create`` (which skips model signals), so the
+derived stores -- full-text index, departure seat counters and tour stats -- are rebuilt
+explicitly at the end.
+"""
+import datetime
+import random
+
+from django.db import transaction
+from django.utils import timezone
+
+from core import availability, search, stats
+from core.models import Booking, ItineraryDay, Tour, TourImage
+
+SCALES = {
+    'small': {'tours': 200, 'days_per_tour': 5, 'images_per_tour': 2, 'bookings': 2_000},
+    'medium': {'tours': 2_000, 'days_per_tour': 10, 'images_per_tour': 3, 'bookings': 20_000},
+    'large': {'tours': 5_000, 'days_per_tour': 12, 'images_per_tour': 4, 'bookings': 200_000},
+}
+
+PLACES = [
+    'Maasai Mara', 'Serengeti', 'Amboseli', 'Tsavo', 'Samburu', 'Lake Nakuru',
+    'Ngorongoro', 'Bwindi', 'Mount Kenya', 'Lamu', 'Zanzibar', 'Laikipia',
+]
+THEMES = ['Migration', 'Big Five', 'Photography', 'Family', 'Honeymoon', 'Walking', 'Birding', 'Trek']
+WORDS = (
+    'wildlife lions elephants giraffes zebra leopard cheetah rhino buffalo sunrise '
+    'game drive camp lodge river crossing savannah crater forest guide bush dinner'
+).split()
+BATCH_SIZE = 2000
+
+
+def _sentence(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize() + '.'
+
+
+@transaction.atomic
+def generate(tours, days_per_tour, images_per_tour, bookings, seed=42):
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    tour_objs = []
+    for i in range(tours):
+        name = f'{rng.choice(PLACES)} {rng.choice(THEMES)} Safari {i}'
+        tour_objs.append(Tour(
+            name=name,
+            slug=f'bench-tour-{i}',
+            description=' '.join(_sentence(rng, 20) for _ in range(15)),
+            duration_days=rng.randint(2, 14),
+            price=rng.randrange(800, 9000, 50),
+            difficulty=rng.choice(['easy', 'moderate', 'challenging']),
+            max_group_size=rng.randint(4, 16),
+            featured=rng.random() < 0.05,
+        ))
+    tour_objs = Tour.objects.bulk_create(tour_objs, batch_size=BATCH_SIZE)
+    # created_at is auto_now_add; spread it out so listing order is realistic.
+    for i, tour in enumerate(tour_objs):
+        tour.created_at = now - datetime.timedelta(minutes=i)
+    Tour.objects.bulk_update(tour_objs, ['created_at'], batch_size=BATCH_SIZE)
+
+    ItineraryDay.objects.bulk_create((
+        ItineraryDay(
+            tour=tour, day_number=day, title=f'Day {day}: {rng.choice(PLACES)}',
+            description=_sentence(rng, 40), accommodation=f'{rng.choice(PLACES)} Camp', meals='B, L, D',
+        )
+        for tour in tour_objs for day in range(1, days_per_tour + 1)
+    ), batch_size=BATCH_SIZE)
+
+    TourImage.objects.bulk_create((
+        TourImage(tour=tour, image=f'tours/gallery/bench-{tour.pk}-{n}.jpg', caption=_sentence(rng, 4))
+        for tour in tour_objs for n in range(images_per_tour)
+    ), batch_size=BATCH_SIZE)
+
+    statuses = [s for s, _ in Booking.STATUS_CHOICES]
+    today = datetime.date.today()
+    Booking.objects.bulk_create((
+        Booking(
+            tour=rng.choice(tour_objs), full_name=f'Guest {n}', email=f'guest{n}@example.com',
+            phone=f'+2547{rng.randint(10000000, 99999999)}', number_of_people=rng.randint(1, 4),
+            preferred_date=today + datetime.timedelta(days=rng.randint(-365, 365)),
+            status=rng.choice(statuses),
+        )
+        for n in range(bookings)
+    ), batch_size=BATCH_SIZE)
+
+    search.rebuild_index(Tour.objects.prefetch_related('itinerary').iterator(chunk_size=500))
+    availability.rebuild_departures()
+    stats.rebuild_stats()
+    return tour_objs
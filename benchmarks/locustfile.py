@@ -0,0 +1,61 @@
+"""
+Load-test scenario for the public site (requires `pip install locust`).
+
+Start the app, e.g. with gunicorn as on Render:
+    python manage.py populate_db
+    gunicorn mmsafaris.wsgi --workers 4
+
+then drive it headless and keep the percentile/throughput CSVs for comparison:
+    locust -f benchmarks/locustfile.py --host http://127.0.0.1:8000 \\
+        --headless -u 50 -r 10 -t 2m --csv benchmarks/results/load-$(date +%Y%m%d-%H%M%S)
+
+The *_stats.csv file has p50/p95/p99 latency and requests/s per endpoint.
+"""
+import random
+
+from locust import HttpUser, between, task
+
+SEARCH_TERMS = ['mara', 'elephants', 'migration', 'gorilla', 'beach', 'photography', 'kilimanjaro']
+
+
+class Visitor(HttpUser):
+    """Anonymous browsing mix: mostly catalogue reads, occasional enquiries."""
+
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        data = self.client.get('/api/v1/tours/?limit=100', name='/api/v1/tours/').json()
+        self.slugs = [tour['slug'] for tour in data['results']] or ['missing']
+
+    @task(4)
+    def home(self):
+        self.client.get('/')
+
+    @task(6)
+    def tours(self):
+        self.client.get('/tours/')
+
+    @task(3)
+    def search(self):
+        self.client.get('/tours/', params={'q': random.choice(SEARCH_TERMS)}, name='/tours/?q=')
+
+    @task(2)
+    def filter(self):
+        self.client.get('/tours/', params={'difficulty': random.choice(['easy', 'moderate', 'challenging'])},
+                        name='/tours/?difficulty=')
+
+    @task(8)
+    def tour_detail(self):
+        self.client.get(f'/tours/{random.choice(self.slugs)}/', name='/tours/[slug]/')
+
+    @task(2)
+    def api_detail(self):
+        self.client.get(f'/api/v1/tours/{random.choice(self.slugs)}/', name='/api/v1/tours/[slug]/')
+
+    @task(1)
+    def about(self):
+        self.client.get('/about/')
+
+    @task(1)
+    def contact(self):
+        self.client.get('/contact/')
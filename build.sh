@@ -4,8 +4,15 @@ set -o errexit
 
 pip install -r requirements.txt
 
-# Convert static assets
+# Self-host third-party CSS/JS/fonts, then bundle + minify (core/assets.py)
+python3 manage.py vendor_assets
+python3 manage.py build_assets
+
+# Convert static assets (hashed names + gzip/brotli, served by WhiteNoise)
 python3 manage.py collectstatic --no-input
 
 # Apply any outstanding database migrations
-python3 manage.py migrate
\ No newline at end of file
+python3 manage.py migrate
+
+# Static snapshots of the catalogue pages for anonymous visitors and crawlers
+python3 manage.py prerender_pages --full
@@ -1,8 +1,23 @@
 # ============================================
 # core/admin.py
 # ============================================
-from django.contrib import admin
-from .models import Tour, Booking, ContactMessage, TourImage, ItineraryDay
+import datetime
+import json
+
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_POST
+
+from . import dashboard, exports, transitions, uploads
+from .models import (
+    Tour, Booking, BookingStatusChange, ContactMessage, TourImage, ItineraryDay, OutboundEmail, Departure,
+    ArchivedBooking, ArchivedContactMessage,
+)
 
 class TourImageInline(admin.TabularInline):
     model = TourImage
@@ -12,22 +27,241 @@ class ItineraryDayInline(admin.StackedInline):
     model = ItineraryDay
     extra = 1
 
+class TourAdminForm(forms.ModelForm):
+    """Tour form plus the tokens of images uploaded straight to S3 (core.uploads)."""
+    image_upload = forms.CharField(widget=forms.HiddenInput, required=False)
+    gallery_uploads = forms.CharField(widget=forms.HiddenInput, required=False)
+
+    class Meta:
+        model = Tour
+        fields = '__all__'
+
+    def clean_image_upload(self):
+        token = self.cleaned_data['image_upload']
+        return uploads.verify(token, 'tour') if token else ''
+
+    def clean_gallery_uploads(self):
+        names, errors = [], []
+        for token in self.cleaned_data['gallery_uploads'].split():
+            try:
+                names.append(uploads.verify(token, 'gallery'))
+            except ValidationError as exc:
+                errors.extend(exc.messages)
+        if errors:
+            raise ValidationError(errors)
+        return names
+
 @admin.register(Tour)
 class TourAdmin(admin.ModelAdmin):
+    form = TourAdminForm
     list_display = ['name', 'duration_days', 'price', 'difficulty', 'featured']
     list_filter = ['difficulty', 'featured']
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
     inlines = [TourImageInline, ItineraryDayInline]
 
+    def get_urls(self):
+        urls = [
+            path('uploads/sign/', self.admin_site.admin_view(self.sign_uploads_view), name='core_tour_sign_uploads'),
+        ]
+        return urls + super().get_urls()
+
+    def render_change_form(self, request, context, *args, **kwargs):
+        context['direct_uploads'] = uploads.direct_uploads_enabled()
+        return super().render_change_form(request, context, *args, **kwargs)
+
+    # With media on S3 the browser uploads images straight to the bucket:
+    # this hands out one presigned POST per file, the form gets back tokens.
+    @method_decorator(require_POST)
+    def sign_uploads_view(self, request):
+        if not self.has_change_permission(request) and not self.has_add_permission(request):
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+        if not uploads.direct_uploads_enabled():
+            return JsonResponse({'error': 'Direct uploads need S3 media storage'}, status=400)
+        try:
+            payload = json.loads(request.body)
+            files = [(str(f['name']), str(f['type'])) for f in payload['files']]
+            kind = payload['kind']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'Expected {"kind": ..., "files": [{"name", "type"}, ...]}'}, status=400)
+        try:
+            signed = [uploads.presign(kind, name, content_type) for name, content_type in files]
+        except ValidationError as exc:
+            return JsonResponse({'error': ' '.join(exc.messages)}, status=400)
+        return JsonResponse({'uploads': signed})
+
+    def save_model(self, request, obj, form, change):
+        if form.cleaned_data.get('image_upload'):
+            obj.image.name = form.cleaned_data['image_upload']
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        for name in form.cleaned_data.get('gallery_uploads') or []:
+            TourImage.objects.create(tour=form.instance, image=name)
+
+class TourListFilter(admin.SimpleListFilter):
+    """Filter by tour from (pk, name) pairs instead of instantiating every Tour."""
+    title = 'tour'
+    parameter_name = 'tour__id__exact'
+
+    def lookups(self, request, model_admin):
+        return Tour.objects.order_by('name').values_list('pk', 'name')
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(tour_id=self.value())
+        return queryset
+
+class BookingStatusChangeInline(admin.TabularInline):
+    model = BookingStatusChange
+    fields = readonly_fields = ['from_status', 'to_status', 'changed_by', 'changed_at']
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
     list_display = ['full_name', 'tour', 'preferred_date', 'number_of_people', 'status', 'created_at']
-    list_filter = ['status', 'tour', 'preferred_date']
+    # status/preferred_date filters and the default ordering are backed by indexes
+    list_filter = ['status', TourListFilter, 'preferred_date']
     search_fields = ['full_name', 'email']
-    list_editable = ['status']
+    list_select_related = ['tour']
+    # Skip the unfiltered COUNT(*) over the whole table on every changelist page
+    show_full_result_count = False
+    autocomplete_fields = ['tour']
+    inlines = [BookingStatusChangeInline]
+    # Status changes go through the transition actions (core.transitions):
+    # one UPDATE for the whole selection instead of a save() per edited row.
+    actions = ['confirm', 'mark_paid', 'complete', 'cancel', 'export_csv', 'export_parquet']
+
+    def get_urls(self):
+        urls = [
+            path('dashboard/', self.admin_site.admin_view(self.dashboard_view), name='core_booking_dashboard'),
+        ]
+        return urls + super().get_urls()
+
+    def dashboard_view(self, request):
+        """Revenue, travellers and occupancy per tour and month."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        start, end = dashboard.month_window()
+        try:
+            if request.GET.get('start'):
+                start = datetime.date.fromisoformat(request.GET['start']).replace(day=1)
+            if request.GET.get('end'):
+                end = datetime.date.fromisoformat(request.GET['end']).replace(day=1)
+        except ValueError:
+            return HttpResponseBadRequest('start and end must be dates (YYYY-MM-DD).')
+        if start > end:
+            return HttpResponseBadRequest('start must not be after end.')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Bookings dashboard',
+            **dashboard.booking_dashboard(start, end, refresh='refresh' in request.GET),
+        }
+        return TemplateResponse(request, 'admin/core/booking/dashboard.html', context)
+
+    # Filter the changelist (status, travel date, tour), tick "select all" and
+    # the whole result set is streamed -- it is never loaded into memory.
+    def _export(self, request, queryset, fmt):
+        try:
+            chunks = exports.export_bookings(fmt, exports.booking_rows(queryset))
+        except exports.ExportError as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return None
+        response = StreamingHttpResponse(chunks, content_type=exports.FORMATS[fmt][0])
+        response['Content-Disposition'] = f'attachment; filename="{exports.export_filename(fmt)}"'
+        return response
+
+    @admin.action(description='Export selected bookings as CSV')
+    def export_csv(self, request, queryset):
+        return self._export(request, queryset, 'csv')
+
+    @admin.action(description='Export selected bookings as Parquet')
+    def export_parquet(self, request, queryset):
+        return self._export(request, queryset, 'parquet')
+
+    def _transition(self, request, queryset, name):
+        transition = transitions.TRANSITIONS[name]
+        result = transitions.apply(name, queryset, user=request.user)
+        target = dict(Booking.STATUS_CHOICES)[transition.target]
+        self.message_user(request, f'{result.moved} bookings moved to {target}.', messages.SUCCESS)
+        if result.skipped:
+            sources = ', '.join(dict(Booking.STATUS_CHOICES)[status] for status in transition.sources)
+            self.message_user(
+                request, f'{result.skipped} bookings skipped: only {sources} bookings can be moved to {target}.',
+                messages.WARNING,
+            )
+
+    @admin.action(description='Confirm selected pending bookings', permissions=['change'])
+    def confirm(self, request, queryset):
+        self._transition(request, queryset, 'confirm')
+
+    @admin.action(description='Mark selected bookings as paid', permissions=['change'])
+    def mark_paid(self, request, queryset):
+        self._transition(request, queryset, 'mark_paid')
+
+    @admin.action(description='Mark selected bookings as completed', permissions=['change'])
+    def complete(self, request, queryset):
+        self._transition(request, queryset, 'complete')
+
+    @admin.action(description='Cancel selected bookings', permissions=['change'])
+    def cancel(self, request, queryset):
+        self._transition(request, queryset, 'cancel')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data:
+            BookingStatusChange.objects.create(
+                booking=obj, from_status=form.initial['status'], to_status=obj.status, changed_by=request.user,
+            )
+
+@admin.register(Departure)
+class DepartureAdmin(admin.ModelAdmin):
+    list_display = ['tour', 'date', 'capacity', 'seats_taken', 'seats_left']
+    list_filter = ['date']
+    list_select_related = ['tour']
+    # seats_taken is maintained from bookings; only capacity is meant to be edited
+    readonly_fields = ['seats_taken']
+    date_hierarchy = 'date'
 
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
     list_display = ['name', 'email', 'subject', 'created_at']
-    search_fields = ['name', 'email', 'subject']
\ No newline at end of file
+    search_fields = ['name', 'email', 'subject']
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['subject', 'recipients']
+    readonly_fields = ['created_at', 'sent_at', 'last_error']
+
+class ReadOnlyArchiveAdmin(admin.ModelAdmin):
+    """Archived rows (core.archive) can be searched and viewed, never edited."""
+    show_full_result_count = False
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(ReadOnlyArchiveAdmin):
+    list_display = ['full_name', 'tour_name', 'preferred_date', 'number_of_people', 'status', 'created_at']
+    list_filter = ['status']
+    search_fields = ['full_name', 'email', 'tour_name']
+
+@admin.register(ArchivedContactMessage)
+class ArchivedContactMessageAdmin(ReadOnlyArchiveAdmin):
+    list_display = ['name', 'email', 'subject', 'created_at']
+    search_fields = ['name', 'email', 'subject']
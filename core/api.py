@@ -0,0 +1,207 @@
+# ============================================
+# core/api.py
+# ============================================
+"""
+Read-only JSON API for the catalogue (v1).
+
+    GET /api/v1/tours/?q=&difficulty=&min_price=&max_price=&min_days=&max_days=&group_size=&sort=&cursor=&limit=
+    GET /api/v1/tours/<slug>/
+
+Both endpoints send strong ETags and Last-Modified derived from
+``Tour.updated_at`` (which is touched whenever a tour's itinerary or gallery
+changes) and the catalogue cache version (bumped by any catalogue change,
+including image derivative backfills; ``sort=popular`` lists also follow
+``TourStats`` changes), so clients and CDNs can revalidate with a cheap
+conditional GET and get ``304 Not Modified`` back without the payload
+being built.
+"""
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
+
+from . import images, selectors, stats
+from .cache import CATALOGUE_MODIFIED_KEY, catalogue_version
+from .models import Tour
+from .pagination import InvalidCursor, KeysetPaginator
+
+API_CACHE_MAX_AGE = getattr(settings, 'API_CACHE_MAX_AGE', 60)
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+# --- Serialisers ---
+
+def _image(instance, request):
+    if not instance.image:
+        return None
+    return {
+        'url': request.build_absolute_uri(instance.image.url),
+        'variants': {
+            fmt: [
+                {'width': width, 'url': request.build_absolute_uri(url)}
+                for width, url in images.variant_urls(instance, fmt)
+            ]
+            for fmt in images.FORMATS
+        },
+    }
+
+
+def _tour_summary(tour, request):
+    return {
+        'slug': tour.slug,
+        'name': tour.name,
+        'summary': tour.summary,
+        'duration_days': tour.duration_days,
+        'price': tour.price,
+        'difficulty': tour.difficulty,
+        'max_group_size': tour.max_group_size,
+        'featured': tour.featured,
+        'image': _image(tour, request),
+        'updated_at': tour.updated_at,
+        'url': request.build_absolute_uri(reverse('api_tour_detail', args=[tour.slug])),
+        'html_url': request.build_absolute_uri(tour.get_absolute_url()),
+    }
+
+
+def _tour_detail(tour, request):
+    return {
+        'slug': tour.slug,
+        'name': tour.name,
+        'description': tour.description,
+        'duration_days': tour.duration_days,
+        'price': tour.price,
+        'difficulty': tour.difficulty,
+        'max_group_size': tour.max_group_size,
+        'featured': tour.featured,
+        'image': _image(tour, request),
+        'created_at': tour.created_at,
+        'updated_at': tour.updated_at,
+        'html_url': request.build_absolute_uri(tour.get_absolute_url()),
+        'itinerary': [
+            {
+                'day_number': day.day_number,
+                'title': day.title,
+                'description': day.description,
+                'accommodation': day.accommodation,
+                'meals': day.meals,
+            }
+            for day in tour.itinerary.all()
+        ],
+        'gallery': [
+            dict(_image(img, request) or {}, caption=img.caption)
+            for img in tour.gallery_images.all()
+        ],
+    }
+
+
+# --- Conditional GET helpers ---
+
+def _catalogue_validators():
+    """(catalogue version, time of the last catalogue change or None) from the page cache keys."""
+    return catalogue_version(), cache.get(CATALOGUE_MODIFIED_KEY)
+
+
+def _latest(updated_at, *timestamps):
+    candidates = [updated_at] if updated_at else []
+    candidates += [datetime.datetime.fromtimestamp(ts, datetime.timezone.utc) for ts in timestamps if ts]
+    return max(candidates, default=None)
+
+
+def _list_state(request):
+    """
+    (count, last modified, etag) of the filtered list; one aggregate query, memoised per request.
+
+    Besides the matching tours' ``updated_at``, the catalogue version covers
+    changes that don't touch it (e.g. image derivative backfills), and the
+    "popular" order also depends on when ``TourStats`` last changed.
+    """
+    if not hasattr(request, '_api_list_state'):
+        queryset, _ = selectors.filtered_tours(request.GET, queryset=Tour.objects.all())
+        state = queryset.order_by().aggregate(count=Count('pk'), latest=Max('updated_at'))
+        version, modified = _catalogue_validators()
+        stats_modified = stats.stats_modified() if request.GET.get('sort') == 'popular' else None
+        stamp = state['latest'].isoformat() if state['latest'] else '-'
+        raw = f"{request.GET.urlencode()}|{state['count']}|{stamp}|{version}|{stats_modified}"
+        request._api_list_state = (
+            state['count'],
+            _latest(state['latest'], modified, stats_modified),
+            hashlib.sha1(raw.encode()).hexdigest(),
+        )
+    return request._api_list_state
+
+
+def _list_etag(request):
+    return _list_state(request)[2]
+
+
+def _list_last_modified(request):
+    return _list_state(request)[1]
+
+
+def _detail_state(request, slug):
+    if not hasattr(request, '_api_detail_state'):
+        state = Tour.objects.filter(slug=slug).values_list('pk', 'updated_at').first()
+        if state is not None:
+            pk, updated_at = state
+            version, modified = _catalogue_validators()
+            state = (f'tour-{pk}-{updated_at.timestamp():.6f}-{version}', _latest(updated_at, modified))
+        request._api_detail_state = state
+    return request._api_detail_state
+
+
+def _detail_etag(request, slug):
+    state = _detail_state(request, slug)
+    return state[0] if state else None
+
+
+def _detail_last_modified(request, slug):
+    state = _detail_state(request, slug)
+    return state[1] if state else None
+
+
+# --- Views ---
+
+@require_safe
+@cache_control(public=True, max_age=API_CACHE_MAX_AGE, must_revalidate=True)
+@condition(etag_func=_list_etag, last_modified_func=_list_last_modified)
+def tour_list(request):
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        limit = DEFAULT_PAGE_SIZE
+
+    queryset, ordering = selectors.filtered_tours(request.GET)
+    try:
+        page = KeysetPaginator(queryset, ordering, per_page=limit).page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    next_url = None
+    if page.has_next:
+        params = request.GET.copy()
+        params['cursor'] = page.next_cursor
+        next_url = request.build_absolute_uri(f"{reverse('api_tour_list')}?{params.urlencode()}")
+
+    return JsonResponse({
+        'count': _list_state(request)[0],
+        'next': next_url,
+        'results': [_tour_summary(tour, request) for tour in page],
+    })
+
+
+@require_safe
+@cache_control(public=True, max_age=API_CACHE_MAX_AGE, must_revalidate=True)
+@condition(etag_func=_detail_etag, last_modified_func=_detail_last_modified)
+def tour_detail(request, slug):
+    try:
+        tour = selectors.tour_with_content(slug)
+    except Http404:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    return JsonResponse(_tour_detail(tour, request))
@@ -0,0 +1,105 @@
+# ============================================
+# core/archive.py
+# ============================================
+"""
+Retention: moving old rows out of the hot tables.
+
+Completed and cancelled bookings, and contact messages, created more than
+``ARCHIVE_BOOKINGS_AFTER_DAYS`` / ``ARCHIVE_MESSAGES_AFTER_DAYS`` ago are
+copied into ``ArchivedBooking`` / ``ArchivedContactMessage`` (same ids) and
+deleted, so the changelists and reports only ever scan recent rows.
+
+Work is done in batches of at most ``batch_size`` rows, oldest first, each
+in its own short transaction: a batch is either fully moved or not at all,
+and an interrupted run simply continues where it stopped the next time. An
+id already in the archive raises IntegrityError and rolls the batch back,
+so the original is never deleted without its copy.
+
+Booking status history travels with the booking (``status_history``), and
+the departure seats and ``TourStats`` the moved bookings contributed are
+released in one statement per departure / tour, as ``rebuild_stats()``
+would after the rows are gone.
+"""
+import datetime
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import availability, stats
+from .models import ArchivedBooking, ArchivedContactMessage, Booking, BookingStatusChange, ContactMessage
+
+ARCHIVE_BOOKINGS_AFTER_DAYS = getattr(settings, 'ARCHIVE_BOOKINGS_AFTER_DAYS', 365)
+ARCHIVE_MESSAGES_AFTER_DAYS = getattr(settings, 'ARCHIVE_MESSAGES_AFTER_DAYS', 365)
+ARCHIVABLE_STATUSES = ('completed', 'cancelled')
+
+BOOKING_FIELDS = (
+    'id', 'tour_id', 'full_name', 'email', 'phone', 'number_of_people', 'preferred_date',
+    'special_requests', 'status', 'created_at',
+)
+MESSAGE_FIELDS = ('id', 'name', 'email', 'subject', 'message', 'created_at')
+
+
+def cutoff(days):
+    return timezone.now() - datetime.timedelta(days=days)
+
+
+def archive_bookings(days=None, batch_size=1000):
+    """Archive old finished bookings; yields the number moved per batch."""
+    days = ARCHIVE_BOOKINGS_AFTER_DAYS if days is None else days
+    due = Booking.objects.filter(created_at__lt=cutoff(days), status__in=ARCHIVABLE_STATUSES).order_by('pk')
+    while True:
+        with transaction.atomic():
+            # of=self: the tour__name join must not lock Tour rows too
+            rows = list(due.select_for_update(of=('self',)).values(*BOOKING_FIELDS, 'tour__name')[:batch_size])
+            if not rows:
+                return
+            _move_bookings(rows)
+        yield len(rows)
+
+
+def _move_bookings(rows):
+    ids = [row['id'] for row in rows]
+    history = defaultdict(list)
+    for booking_id, *change in (
+        BookingStatusChange.objects.filter(booking_id__in=ids).order_by('pk')
+        .values_list('booking_id', 'from_status', 'to_status', 'changed_by_id', 'changed_at')
+    ):
+        change[-1] = change[-1].isoformat()
+        history[booking_id].append(change)
+    ArchivedBooking.objects.bulk_create([
+        ArchivedBooking(tour_name=row.pop('tour__name'), status_history=history[row['id']], **row)
+        for row in rows
+    ])
+
+    BookingStatusChange.objects.filter(booking_id__in=ids).delete()
+    # No per-row post_delete handlers: their seat and stats updates are
+    # applied below, summed per departure and per tour.
+    deleted = Booking.objects.filter(pk__in=ids)
+    deleted._raw_delete(deleted.db)
+
+    seats = Counter()
+    for row in rows:
+        if row['status'] in Booking.SEAT_HOLDING_STATUSES:
+            seats[row['tour_id'], row['preferred_date']] += row['number_of_people']
+    for (tour_id, date), pax in seats.items():
+        availability.release_seats(tour_id, date, pax)
+    stats.record_booking_changes(
+        ((row['tour_id'], row['status'], row['number_of_people'], row['preferred_date']), None)
+        for row in rows
+    )
+
+
+def archive_messages(days=None, batch_size=1000):
+    """Archive old contact messages; yields the number moved per batch."""
+    days = ARCHIVE_MESSAGES_AFTER_DAYS if days is None else days
+    due = ContactMessage.objects.filter(created_at__lt=cutoff(days)).order_by('pk')
+    while True:
+        with transaction.atomic():
+            rows = list(due.select_for_update().values(*MESSAGE_FIELDS)[:batch_size])
+            if not rows:
+                return
+            ArchivedContactMessage.objects.bulk_create([ArchivedContactMessage(**row) for row in rows])
+            ContactMessage.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        yield len(rows)
@@ -0,0 +1,395 @@
+# ============================================
+# core/assets.py
+# ============================================
+"""
+Static asset pipeline: self-hosted vendor libraries and minified bundles.
+
+Sources live under ``static/``:
+
+* ``css/``, ``js/``  -- our own styles and scripts
+* ``vendor/``        -- Bootstrap, Font Awesome, Swiper and the Google Fonts,
+  downloaded from the pinned URLs below by ``manage.py vendor_assets``
+  (build time only, not committed)
+
+``manage.py build_assets`` concatenates and minifies each bundle into
+``static/dist/`` and extracts the above-the-fold rules into
+``dist/critical.css``. ``collectstatic`` then content-hashes and
+gzip/brotli-compresses everything (CompressedManifestStaticFilesStorage) and
+WhiteNoise serves the hashed names with a far-future immutable Cache-Control,
+all from our own origin.
+
+The ``core_assets`` template tags inline the critical CSS and link the
+bundles. Until the bundles are built (a fresh dev checkout) they fall back to
+the individual source files, and to the CDN for anything not yet vendored.
+"""
+import json
+import posixpath
+import re
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.text import slugify
+
+# --- Pinned third-party files: static path -> upstream URL ---
+
+VENDOR_FILES = {
+    'vendor/bootstrap/css/bootstrap.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/js/bootstrap.bundle.min.js':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'vendor/fontawesome/css/all.min.css':
+        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+    'vendor/swiper/swiper-bundle.min.css':
+        'https://cdn.jsdelivr.net/npm/swiper@11.0.5/swiper-bundle.min.css',
+    'vendor/swiper/swiper-bundle.min.js':
+        'https://cdn.jsdelivr.net/npm/swiper@11.0.5/swiper-bundle.min.js',
+}
+
+FONTS_CSS = 'vendor/fonts/fonts.css'
+GOOGLE_FONTS_URL = (
+    'https://fonts.googleapis.com/css2?family=Playfair+Display:wght@400;600;700;800'
+    '&family=Poppins:wght@300;400;500;600;700&display=swap'
+)
+FONT_SUBSETS = ('latin', 'latin-ext')
+# Faces used above the fold on every page: (family, style, weight)
+PRELOAD_FONTS = [('Poppins', 'normal', '400'), ('Playfair Display', 'normal', '700')]
+
+# Google only serves WOFF2 to browsers it recognises.
+_USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+)
+
+# --- Bundles: output name -> sources, in cascade / execution order ---
+
+BUNDLES = {
+    'site.css': [
+        'vendor/bootstrap/css/bootstrap.min.css',
+        'vendor/fontawesome/css/all.min.css',
+        FONTS_CSS,
+        'vendor/swiper/swiper-bundle.min.css',
+        'css/custom_home.css',
+        'css/base.css',
+    ],
+    'site.js': [
+        'vendor/bootstrap/js/bootstrap.bundle.min.js',
+        'js/base.js',
+        'vendor/swiper/swiper-bundle.min.js',
+        'js/custom_home.js',
+    ],
+}
+DIST_DIR = 'dist'
+CRITICAL_CSS = f'{DIST_DIR}/critical.css'
+
+# Rules whose selector starts with one of these are inlined as critical CSS:
+# page chrome and the hero, i.e. what is visible before the first scroll.
+_CRITICAL_SELECTOR = re.compile(
+    r'^(?::root|\*|html|body|h[1-6]|\.navbar[\w-]*|\.nav-[\w-]+|\.container[\w-]*|\.fixed-top'
+    r'|\.collapse|\.custom-toggler|\.hero[\w-]*|\.skip-link|\.btn(?:-primary|-outline-light|-lg)?'
+    r'|\.d-flex|\.ms-auto|\.text-center)(?![\w-])'
+)
+_CRITICAL_FONTS = ('Poppins', 'Playfair Display')
+
+
+def source_root():
+    """The first STATICFILES_DIRS entry: where vendor/ and dist/ are written."""
+    return Path(settings.STATICFILES_DIRS[0])
+
+
+# --- Minification ---
+
+_CSS_STRING_OR_COMMENT = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*!.*?\*/)|/\*.*?\*/', re.S)
+_CSS_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', re.S)
+
+
+def minify_css(css):
+    """Drop comments (except ``/*! license */``) and redundant whitespace."""
+    css = _CSS_STRING_OR_COMMENT.sub(lambda m: m.group(1) or m.group(2) or '', css)
+    parts = _CSS_STRING.split(css)
+    for i in range(0, len(parts), 2):  # even items are outside quoted strings
+        text = re.sub(r'\s+', ' ', parts[i])
+        text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+        text = re.sub(r'(:|\*/)\s+', r'\1', text)
+        parts[i] = text.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    """
+    Conservative JS minification: strip indentation, blank lines and
+    whole-line ``//`` comments (including source map links).
+
+    No tokenizing, so nothing inside strings or regexes is touched; vendor
+    files are already minified and gzip/brotli take care of the rest.
+    """
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+# --- Bundling ---
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def rebase_css_urls(css, source, bundle):
+    """Rewrite relative ``url()``s in ``source`` so they resolve from ``bundle``."""
+    source_dir = posixpath.dirname(source)
+    bundle_dir = posixpath.dirname(bundle)
+
+    def rebase(match):
+        url = match.group(2).strip()
+        if url.startswith(('data:', '#', '/')) or '://' in url:
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(source_dir, path))
+        return f'url({posixpath.relpath(target, bundle_dir)}{suffix})'
+
+    return _CSS_URL.sub(rebase, css)
+
+
+def build_bundle(name, root=None):
+    """Concatenate and minify one bundle into ``dist/``; returns its static path."""
+    root = Path(root or source_root())
+    output = f'{DIST_DIR}/{name}'
+    chunks = []
+    for source in BUNDLES[name]:
+        path = root / source
+        if not path.exists():
+            raise FileNotFoundError(f'{source} is missing; run `manage.py vendor_assets` first')
+        text = path.read_text(encoding='utf-8')
+        if name.endswith('.css'):
+            chunks.append(minify_css(rebase_css_urls(text, source, output)))
+        else:
+            chunks.append(minify_js(text))
+    joiner = '\n' if name.endswith('.css') else ';\n'
+    target = root / output
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(joiner.join(chunks) + '\n', encoding='utf-8')
+    return output
+
+
+def _blocks(css):
+    """Yield ``(prelude, body)`` per top-level rule of minified CSS (body None for statements)."""
+    depth = start = body_start = 0
+    prelude = ''
+    quote = None
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if depth == 0:
+                prelude, body_start = css[start:i], i + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                yield re.sub(r'/\*.*?\*/', '', prelude, flags=re.S).strip(), css[body_start:i]
+                start = i + 1
+        elif char == ';' and depth == 0:
+            yield css[start:i].strip(), None
+            start = i + 1
+        i += 1
+
+
+def extract_critical(css):
+    """Return the subset of (minified) ``css`` needed to paint the page chrome and hero."""
+    out = []
+    keyframes = {}
+    for prelude, body in _blocks(css):
+        if body is None:
+            continue
+        if prelude.startswith(('@media', '@supports')):
+            inner = extract_critical(body)
+            if inner:
+                out.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@font-face'):
+            # Text faces only, latin subset (Google's latin range starts at U+0000).
+            if any(family in body for family in _CRITICAL_FONTS) and (
+                'U+0000-00FF' in body or 'unicode-range' not in body
+            ):
+                out.append(f'{prelude}{{{body}}}')
+        elif prelude.startswith(('@keyframes', '@-webkit-keyframes')):
+            keyframes[prelude.split()[-1]] = f'{prelude}{{{body}}}'
+        elif not prelude.startswith('@'):
+            selectors = [s for s in prelude.split(',') if _CRITICAL_SELECTOR.match(s.strip())]
+            if selectors:
+                out.append(f'{",".join(selectors)}{{{body}}}')
+    critical = ''.join(out)
+    # Only the animations the kept rules actually use.
+    used = [
+        rule for name, rule in keyframes.items()
+        if re.search(rf'(?<![\w-]){re.escape(name)}(?![\w-])', critical)
+    ]
+    return critical + ''.join(used)
+
+
+def build_all(root=None):
+    """Build every bundle plus critical.css; returns ``{static path: bytes}``."""
+    root = Path(root or source_root())
+    sizes = {}
+    for name in BUNDLES:
+        output = build_bundle(name, root)
+        sizes[output] = (root / output).stat().st_size
+    # Sits next to site.css, so its url()s stay valid; they are resolved to
+    # hashed static URLs when it is inlined (see critical_css()).
+    critical = extract_critical((root / DIST_DIR / 'site.css').read_text(encoding='utf-8'))
+    (root / CRITICAL_CSS).write_text(critical, encoding='utf-8')
+    sizes[CRITICAL_CSS] = len(critical.encode())
+    return sizes
+
+
+# --- Vendoring (build time, needs network) ---
+
+def _fetch(url):
+    request = urllib.request.Request(url, headers={'User-Agent': _USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+_SOURCE_MAP = re.compile(rb'\n?(?://# sourceMappingURL=[^\n]*|/\*# sourceMappingURL=[^*]*\*/)')
+
+
+def _save(root, static_path, data):
+    path = root / static_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # The .map files aren't vendored; a dangling reference would fail collectstatic.
+    path.write_bytes(_SOURCE_MAP.sub(b'', data))
+
+
+def vendor_file(static_path, url, root):
+    """Download one pinned file plus any relative ``url()``s it references."""
+    data = _fetch(url)
+    _save(root, static_path, data)
+    files = [static_path]
+    if static_path.endswith('.css'):
+        seen = set()
+        for match in _CSS_URL.finditer(data.decode('utf-8')):
+            ref = re.split(r'[?#]', match.group(2).strip())[0]
+            if ref in seen or ref.startswith(('data:', '/')) or '://' in ref:
+                continue
+            seen.add(ref)
+            asset = posixpath.normpath(posixpath.join(posixpath.dirname(static_path), ref))
+            _save(root, asset, _fetch(urllib.parse.urljoin(url, ref)))
+            files.append(asset)
+    return files
+
+
+_FONT_FACE = re.compile(r'/\* ([\w-]+) \*/\s*@font-face\s*\{([^}]*)\}')
+
+
+def _font_props(body):
+    props = dict(
+        (key.strip(), value.strip().strip('\'"'))
+        for key, _, value in (decl.partition(':') for decl in body.split(';'))
+        if key.strip()
+    )
+    return props.get('font-family', ''), props.get('font-style', 'normal'), props.get('font-weight', '400')
+
+
+def vendor_google_fonts(root):
+    """Self-host the Google Fonts used by the site as ``vendor/fonts/*.woff2``."""
+    css = _fetch(GOOGLE_FONTS_URL).decode('utf-8')
+    font_dir = posixpath.dirname(FONTS_CSS)
+    local = {}  # remote URL -> local file name (variable fonts share one file)
+    faces = []
+    for subset, body in _FONT_FACE.findall(css):
+        if subset not in FONT_SUBSETS:
+            continue
+        remote = _CSS_URL.search(body).group(2)
+        if remote not in local:
+            family, style, weight = _font_props(body)
+            local[remote] = f'{slugify(family)}-{style}-{weight}-{subset}.woff2'
+            _save(root, f'{font_dir}/{local[remote]}', _fetch(remote))
+        faces.append(f'/* {subset} */\n@font-face {{{body.replace(remote, local[remote])}}}\n')
+    _save(root, FONTS_CSS, ''.join(faces).encode('utf-8'))
+    return [FONTS_CSS] + [f'{font_dir}/{name}' for name in local.values()]
+
+
+def vendor_all(root=None):
+    root = Path(root or source_root())
+    files = []
+    for static_path, url in VENDOR_FILES.items():
+        files.extend(vendor_file(static_path, url, root))
+    files.extend(vendor_google_fonts(root))
+    (root / 'vendor' / 'manifest.json').write_text(json.dumps(
+        {'files': VENDOR_FILES, 'fonts': GOOGLE_FONTS_URL}, indent=2,
+    ))
+    return files
+
+
+# --- Lookups used by the template tags ---
+
+_cache = {}
+
+
+def _memo(key, compute):
+    # Built files only change on deploy; re-check on every request while developing.
+    if settings.DEBUG:
+        return compute()
+    if key not in _cache:
+        _cache[key] = compute()
+    return _cache[key]
+
+
+def exists(static_path):
+    return _memo(('exists', static_path), lambda: finders.find(static_path) is not None)
+
+
+def critical_css():
+    """The inlinable critical CSS with ``url()``s pointing at (hashed) static files."""
+    def read():
+        path = finders.find(CRITICAL_CSS)
+        if not path:
+            return ''
+        base = posixpath.dirname(CRITICAL_CSS)
+
+        def absolute(match):
+            url = match.group(2).strip()
+            if url.startswith(('data:', '#', '/')) or '://' in url:
+                return match.group(0)
+            path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+            return f'url({static(posixpath.normpath(posixpath.join(base, path)))}{suffix})'
+
+        return _CSS_URL.sub(absolute, Path(path).read_text(encoding='utf-8'))
+    return _memo('critical', read)
+
+
+def bundle_urls(bundle):
+    """URLs to load for ``bundle``: the built file, or its sources (CDN for anything not vendored)."""
+    def resolve():
+        if exists(f'{DIST_DIR}/{bundle}'):
+            return [static(f'{DIST_DIR}/{bundle}')]
+        cdn = dict(VENDOR_FILES, **{FONTS_CSS: GOOGLE_FONTS_URL})
+        return [
+            cdn[source] if source in cdn and not exists(source) else static(source)
+            for source in BUNDLES[bundle]
+        ]
+    return _memo(('bundle', bundle), resolve)
+
+
+def font_preloads():
+    """URLs of the self-hosted font files worth preloading."""
+    def find():
+        path = finders.find(FONTS_CSS)
+        if not path:
+            return []
+        font_dir = posixpath.dirname(FONTS_CSS)
+        wanted = set(PRELOAD_FONTS)
+        found = [
+            static(f'{font_dir}/{_CSS_URL.search(body).group(2)}')
+            for subset, body in _FONT_FACE.findall(Path(path).read_text(encoding='utf-8'))
+            if subset == 'latin' and _font_props(body) in wanted
+        ]
+        return list(dict.fromkeys(found))
+    return _memo('fonts', find)
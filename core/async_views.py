@@ -0,0 +1,124 @@
+# ============================================
+# core/async_views.py
+# ============================================
+"""
+Async variants of the catalogue and form views, used when ``ASYNC_VIEWS``
+is on and the site runs under an ASGI server (see ``gunicorn.conf.py``).
+
+They return the same pages as ``core.views``. Reads go through Django's
+async ORM API. Saving a booking or contact message reuses the sync helpers
+in ``core.views`` via ``sync_to_async``, because ``transaction.atomic``
+only works in sync code. Templates are rendered through ``sync_to_async``
+too: the ``user`` context can load the session from the database while
+rendering.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from . import facets, mail, selectors
+from .availability import DepartureFull
+from .cache import cache_catalogue_page, tag_response
+from .forms import BookingForm, ContactForm
+from .models import Tour
+from .pagination import InvalidCursor, KeysetPaginator
+from .throttling import throttle
+from .views import (
+    BOOKING_SUCCESS_MESSAGE, CONTACT_SUCCESS_MESSAGE, TOURS_PER_PAGE, _current_filters, _next_page_url,
+    save_booking, save_contact_message,
+)
+
+arender = sync_to_async(render)
+
+
+@cache_catalogue_page
+async def home(request):
+    featured_tours = [tour async for tour in selectors.featured_tours()]
+    context = {'featured_tours': featured_tours}
+    return await arender(request, 'core/home.html', context)
+
+
+async def _tours_page(request):
+    # Building the queryset may run the full-text search query.
+    found = await sync_to_async(selectors.catalogue_search)(request.GET)
+    paginator = KeysetPaginator(found.tours, found.ordering, per_page=TOURS_PER_PAGE)
+    try:
+        page = await paginator.apage(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404('Invalid page cursor')
+    return found, page
+
+
+@cache_catalogue_page
+async def tours(request):
+    found, page = await _tours_page(request)
+    counts = await facets.afacet_counts(found)
+
+    context = {
+        'tours': page,
+        'total_count': counts['total'],
+        'facets': facets.facet_groups(request.GET, counts),
+        'next_page_url': _next_page_url(request, 'tours', page),
+        'next_fragment_url': _next_page_url(request, 'tours_page', page),
+        **_current_filters(request),
+    }
+    return await arender(request, 'core/tours.html', context)
+
+
+@cache_catalogue_page
+async def tours_page(request):
+    _, page = await _tours_page(request)
+    context = {
+        'tours': page,
+        'next_page_url': _next_page_url(request, 'tours', page),
+        'next_fragment_url': _next_page_url(request, 'tours_page', page),
+    }
+    return await arender(request, 'core/partials/tour_cards.html', context)
+
+
+@cache_catalogue_page
+async def tour_detail(request, slug):
+    tour = await selectors.atour_with_content(slug)
+    context = {'tour': tour}
+    response = await arender(request, 'core/tour_detail.html', context)
+    return tag_response(response, f'tour-{tour.pk}', last_modified=tour.updated_at)
+
+
+@throttle('booking')
+async def booking(request, slug):
+    tour = await aget_object_or_404(Tour, slug=slug)
+
+    if request.method == 'POST':
+        form = BookingForm(request.POST, tour=tour)
+        # clean() checks the departure's seats
+        if await sync_to_async(form.is_valid)():
+            try:
+                await sync_to_async(save_booking)(form, tour)
+            except DepartureFull as full:
+                form.add_error(None, form.full_departure_message(full.seats_left))
+            else:
+                mail.deliver_soon()
+                messages.success(request, BOOKING_SUCCESS_MESSAGE)
+                return redirect('tour_detail', slug=tour.slug)
+    else:
+        form = BookingForm(tour=tour)
+
+    context = {'form': form, 'tour': tour}
+    return await arender(request, 'core/booking.html', context)
+
+
+@throttle('contact')
+async def contact(request):
+    if request.method == 'POST':
+        form = ContactForm(request.POST)
+        if await sync_to_async(form.is_valid)():
+            await sync_to_async(save_contact_message)(form)
+            mail.deliver_soon()
+            messages.success(request, CONTACT_SUCCESS_MESSAGE)
+            return redirect('contact')
+    else:
+        form = ContactForm()
+
+    context = {'form': form}
+    return await arender(request, 'core/contact.html', context)
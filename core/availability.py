@@ -0,0 +1,123 @@
+# ============================================
+# core/availability.py
+# ============================================
+"""
+Seat accounting for tour departures.
+
+Each (tour, date) that has bookings gets a ``Departure`` row carrying a
+running ``seats_taken`` counter, so "is this departure full?" is a single
+indexed lookup instead of summing bookings. Counters only ever change via
+``UPDATE ... SET seats_taken = seats_taken +/- n`` and, when capacity is
+enforced, the increment is conditional on enough seats being left -- the
+database applies check and write atomically, so two concurrent submissions
+can never both take the last seats.
+
+``Booking.save()`` and the ``post_delete`` handler in ``core.signals`` keep
+the counters in step with bookings.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+
+class DepartureFull(Exception):
+    def __init__(self, seats_left):
+        self.seats_left = max(seats_left, 0)
+        super().__init__(f'Only {self.seats_left} seats left on this departure')
+
+
+def seats_left(tour, date):
+    from .models import Departure
+
+    row = Departure.objects.filter(tour=tour, date=date).values_list('capacity', 'seats_taken').first()
+    if row is None:
+        return tour.max_group_size
+    capacity, taken = row
+    return max(capacity - taken, 0)
+
+
+def _departure_id(tour_id, date):
+    from .models import Departure, Tour
+
+    pk = Departure.objects.filter(tour_id=tour_id, date=date).values_list('pk', flat=True).first()
+    if pk is not None:
+        return pk
+    capacity = Tour.objects.values_list('max_group_size', flat=True).get(pk=tour_id)
+    try:
+        with transaction.atomic():
+            return Departure.objects.create(tour_id=tour_id, date=date, capacity=capacity).pk
+    except IntegrityError:
+        # Another request created it first.
+        return Departure.objects.values_list('pk', flat=True).get(tour_id=tour_id, date=date)
+
+
+def claim_seats(tour_id, date, pax, check_capacity=False):
+    from .models import Departure
+
+    departure = Departure.objects.filter(pk=_departure_id(tour_id, date))
+    if check_capacity:
+        departure = departure.filter(seats_taken__lte=F('capacity') - pax)
+    if not departure.update(seats_taken=F('seats_taken') + pax):
+        capacity, taken = Departure.objects.values_list('capacity', 'seats_taken').get(
+            tour_id=tour_id, date=date
+        )
+        raise DepartureFull(capacity - taken)
+
+
+def release_seats(tour_id, date, pax):
+    from .models import Departure
+
+    Departure.objects.filter(tour_id=tour_id, date=date).update(
+        seats_taken=Greatest(F('seats_taken') - pax, 0)
+    )
+
+
+def move_seats(old_claim, new_claim, check_capacity=False):
+    """
+    Apply a booking's change from ``old_claim`` to ``new_claim``.
+
+    Claims are ``(tour_id, date, pax)`` tuples, or ``None`` for bookings that
+    hold no seats (new, deleted or cancelled). Must run inside a transaction.
+    """
+    if old_claim == new_claim:
+        return
+    if old_claim:
+        release_seats(*old_claim)
+    if new_claim:
+        claim_seats(*new_claim, check_capacity=check_capacity)
+
+
+def rebuild_departures():
+    """
+    Recompute every departure's ``seats_taken`` from the bookings table.
+
+    For bulk loaders (``bulk_create`` skips ``Booking.save()``) and for repairing
+    drift. Staff-edited capacities are kept; new departures get the tour's
+    max group size. Returns the number of departures written.
+    """
+    from django.db.models import Sum
+
+    from .models import Booking, Departure
+
+    totals = {
+        (row['tour_id'], row['preferred_date']): (row['pax'], row['tour__max_group_size'])
+        for row in (
+            Booking.objects.filter(status__in=Booking.SEAT_HOLDING_STATUSES)
+            .values('tour_id', 'preferred_date', 'tour__max_group_size')
+            .annotate(pax=Sum('number_of_people'))
+            .order_by()
+        )
+    }
+    with transaction.atomic():
+        changed = []
+        for departure in Departure.objects.select_for_update().iterator(chunk_size=2000):
+            pax, _ = totals.pop((departure.tour_id, departure.date), (0, None))
+            if departure.seats_taken != pax:
+                departure.seats_taken = pax
+                changed.append(departure)
+        Departure.objects.bulk_update(changed, ['seats_taken'], batch_size=1000)
+        Departure.objects.bulk_create([
+            Departure(tour_id=tour_id, date=date, capacity=capacity, seats_taken=pax)
+            for (tour_id, date), (pax, capacity) in totals.items()
+        ], batch_size=1000)
+    return len(changed) + len(totals)
@@ -0,0 +1,180 @@
+# ============================================
+# core/cache.py
+# ============================================
+"""
+Whole-page caching for the public catalogue.
+
+Rendered pages are stored under a key built from the request path, its
+(sorted) query parameters and a catalogue *version*. Any change to a Tour,
+TourImage or ItineraryDay bumps the version (see ``core.signals``), which
+orphans every cached page at once without having to know which URLs a tour
+appears on.
+
+Only anonymous, cookie-less GET/HEAD requests are served from the cache, so
+visitors with a session or pending flash messages always get a fresh render.
+Async views (``core.async_views``) get the same behaviour through the cache
+backend's async API.
+
+Those shared responses also carry edge-cache headers: ``Cache-Control:
+s-maxage`` so a CDN can hold them for ``EDGE_CACHE_TIMEOUT``, a
+``Surrogate-Key`` (``catalogue`` plus e.g. ``tour-42``) for targeted
+purges, and ``Last-Modified`` (the tour's ``updated_at``, or the last
+catalogue change for listings). Everything else is marked private.
+"""
+import hashlib
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from . import instrumentation
+from .routers import STICKY_COOKIE
+
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+CATALOGUE_MODIFIED_KEY = 'catalogue:modified'
+CATALOGUE_CACHE_TIMEOUT = getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 600)
+EDGE_CACHE_TIMEOUT = getattr(settings, 'EDGE_CACHE_TIMEOUT', 300)
+SURROGATE_KEY = 'catalogue'
+
+# Cookies whose presence means the response is personalised for the visitor
+# (or, for the replica cookie, that they must see their own fresh writes).
+_PERSONAL_COOKIES = (settings.SESSION_COOKIE_NAME, 'messages', STICKY_COOKIE)
+
+
+def catalogue_version():
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOGUE_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOGUE_VERSION_KEY, 1)
+    return version
+
+
+async def acatalogue_version():
+    version = await cache.aget(CATALOGUE_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOGUE_VERSION_KEY, 1, timeout=None)
+        version = await cache.aget(CATALOGUE_VERSION_KEY, 1)
+    return version
+
+
+def invalidate_catalogue():
+    """Orphan every cached catalogue page and fragment."""
+    cache.set(CATALOGUE_MODIFIED_KEY, time.time(), timeout=None)
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        # Key missing (first write or evicted): any fresh value invalidates.
+        cache.set(CATALOGUE_VERSION_KEY, catalogue_version() + 1, timeout=None)
+
+
+def _page_digest(request):
+    params = urlencode(sorted(request.GET.lists()), doseq=True)
+    return hashlib.md5(f'{request.path}?{params}'.encode()).hexdigest()
+
+
+def page_cache_key(request):
+    return f'catalogue:page:{catalogue_version()}:{_page_digest(request)}'
+
+
+async def apage_cache_key(request):
+    return f'catalogue:page:{await acatalogue_version()}:{_page_digest(request)}'
+
+
+def is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    return not any(name in request.COOKIES for name in _PERSONAL_COOKIES)
+
+
+def _should_store(response):
+    # Never share a response that sets cookies (e.g. a CSRF token).
+    return response.status_code == 200 and not response.cookies and not response.streaming
+
+
+def edge_cache_headers(*surrogate_keys):
+    """Headers letting a CDN keep a shared catalogue response; browsers always revalidate."""
+    return {
+        'Cache-Control': f'public, max-age=0, s-maxage={EDGE_CACHE_TIMEOUT}',
+        'Surrogate-Key': ' '.join(dict.fromkeys([SURROGATE_KEY, *surrogate_keys])),
+    }
+
+
+def vary_on_cookie(response):
+    """
+    Keep a CDN's shared copy away from visitors with a session, a pending
+    flash message or the replica cookie: they must get the live view.
+    """
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def tag_response(response, *surrogate_keys, last_modified=None):
+    """Record what a catalogue response shows, for the edge-cache headers."""
+    keys = response.get('Surrogate-Key', '').split()
+    response['Surrogate-Key'] = ' '.join([*keys, *surrogate_keys])
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def _add_edge_headers(response, modified):
+    for header, value in edge_cache_headers(*response.get('Surrogate-Key', '').split()).items():
+        response[header] = value
+    vary_on_cookie(response)
+    if modified is not None and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(modified)
+
+
+def cache_catalogue_page(view_func):
+    """Serve ``view_func`` (sync or async) from the page cache for anonymous visitors."""
+    if iscoroutinefunction(view_func):
+        return _async_cache_catalogue_page(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            response = view_func(request, *args, **kwargs)
+            patch_cache_control(response, private=True)
+            return response
+
+        key = page_cache_key(request)
+        response = cache.get(key)
+        instrumentation.record_cache(response is not None)
+        if response is not None:
+            return response
+
+        response = view_func(request, *args, **kwargs)
+        if _should_store(response):
+            _add_edge_headers(response, cache.get(CATALOGUE_MODIFIED_KEY))
+            cache.set(key, response, CATALOGUE_CACHE_TIMEOUT)
+        return response
+
+    return wrapper
+
+
+def _async_cache_catalogue_page(view_func):
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            response = await view_func(request, *args, **kwargs)
+            patch_cache_control(response, private=True)
+            return response
+
+        key = await apage_cache_key(request)
+        response = await cache.aget(key)
+        instrumentation.record_cache(response is not None)
+        if response is not None:
+            return response
+
+        response = await view_func(request, *args, **kwargs)
+        if _should_store(response):
+            _add_edge_headers(response, await cache.aget(CATALOGUE_MODIFIED_KEY))
+            await cache.aset(key, response, CATALOGUE_CACHE_TIMEOUT)
+        return response
+
+    return wrapper
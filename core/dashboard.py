@@ -0,0 +1,118 @@
+# ============================================
+# core/dashboard.py
+# ============================================
+"""
+Aggregates for the bookings dashboard in the admin.
+
+Every figure comes from a handful of GROUP BY queries -- never a query per
+tour or per booking -- and the assembled report is cached for a few minutes,
+so the page costs the same with a hundred bookings or a million.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Booking, Departure
+
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def month_window(today=None, back=6, ahead=6):
+    """First day of the month ``back`` months ago and of the month ``ahead`` months on."""
+    today = today or timezone.localdate()
+    index = today.year * 12 + today.month - 1
+    start, end = index - back, index + ahead + 1
+    return (
+        datetime.date(start // 12, start % 12 + 1, 1),
+        datetime.date(end // 12, end % 12 + 1, 1),
+    )
+
+
+def status_totals(start, end):
+    rows = (
+        Booking.objects.filter(preferred_date__gte=start, preferred_date__lt=end)
+        .values('status')
+        .annotate(bookings=Count('id'), pax=Sum('number_of_people'))
+        .order_by()
+    )
+    counts = {row['status']: row for row in rows}
+    return [
+        {
+            'status': status,
+            'label': label,
+            'bookings': counts.get(status, {}).get('bookings', 0),
+            'pax': counts.get(status, {}).get('pax') or 0,
+        }
+        for status, label in Booking.STATUS_CHOICES
+    ]
+
+
+def tour_months(start, end):
+    """Revenue, bookings, pax and occupancy per (tour, departure month)."""
+    revenue = ExpressionWrapper(
+        F('number_of_people') * F('tour__price'), output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    bookings = (
+        Booking.objects.filter(
+            status__in=Booking.REVENUE_STATUSES, preferred_date__gte=start, preferred_date__lt=end,
+        )
+        .annotate(month=TruncMonth('preferred_date'))
+        .values('tour_id', 'tour__name', 'month')
+        .annotate(bookings=Count('id'), pax=Sum('number_of_people'), revenue=Sum(revenue))
+        .order_by()
+    )
+    departures = (
+        Departure.objects.filter(date__gte=start, date__lt=end)
+        .annotate(month=TruncMonth('date'))
+        .values('tour_id', 'tour__name', 'month')
+        .annotate(departures=Count('id'), capacity=Sum('capacity'), seats_taken=Sum('seats_taken'))
+        .order_by()
+    )
+
+    rows = {}
+    empty = {'bookings': 0, 'pax': 0, 'revenue': 0, 'departures': 0, 'capacity': 0, 'seats_taken': 0}
+    for source in (bookings, departures):
+        for row in source:
+            key = (row.pop('month'), row['tour__name'], row['tour_id'])
+            rows.setdefault(key, dict(empty)).update(row)
+    report = []
+    for (month, name, tour_id), row in sorted(rows.items()):
+        row.update(month=month, tour_name=name, tour_id=tour_id)
+        row['occupancy'] = round(100 * row['seats_taken'] / row['capacity'], 1) if row['capacity'] else None
+        report.append(row)
+    return report
+
+
+def month_totals(report):
+    totals = {}
+    for row in report:
+        month = totals.setdefault(row['month'], {
+            'month': row['month'], 'bookings': 0, 'pax': 0, 'revenue': 0, 'capacity': 0, 'seats_taken': 0,
+        })
+        for field in ('bookings', 'pax', 'revenue', 'capacity', 'seats_taken'):
+            month[field] += row[field]
+    for month in totals.values():
+        month['occupancy'] = round(100 * month['seats_taken'] / month['capacity'], 1) if month['capacity'] else None
+    return [totals[key] for key in sorted(totals)]
+
+
+def booking_dashboard(start, end, refresh=False):
+    """The full dashboard context for ``[start, end)``, cached."""
+    key = f'admin:booking-dashboard:{start.isoformat()}:{end.isoformat()}'
+    data = None if refresh else cache.get(key)
+    if data is None:
+        report = tour_months(start, end)
+        data = {
+            'start': start,
+            'end': end,
+            'statuses': status_totals(start, end),
+            'tour_months': report,
+            'months': month_totals(report),
+            'generated_at': timezone.now(),
+        }
+        cache.set(key, data, DASHBOARD_CACHE_TIMEOUT)
+    return data
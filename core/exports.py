@@ -0,0 +1,211 @@
+# ============================================
+# core/exports.py
+# ============================================
+"""
+Booking exports for finance, as CSV or Parquet.
+
+Rows come from one ``values_list`` query joined with the tour and read
+with ``iterator(chunk_size=...)``, so no model instances are built and
+memory stays flat at a million rows. The writers are generators that yield
+encoded chunks, suitable for a ``StreamingHttpResponse`` or a file.
+
+Incremental exports pass ``since`` (a ``created_at`` watermark) and
+``until``. Rows are ordered by ``(created_at, id)`` (indexed), and
+``ExportStats.watermark`` holds the last exported ``created_at`` for the
+next run. ``created_at`` is set when a booking is inserted, not when its
+transaction commits, so ``export_bookings`` holds back rows younger than
+``EXPORT_WATERMARK_LAG`` seconds: a booking committed late is still newer
+than the watermark when it becomes visible, instead of being skipped.
+
+CSV cells starting with ``=``, ``+``, ``-``, ``@``, tab or CR are prefixed
+with ``'`` so spreadsheet apps don't evaluate customer-typed text as a
+formula. Parquet values are written as they are.
+
+Parquet needs the optional ``pyarrow`` package (``pip install pyarrow``).
+"""
+import csv
+import datetime
+import io
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import DecimalField, ExpressionWrapper, F
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency
+    pyarrow = None
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_WATERMARK_LAG = getattr(settings, 'EXPORT_WATERMARK_LAG', 5 * 60)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+PYARROW_MISSING = 'Parquet export needs the pyarrow package (pip install pyarrow).'
+
+# (header, lookup or annotation name, pyarrow type factory)
+COLUMNS = [
+    ('booking_id', 'id', lambda: pyarrow.int64()),
+    ('created_at', 'created_at', lambda: pyarrow.timestamp('us', tz='UTC')),
+    ('status', 'status', lambda: pyarrow.string()),
+    ('preferred_date', 'preferred_date', lambda: pyarrow.date32()),
+    ('number_of_people', 'number_of_people', lambda: pyarrow.int32()),
+    ('full_name', 'full_name', lambda: pyarrow.string()),
+    ('email', 'email', lambda: pyarrow.string()),
+    ('phone', 'phone', lambda: pyarrow.string()),
+    ('tour_id', 'tour_id', lambda: pyarrow.int64()),
+    ('tour_name', 'tour__name', lambda: pyarrow.string()),
+    ('tour_price', 'tour__price', lambda: pyarrow.decimal128(10, 2)),
+    ('amount', 'amount', lambda: pyarrow.decimal128(14, 2)),
+]
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+@dataclass
+class ExportStats:
+    rows: int = 0
+    watermark: datetime.datetime = None
+
+    def add(self, row):
+        self.rows += 1
+        self.watermark = row[1]  # created_at; rows arrive in created_at order
+
+
+def booking_rows(queryset=None, start=None, end=None, statuses=None, since=None, until=None):
+    """
+    ``values_list`` rows for ``COLUMNS``, oldest first.
+
+    ``start``/``end`` bound the travel date (``preferred_date``, inclusive),
+    ``statuses`` is a list of status values and ``since``/``until`` export
+    only bookings created after / up to those moments.
+    """
+    from .models import Booking
+
+    queryset = Booking.objects.all() if queryset is None else queryset
+    if start:
+        queryset = queryset.filter(preferred_date__gte=start)
+    if end:
+        queryset = queryset.filter(preferred_date__lte=end)
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    if since:
+        queryset = queryset.filter(created_at__gt=since)
+    if until:
+        queryset = queryset.filter(created_at__lte=until)
+    amount = ExpressionWrapper(
+        F('number_of_people') * F('tour__price'), output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    return (
+        queryset.annotate(amount=amount)
+        .values_list(*[lookup for _, lookup, _ in COLUMNS])
+        .order_by('created_at', 'id')
+    )
+
+
+def _stream(rows, stats, chunk_size):
+    for row in rows.iterator(chunk_size=chunk_size):
+        stats.add(row)
+        yield row
+
+
+def _csv_safe(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def write_csv(rows, stats=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the CSV export of ``rows`` as UTF-8 bytes, one block per ``chunk_size`` rows."""
+    stats = ExportStats() if stats is None else stats
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for header, _, _ in COLUMNS]).encode()
+    block = []
+    for row in _stream(rows, stats, chunk_size):
+        block.append(writer.writerow([_csv_safe(value) for value in row]))
+        if len(block) >= chunk_size:
+            yield ''.join(block).encode()
+            block = []
+    if block:
+        yield ''.join(block).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the caller as they arrive."""
+
+    def __init__(self):
+        super().__init__()
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data, self.buffer = bytes(self.buffer), bytearray()
+        return data
+
+
+def write_parquet(rows, stats=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a Parquet file of ``rows``, one row group per ``chunk_size`` rows."""
+    if pyarrow is None:
+        raise ExportError(PYARROW_MISSING)
+    stats = ExportStats() if stats is None else stats
+    schema = pyarrow.schema([(header, type_()) for header, _, type_ in COLUMNS])
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        block = []
+        for row in _stream(rows, stats, chunk_size):
+            block.append(row)
+            if len(block) >= chunk_size:
+                writer.write_batch(_record_batch(block, schema))
+                block = []
+                yield sink.take()
+        if block:
+            writer.write_batch(_record_batch(block, schema))
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def _record_batch(block, schema):
+    columns = list(zip(*block))
+    return pyarrow.RecordBatch.from_arrays(
+        [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+    )
+
+
+WRITERS = {'csv': write_csv, 'parquet': write_parquet}
+
+
+def export_bookings(fmt, rows, stats=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Generator of encoded chunks for ``rows`` in format ``fmt`` ('csv' or 'parquet')."""
+    if fmt not in WRITERS:
+        raise ExportError(f'Unknown export format {fmt!r}; choose from {", ".join(WRITERS)}.')
+    if fmt == 'parquet' and pyarrow is None:
+        raise ExportError(PYARROW_MISSING)
+    return WRITERS[fmt](rows, stats=stats, chunk_size=chunk_size)
+
+
+def export_filename(fmt, now=None):
+    now = now or datetime.datetime.now()
+    return f"bookings-{now.strftime('%Y%m%d-%H%M%S')}.{FORMATS[fmt][1]}"
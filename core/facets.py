@@ -0,0 +1,149 @@
+# ============================================
+# core/facets.py
+# ============================================
+"""
+Faceted navigation for the tours page.
+
+Counts per difficulty, price bucket and duration bucket come from a single
+``aggregate()`` over the search results: one ``COUNT(...) FILTER (WHERE ...)``
+per option, so adding an option never adds a query. Each dimension is
+counted with the *other* dimensions' filters applied, so picking "Easy"
+still shows how many moderate tours match, and ``total`` (everything
+applied) stands in for a separate ``count()``.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db.models import Count, Q
+
+from .models import Tour
+
+CENT = Decimal('0.01')
+
+# (low, high): low inclusive, high exclusive; None is unbounded
+PRICE_BUCKETS = [
+    (None, Decimal(2000)),
+    (Decimal(2000), Decimal(4000)),
+    (Decimal(4000), Decimal(6000)),
+    (Decimal(6000), None),
+]
+# (low, high) in days, both inclusive
+DURATION_BUCKETS = [
+    (1, 3),
+    (4, 7),
+    (8, 14),
+    (15, None),
+]
+
+
+@dataclass
+class FacetOption:
+    label: str
+    count: int
+    selected: bool
+    url: str
+
+
+@dataclass
+class Facet:
+    name: str
+    title: str
+    options: list
+
+
+def _price_condition(low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+def _duration_condition(low, high):
+    condition = Q(duration_days__gte=low)
+    if high is not None:
+        condition &= Q(duration_days__lte=high)
+    return condition
+
+
+def _aggregates(search):
+    def others(dimension):
+        return Q(*[q for name, q in search.filters.items() if name != dimension])
+
+    aggregates = {'total': Count('pk', filter=Q(*search.filters.values()))}
+    for value, _ in Tour.DIFFICULTY_CHOICES:
+        aggregates[f'difficulty_{value}'] = Count('pk', filter=others('difficulty') & Q(difficulty=value))
+    for index, bucket in enumerate(PRICE_BUCKETS):
+        aggregates[f'price_{index}'] = Count('pk', filter=others('price') & _price_condition(*bucket))
+    for index, bucket in enumerate(DURATION_BUCKETS):
+        aggregates[f'duration_{index}'] = Count('pk', filter=others('duration') & _duration_condition(*bucket))
+    return aggregates
+
+
+def facet_counts(search):
+    """All facet counts for a ``selectors.CatalogueSearch``, in one query."""
+    return search.matching.order_by().aggregate(**_aggregates(search))
+
+
+async def afacet_counts(search):
+    return await search.matching.order_by().aaggregate(**_aggregates(search))
+
+
+def _money(value):
+    return f'${value:,.0f}'
+
+
+def _price_label(low, high):
+    if low is None:
+        return f'Under {_money(high)}'
+    if high is None:
+        return f'{_money(low)}+'
+    return f'{_money(low)} – {_money(high)}'
+
+
+def _duration_label(low, high):
+    if high is None:
+        return f'{low}+ days'
+    return f'{low}–{high} days'
+
+
+def _toggle_url(params, selected, updates):
+    """Query string for ``params`` (a GET QueryDict) with ``updates`` applied, or removed again if ``selected``."""
+    query = params.copy()
+    query.pop('cursor', None)
+    for name, value in updates.items():
+        query.pop(name, None)
+        if value is not None and not selected:
+            query[name] = str(value)
+    encoded = query.urlencode()
+    return f'?{encoded}' if encoded else '?'
+
+
+def _option(params, label, count, updates):
+    selected = all(params.get(name, '') == ('' if value is None else str(value)) for name, value in updates.items())
+    return FacetOption(label, count, selected, _toggle_url(params, selected, updates))
+
+
+def facet_groups(params, counts):
+    """Template-ready facets: each option's count, whether it's active and the URL toggling it."""
+    difficulty = [
+        _option(params, label, counts[f'difficulty_{value}'], {'difficulty': value})
+        for value, label in Tour.DIFFICULTY_CHOICES
+    ]
+    price = [
+        _option(
+            params, _price_label(low, high), counts[f'price_{index}'],
+            {'min_price': low, 'max_price': None if high is None else high - CENT},
+        )
+        for index, (low, high) in enumerate(PRICE_BUCKETS)
+    ]
+    duration = [
+        _option(params, _duration_label(low, high), counts[f'duration_{index}'], {'min_days': low, 'max_days': high})
+        for index, (low, high) in enumerate(DURATION_BUCKETS)
+    ]
+    return [
+        Facet('difficulty', 'Difficulty', difficulty),
+        Facet('price', 'Price', price),
+        Facet('duration', 'Duration', duration),
+    ]
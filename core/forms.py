@@ -2,9 +2,31 @@
 # core/forms.py
 # ============================================
 from django import forms
+from . import availability
 from .models import Booking, ContactMessage
 
 class BookingForm(forms.ModelForm):
+    def __init__(self, *args, tour=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tour = tour
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date = cleaned_data.get('preferred_date')
+        pax = cleaned_data.get('number_of_people')
+        # Fast O(1) pre-check; the seat claim in Booking.save() is the authoritative one.
+        if self.tour and date and pax:
+            seats_left = availability.seats_left(self.tour, date)
+            if pax > seats_left:
+                raise forms.ValidationError(self.full_departure_message(seats_left))
+        return cleaned_data
+
+    @staticmethod
+    def full_departure_message(seats_left):
+        if seats_left == 0:
+            return 'Sorry, this departure is fully booked. Please choose another date.'
+        return f'Sorry, only {seats_left} seats are left on this date.'
+
     class Meta:
         model = Booking
         fields = ['full_name', 'email', 'phone', 'number_of_people', 'preferred_date', 'special_requests']
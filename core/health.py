@@ -0,0 +1,67 @@
+# ============================================
+# core/health.py
+# ============================================
+"""
+Health check endpoint for load balancers and uptime monitors.
+
+``/healthz`` runs ``SELECT 1`` on every configured database alias (primary
+and replica) and a set/get round trip on the cache. It answers 200 when all
+pass and 503 otherwise, and is never cached. The public response only names
+the failing checks; the exceptions are logged, and shown in the response
+only to staff or to ``Authorization: Bearer <HEALTH_TOKEN>``.
+"""
+import hmac
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+
+logger = logging.getLogger(__name__)
+
+
+def check_database(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def check_cache():
+    cache.set('healthz', 1, 10)
+    if cache.get('healthz') != 1:
+        raise RuntimeError('cache did not return the value just written')
+
+
+def run_checks():
+    checks = {f'database:{alias}': (check_database, alias) for alias in connections}
+    checks['cache'] = (check_cache,)
+    results = {}
+    for name, (check, *args) in checks.items():
+        try:
+            check(*args)
+        except Exception as exc:
+            logger.exception('Health check %s failed', name)
+            results[name] = f'{type(exc).__name__}: {exc}'
+        else:
+            results[name] = 'ok'
+    return results
+
+
+def _may_see_details(request):
+    token = getattr(settings, 'HEALTH_TOKEN', '')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_staff)
+
+
+@never_cache
+def healthz(request):
+    results = run_checks()
+    failing = [name for name, result in results.items() if result != 'ok']
+    payload = {'status': 'error' if failing else 'ok', 'failing': failing}
+    if _may_see_details(request):
+        payload['checks'] = results
+    return JsonResponse(payload, status=503 if failing else 200)
@@ -0,0 +1,183 @@
+# ============================================
+# core/images.py
+# ============================================
+"""
+Responsive image derivatives for Tour.image and TourImage.image.
+
+Every upload is resized to a few widths in WebP (served through <picture>)
+and JPEG (fallback and CSS backgrounds). Derivatives are stored next to the
+original with a content hash in the name, e.g.::
+
+    tours/gallery/lion.3f2a9c1b7e-960w.webp
+
+so they can be cached forever. What was generated is recorded on the
+model's ``image_variants`` JSON field, which is what the template helpers in
+``core.templatetags.core_images`` read -- rendering never asks the storage
+backend whether a file exists. When the image is replaced or the row is
+deleted, the derivatives it no longer lists are removed from storage once
+the transaction commits.
+
+Pillow here has no AVIF encoder, so WebP + JPEG are produced.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+DERIVATIVE_WIDTHS = getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (480, 960, 1600))
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    # key: (Pillow format, extension, save options)
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def _content_hash(data):
+    return hashlib.sha1(data).hexdigest()[:10]
+
+
+# derivative_name(), plus the suffix storages add if the name was taken
+_DERIVATIVE_NAME = re.compile(r'\.[0-9a-f]{10}-\d+w(_[A-Za-z0-9]+)?\.[a-z]+$')
+
+
+def derivative_name(source_name, digest, width, ext):
+    directory, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, f'{stem}.{digest}-{width}w.{ext}')
+
+
+def is_content_addressed(name):
+    """True for derivative names, whose content never changes (safe to cache forever)."""
+    return bool(_DERIVATIVE_NAME.search(name))
+
+
+def _target_widths(original_width):
+    widths = [w for w in DERIVATIVE_WIDTHS if w < original_width]
+    # Small originals still get one re-encoded copy at their own width.
+    return widths or [original_width]
+
+
+def generate_derivatives(field_file):
+    """
+    Build every derivative of ``field_file`` and save them to its storage.
+
+    Returns the dict to store on ``image_variants``.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as fh:
+        data = fh.read()
+    digest = _content_hash(data)
+
+    image = Image.open(io.BytesIO(data))
+    # Let the JPEG decoder downscale while decoding; a 12 MB photo is mostly pixels we drop.
+    image.draft('RGB', (max(DERIVATIVE_WIDTHS), max(DERIVATIVE_WIDTHS)))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    variants = {
+        'source': field_file.name,
+        'width': image.width,
+        'height': image.height,
+    }
+    for key in FORMATS:
+        variants[key] = []
+
+    current = image
+    for width in sorted(_target_widths(image.width), reverse=True):
+        height = round(image.height * width / image.width)
+        # Resize from the previous (larger) step: much cheaper than from the original.
+        current = current.resize((width, height), Image.LANCZOS)
+        for key, (pil_format, ext, options) in FORMATS.items():
+            out = current.convert('RGB') if pil_format == 'JPEG' else current
+            buffer = io.BytesIO()
+            out.save(buffer, pil_format, **options)
+            name = storage.save(
+                derivative_name(field_file.name, digest, width, ext),
+                ContentFile(buffer.getvalue()),
+            )
+            variants[key].append([width, name])
+
+    for key in FORMATS:
+        variants[key].sort()
+    return variants
+
+
+def variant_names(variants):
+    """Storage names of every derivative listed in an ``image_variants`` dict."""
+    return {name for key in FORMATS for _, name in (variants or {}).get(key, [])}
+
+
+def delete_derivatives(storage, names):
+    """Remove derivative files after the current transaction commits (now, outside one)."""
+    def delete():
+        for name in sorted(names):
+            try:
+                storage.delete(name)
+            except OSError:
+                logger.warning('Could not delete image derivative %s', name, exc_info=True)
+
+    if names:
+        transaction.on_commit(delete)
+
+
+def needs_derivatives(instance):
+    if not instance.image:
+        return bool(instance.image_variants)
+    return instance.image_variants.get('source') != instance.image.name
+
+
+def refresh_derivatives(instance, force=False):
+    """
+    (Re)generate derivatives for a Tour or TourImage if its image changed.
+
+    Saves via ``QuerySet.update`` so no save signals fire, but bumps the
+    tour's ``updated_at`` in the same way: the template fragments keyed on
+    it must stop pointing at the previous derivatives, which are deleted
+    once this is committed.
+    """
+    if not force and not needs_derivatives(instance):
+        return False
+    previous = variant_names(instance.image_variants)
+    instance.image_variants = generate_derivatives(instance.image) if instance.image else {}
+    now = timezone.now()
+    model = type(instance)
+    if hasattr(instance, 'updated_at'):  # Tour
+        instance.updated_at = now
+        model.objects.filter(pk=instance.pk).update(image_variants=instance.image_variants, updated_at=now)
+    else:  # TourImage: its gallery is cached with the parent tour
+        model.objects.filter(pk=instance.pk).update(image_variants=instance.image_variants)
+        model._meta.get_field('tour').related_model.objects.filter(pk=instance.tour_id).update(updated_at=now)
+    delete_derivatives(instance.image.storage, previous - variant_names(instance.image_variants))
+    return True
+
+
+# --- Lookups used by the template helpers ---
+
+def variant_urls(instance, fmt):
+    """``[(width, url), ...]`` for ``fmt`` ('webp' or 'jpeg'), smallest first."""
+    variants = instance.image_variants or {}
+    if not instance.image or variants.get('source') != instance.image.name:
+        return []
+    storage = instance.image.storage
+    return [(width, storage.url(name)) for width, name in variants.get(fmt, [])]
+
+
+def best_url(instance, min_width):
+    """URL of the smallest JPEG derivative at least ``min_width`` wide (or the original)."""
+    urls = variant_urls(instance, 'jpeg')
+    for width, url in urls:
+        if width >= min_width:
+            return url
+    if urls:
+        return urls[-1][1]
+    return instance.image.url if instance.image else ''
@@ -0,0 +1,206 @@
+# ============================================
+# core/instrumentation.py
+# ============================================
+"""
+Per-request performance metrics.
+
+``RequestMetricsMiddleware`` (core/middleware.py) opens a ``RequestMetrics``
+record for every request; the hooks below add to it:
+
+* database  -- a ``connection.execute_wrapper`` counts queries and SQL time
+* templates -- ``InstrumentedDjangoTemplates`` times top-level renders
+* cache     -- ``record_cache()`` is called by the page cache
+
+Totals are also accumulated in a small in-process registry exposed in the
+Prometheus text format by the ``metrics`` view. Each gunicorn worker keeps
+its own registry, so scrape each worker (or aggregate in Prometheus).
+"""
+import contextvars
+import hmac
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+# Upper bounds (seconds) of the request duration histogram buckets.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+@dataclass
+class RequestMetrics:
+    started: float = field(default_factory=time.perf_counter)
+    db_queries: int = 0
+    db_time: float = 0.0
+    template_time: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def record_cache(hit):
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+def query_timer(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` hook counting queries and SQL time."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.db_queries += 1
+
+
+# --- Template timing ---
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The stock Django template backend, timing each top-level render."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+# --- Prometheus registry ---
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}   # (view, method, status) -> count
+        self.durations = {}  # view -> [bucket counts..., +Inf count, sum]
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache = {'hit': 0, 'miss': 0}
+
+    def observe(self, view, method, status, metrics, duration):
+        with self.lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            hist = self.durations.setdefault(view, [0] * (len(DURATION_BUCKETS) + 1) + [0.0])
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    hist[i] += 1
+            hist[len(DURATION_BUCKETS)] += 1
+            hist[-1] += duration
+            self.db_queries += metrics.db_queries
+            self.db_seconds += metrics.db_time
+            self.template_seconds += metrics.template_time
+            self.cache['hit'] += metrics.cache_hits
+            self.cache['miss'] += metrics.cache_misses
+
+    def render(self, extra_gauges=()):
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self.lock:
+            metric('mmsafaris_requests_total', 'counter', 'HTTP requests handled.')
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f'mmsafaris_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}')
+
+            metric('mmsafaris_request_duration_seconds', 'histogram', 'Request wall time.')
+            for view, hist in sorted(self.durations.items()):
+                for i, bound in enumerate(DURATION_BUCKETS):
+                    lines.append(f'mmsafaris_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {hist[i]}')
+                count = hist[len(DURATION_BUCKETS)]
+                lines.append(f'mmsafaris_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {count}')
+                lines.append(f'mmsafaris_request_duration_seconds_sum{{view="{view}"}} {hist[-1]:.6f}')
+                lines.append(f'mmsafaris_request_duration_seconds_count{{view="{view}"}} {count}')
+
+            metric('mmsafaris_db_queries_total', 'counter', 'SQL queries issued while serving requests.')
+            lines.append(f'mmsafaris_db_queries_total {self.db_queries}')
+            metric('mmsafaris_db_seconds_total', 'counter', 'Time spent in SQL while serving requests.')
+            lines.append(f'mmsafaris_db_seconds_total {self.db_seconds:.6f}')
+            metric('mmsafaris_template_seconds_total', 'counter', 'Time spent rendering templates.')
+            lines.append(f'mmsafaris_template_seconds_total {self.template_seconds:.6f}')
+            metric('mmsafaris_page_cache_total', 'counter', 'Catalogue page cache lookups.')
+            for result, count in self.cache.items():
+                lines.append(f'mmsafaris_page_cache_total{{result="{result}"}} {count}')
+
+        for name, help_text, value in extra_gauges:
+            metric(name, 'gauge', help_text)
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _may_scrape(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_staff)
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint: a 404 unless REQUEST_METRICS_ENABLED, and only
+    for ``Authorization: Bearer <METRICS_TOKEN>`` or logged-in staff.
+    """
+    if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+        raise Http404
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+
+    from .mail import queue_stats
+
+    outbox = queue_stats()
+    gauges = [
+        ('mmsafaris_outbox_queued', 'Emails waiting in the outbox.', outbox['queued']),
+        ('mmsafaris_outbox_failed', 'Emails that exhausted their retries.', outbox['failed']),
+        ('mmsafaris_outbox_oldest_queued_seconds', 'Age of the oldest queued email.', f"{outbox['oldest_queued_age']:.0f}"),
+    ]
+    return HttpResponse(registry.render(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
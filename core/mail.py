@@ -0,0 +1,174 @@
+# ============================================
+# core/mail.py
+# ============================================
+"""
+Transactional outbox for outgoing email.
+
+Views call ``queue_mail`` (same arguments as ``send_mail``) inside the
+transaction that saves the Booking/ContactMessage, so a message is queued
+if and only if the record exists; bulk status changes use
+``queue_mass_mail`` (as ``send_mass_mail``). ``deliver_due`` is run by the
+``send_queued_mail`` worker: it leases a batch of due rows, sends them over
+a single SMTP connection and reschedules failures with exponential backoff.
+
+Async views may also call ``deliver_soon()`` after a submission to start a
+delivery run in the background without delaying the response.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+RETRY_BASE_SECONDS = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 60)
+RETRY_MAX_SECONDS = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 6 * 60 * 60)
+# A leased row becomes due again if its worker dies before recording the result.
+LEASE_SECONDS = getattr(settings, 'OUTBOX_LEASE_SECONDS', 300)
+DELIVER_ON_SUBMIT = getattr(settings, 'OUTBOX_DELIVER_ON_SUBMIT', False)
+
+logger = logging.getLogger(__name__)
+
+# Strong references to running background deliveries (the loop only keeps weak ones).
+_background = set()
+
+
+def queue_mail(subject, message, recipient_list, from_email=None):
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=','.join(recipient_list),
+    )
+
+
+def queue_mass_mail(datatuple):
+    """
+    Queue many messages with one INSERT per batch; ``datatuple`` is as for
+    ``send_mass_mail``: ``(subject, message, from_email, recipient_list)``.
+    """
+    return OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            subject=subject,
+            body=message,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            recipients=','.join(recipient_list),
+        )
+        for subject, message, from_email, recipient_list in datatuple
+    ], batch_size=500)
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next try after ``attempts`` failures."""
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+def _lease_due(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        due = (
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='queued', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+        )
+        ids = list(due.values_list('pk', flat=True)[:batch_size])
+        OutboundEmail.objects.filter(pk__in=ids).update(
+            next_attempt_at=now + timedelta(seconds=LEASE_SECONDS)
+        )
+    return list(OutboundEmail.objects.filter(pk__in=ids))
+
+
+def deliver_due(batch_size=100, connection=None):
+    """Send one batch of due messages. Returns ``(sent, failed)`` counts."""
+    batch = _lease_due(batch_size)
+    if not batch:
+        return 0, 0
+
+    connection = connection or get_connection()
+    sent = []
+    failed = []
+    try:
+        connection.open()
+    except Exception as exc:
+        # SMTP down or login refused: the whole batch is retried with backoff.
+        logger.warning('Could not connect to the mail server', exc_info=True)
+        for email in batch:
+            email.last_error = f'{type(exc).__name__}: {exc}'
+        failed = batch
+    else:
+        try:
+            for email in batch:
+                message = EmailMessage(
+                    email.subject, email.body, email.from_email, email.recipient_list(),
+                    connection=connection,
+                )
+                try:
+                    connection.send_messages([message])
+                except Exception as exc:
+                    email.last_error = f'{type(exc).__name__}: {exc}'
+                    failed.append(email)
+                else:
+                    sent.append(email)
+        finally:
+            connection.close()
+
+    now = timezone.now()
+    OutboundEmail.objects.filter(pk__in=[e.pk for e in sent]).update(
+        status='sent', sent_at=now, last_error=''
+    )
+    for email in failed:
+        email.attempts += 1
+        if email.attempts >= MAX_ATTEMPTS:
+            email.status = 'failed'
+        else:
+            email.next_attempt_at = now + timedelta(seconds=retry_delay(email.attempts))
+    OutboundEmail.objects.bulk_update(failed, ['attempts', 'status', 'next_attempt_at', 'last_error'])
+    return len(sent), len(failed)
+
+
+def _deliver_in_thread():
+    close_old_connections()
+    try:
+        return deliver_due()
+    except Exception:
+        # The rows stay queued (or leased) and the worker retries them.
+        logger.exception('Background mail delivery failed')
+    finally:
+        connections.close_all()
+
+
+def deliver_soon():
+    """
+    Start a delivery run on a worker thread and return at once (async views only).
+
+    Leasing makes this safe to run alongside the ``send_queued_mail`` worker,
+    which still picks up anything a background run misses. Returns the task,
+    or None when ``OUTBOX_DELIVER_ON_SUBMIT`` is off.
+    """
+    if not DELIVER_ON_SUBMIT:
+        return None
+    task = asyncio.get_running_loop().create_task(
+        sync_to_async(_deliver_in_thread, thread_sensitive=False)()
+    )
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+def queue_stats():
+    """Queue depth per status plus the age in seconds of the oldest queued row."""
+    counts = dict(
+        OutboundEmail.objects.values_list('status').annotate(n=Count('pk')).order_by()
+    )
+    stats = {status: counts.get(status, 0) for status, _ in OutboundEmail.STATUS_CHOICES}
+    oldest = OutboundEmail.objects.filter(status='queued').aggregate(oldest=Min('created_at'))['oldest']
+    stats['oldest_queued_age'] = (timezone.now() - oldest).total_seconds() if oldest else 0
+    return stats
@@ -0,0 +1,52 @@
+"""
+Move old finished bookings and contact messages into the archive tables.
+Usage: python manage.py archive_old_records [--bookings-days 365] [--messages-days 365]
+                                            [--batch-size 1000] [--max-batches N] [--sleep 0]
+
+Completed/cancelled bookings and contact messages created more than the
+given number of days ago (ARCHIVE_BOOKINGS_AFTER_DAYS /
+ARCHIVE_MESSAGES_AFTER_DAYS by default) are copied to ArchivedBooking /
+ArchivedContactMessage and deleted, one short transaction per batch. Safe
+to stop at any point (or cap with --max-batches) and run again later: it
+carries on with what is left. Archived rows are read-only in the admin.
+"""
+
+import itertools
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = 'Archives old completed/cancelled bookings and contact messages in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings-days', type=int, default=None,
+                            help=f'Archive bookings older than this (default {archive.ARCHIVE_BOOKINGS_AFTER_DAYS})')
+        parser.add_argument('--messages-days', type=int, default=None,
+                            help=f'Archive messages older than this (default {archive.ARCHIVE_MESSAGES_AFTER_DAYS})')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows moved per transaction (default 1000)')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches per table (default: until done)')
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches (default 0)')
+
+    def handle(self, *args, **options):
+        jobs = [
+            ('bookings', archive.archive_bookings(options['bookings_days'], options['batch_size'])),
+            ('contact messages', archive.archive_messages(options['messages_days'], options['batch_size'])),
+        ]
+        try:
+            for label, batches in jobs:
+                moved = 0
+                for count in itertools.islice(batches, options['max_batches']):
+                    moved += count
+                    self.stdout.write(f'Archived {moved} {label}...')
+                    if options['sleep']:
+                        time.sleep(options['sleep'])
+                self.stdout.write(self.style.SUCCESS(f'Archived {moved} {label}.'))
+        except KeyboardInterrupt:
+            self.stderr.write('Interrupted; completed batches are kept, run again to continue.')
@@ -0,0 +1,24 @@
+"""
+Concatenate and minify the CSS/JS bundles and extract the critical CSS.
+Usage: python manage.py build_assets
+
+Writes static/dist/site.css, site.js and critical.css (see core/assets.py).
+Run before collectstatic, which then hashes and compresses them.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import assets
+
+
+class Command(BaseCommand):
+    help = 'Builds minified CSS/JS bundles and critical CSS into static/dist/'
+
+    def handle(self, *args, **kwargs):
+        try:
+            sizes = assets.build_all()
+        except FileNotFoundError as exc:
+            raise CommandError(str(exc)) from exc
+        for path, size in sizes.items():
+            self.stdout.write(f'  ✓ {path} ({size / 1024:.1f} KiB)')
+        self.stdout.write(self.style.SUCCESS('Assets built.'))
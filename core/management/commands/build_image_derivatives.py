@@ -0,0 +1,81 @@
+"""
+Generate responsive image derivatives for existing tour and gallery images.
+Usage: python manage.py build_image_derivatives [--workers 4] [--force]
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import images
+from core.cache import invalidate_catalogue
+from core.models import Tour, TourImage
+
+
+def _init_worker():
+    # Needed under the "spawn" start method; a no-op when forked.
+    django.setup()
+
+
+def _build(model_label, pk, force):
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return model_label, pk, 'missing'
+    try:
+        changed = images.refresh_derivatives(instance, force=force)
+    except OSError as exc:
+        return model_label, pk, f'error: {exc}'
+    return model_label, pk, 'built' if changed else 'up to date'
+
+
+class Command(BaseCommand):
+    help = 'Builds WebP/JPEG derivatives for tour and gallery images using a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Worker processes (default: number of CPUs)')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild even if derivatives are already up to date')
+
+    def handle(self, *args, **options):
+        jobs = [
+            (model._meta.label, pk)
+            for model in (Tour, TourImage)
+            for pk in model.objects.exclude(image='').exclude(image=None).values_list('pk', flat=True)
+        ]
+        if not jobs:
+            self.stdout.write('No images to process.')
+            return
+
+        self.stdout.write(f'Processing {len(jobs)} images with {options["workers"]} workers...')
+        totals = {}
+        for label, pk, outcome in self.run_jobs(jobs, options['workers'], options['force']):
+            kind = outcome.split(':')[0]
+            totals[kind] = totals.get(kind, 0) + 1
+            if kind == 'error':
+                self.stderr.write(f'  ✗ {label} #{pk}: {outcome}')
+
+        if totals.get('built'):
+            # Saved with QuerySet.update, so no signal did this: cached pages
+            # and API validators must pick up the new variant URLs.
+            invalidate_catalogue()
+        summary = ', '.join(f'{count} {outcome}' for outcome, count in sorted(totals.items()))
+        self.stdout.write(self.style.SUCCESS(f'Done: {summary}'))
+
+    def run_jobs(self, jobs, workers, force):
+        if workers <= 1:
+            for label, pk in jobs:
+                yield _build(label, pk, force)
+            return
+
+        # Forked children must not share the parent's database sockets.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(_build, label, pk, force) for label, pk in jobs]
+            for future in as_completed(futures):
+                yield future.result()
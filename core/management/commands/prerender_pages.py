@@ -0,0 +1,29 @@
+"""
+Prerender home, about, tours and every tour page to static HTML snapshots.
+Usage: python manage.py prerender_pages [--full]
+
+Only tours created or changed since the last build are re-rendered (plus the
+listing pages when any tour changed); snapshots of deleted or renamed tours
+are removed. Use --full after a deploy that changes templates or assets.
+Files go to PRERENDER_DIR and are served by PrerenderedPagesMiddleware.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core import prerender
+
+
+class Command(BaseCommand):
+    help = 'Writes static HTML snapshots of the catalogue pages for anonymous visitors and crawlers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-render every page, not just changed tours')
+
+    def handle(self, *args, **options):
+        result = prerender.build(full=options['full'])
+        for url in result.skipped:
+            self.stderr.write(f'Skipped {url} (error or cookie-setting response)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Prerendered {len(result.rendered)} pages, removed {len(result.removed)} '
+            f'into {prerender.PRERENDER_DIR}.'
+        ))
@@ -0,0 +1,46 @@
+"""
+Delete expired rows from the session table in small batches.
+Usage: python manage.py purge_sessions [--batch-size 1000] [--sleep 0]
+
+Unlike ``clearsessions`` (one DELETE over the whole table) each batch is its
+own short statement, so a large backlog doesn't lock the table or bloat the
+transaction log. Run it daily from cron. Rows are left behind even with the
+signed_cookies backend if the site used the database before, so the table
+is purged whatever SESSION_ENGINE is.
+"""
+
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+def session_model():
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    return store.get_model_class() if hasattr(store, 'get_model_class') else Session
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired sessions in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Sessions deleted per statement (default 1000)')
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches (default 0)')
+
+    def handle(self, *args, **options):
+        model = session_model()
+        expired = model.objects.filter(expire_date__lt=timezone.now())
+        deleted = 0
+        while True:
+            keys = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += model.objects.filter(pk__in=keys).delete()[0]
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired sessions.'))
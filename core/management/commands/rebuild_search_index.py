@@ -0,0 +1,26 @@
+"""
+Rebuild the tours full-text search index from scratch.
+Usage: python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core import search
+from core.models import Tour
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for all tours'
+
+    def handle(self, *args, **kwargs):
+        if not search.is_supported(connection):
+            self.stdout.write(self.style.WARNING(
+                f'Full-text search is not supported on {connection.vendor}; nothing to do.'
+            ))
+            return
+
+        with transaction.atomic():
+            tours = Tour.objects.prefetch_related('itinerary').iterator(chunk_size=500)
+            count = search.rebuild_index(tours)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} tours.'))
@@ -0,0 +1,19 @@
+"""
+Recompute the per-tour statistics table from the bookings table.
+Usage: python manage.py rebuild_tour_stats
+
+Stats are kept up to date incrementally as bookings change; run this after
+bulk imports, price changes, or nightly to roll next departures forward.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core import stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds TourStats (bookings, travellers, revenue, popularity) for every tour'
+
+    def handle(self, *args, **kwargs):
+        count = stats.rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} tours.'))
@@ -0,0 +1,59 @@
+"""
+Deliver queued outbound email.
+Usage: python manage.py send_queued_mail [--loop] [--batch-size 100] [--stats]
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import mail
+
+logger = logging.getLogger('core.mail')
+
+
+class Command(BaseCommand):
+    help = 'Sends queued emails from the outbox over a single SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Messages sent per SMTP connection (default 100)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the outbox instead of exiting when it is empty')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep between polls in --loop mode (default 5)')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print queue depth and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats()
+            return
+
+        try:
+            while True:
+                try:
+                    sent, failed = mail.deliver_due(batch_size=options['batch_size'])
+                except Exception:
+                    if not options['loop']:
+                        raise
+                    # e.g. the database went away; leased rows come due again
+                    logger.exception('Mail delivery run failed')
+                    sent = failed = 0
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent}, failed {failed}')
+                    continue  # drain the backlog before sleeping
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.print_stats()
+
+    def print_stats(self):
+        stats = mail.queue_stats()
+        self.stdout.write(
+            f"Outbox: {stats['queued']} queued, {stats['sent']} sent, {stats['failed']} failed "
+            f"(oldest queued {stats['oldest_queued_age']:.0f}s)"
+        )
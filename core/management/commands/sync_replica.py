@@ -0,0 +1,38 @@
+"""
+Copy the primary SQLite database over the replica file.
+Usage: python manage.py sync_replica
+
+For local development with DATABASE_REPLICA_URL pointing at a second SQLite
+file: the copy plays the part of replication, so pages read stale catalogue
+data until the next sync -- except right after a POST, when the visitor is
+pinned to the primary.
+"""
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.routers import REPLICA_DB_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database to the SQLite replica (local replication stand-in)'
+
+    def handle(self, *args, **kwargs):
+        if not replica_configured():
+            raise CommandError('No replica database is configured (set DATABASE_REPLICA_URL).')
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[REPLICA_DB_ALIAS]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('sync_replica only copies SQLite databases; use real replication elsewhere.')
+        if primary.settings_dict['NAME'] == replica.settings_dict['NAME']:
+            self.stdout.write(self.style.WARNING('The replica is the primary file; nothing to copy.'))
+            return
+
+        replica.close()
+        primary.ensure_connection()
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(self.style.SUCCESS(f"Copied {primary.settings_dict['NAME']} to {replica.settings_dict['NAME']}."))
@@ -0,0 +1,26 @@
+"""
+Download the pinned third-party CSS/JS/fonts into static/vendor/ so they are
+served (hashed, compressed) from our own origin instead of four CDNs.
+Usage: python manage.py vendor_assets
+
+Runs at build time (see build.sh); needs network access.
+"""
+
+from urllib.error import URLError
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import assets
+
+
+class Command(BaseCommand):
+    help = 'Downloads pinned Bootstrap, Font Awesome, Swiper and Google Fonts files into static/vendor/'
+
+    def handle(self, *args, **kwargs):
+        try:
+            files = assets.vendor_all()
+        except URLError as exc:
+            raise CommandError(f'Could not download vendor assets: {exc}') from exc
+        for path in files:
+            self.stdout.write(f'  ✓ {path}')
+        self.stdout.write(self.style.SUCCESS(f'Vendored {len(files)} files.'))
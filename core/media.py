@@ -0,0 +1,174 @@
+# ============================================
+# core/media.py
+# ============================================
+"""
+Serving uploaded media from local disk (deployments without S3).
+
+``MEDIA_SERVE_MODE`` picks who sends the bytes:
+
+* ``django`` (default): a ``FileResponse``. Under gunicorn this goes through
+  ``wsgi.file_wrapper`` and ``sendfile()``, so the worker never copies the
+  file; ``Range`` requests get ``206`` with just the requested bytes.
+* ``x-accel``: nginx sends it. The response carries
+  ``X-Accel-Redirect: <MEDIA_ACCEL_PREFIX><path>``; nginx needs an internal
+  location for that prefix::
+
+      location /protected-media/ { internal; alias /srv/mmsafaris/media/; }
+
+* ``x-sendfile``: Apache (mod_xsendfile) or lighttpd sends the file named
+  in ``X-Sendfile``.
+
+Every mode answers conditional requests (``ETag`` from mtime and size,
+``Last-Modified``) with ``304`` before the file is opened. Derivatives have
+a content hash in their name (``core.images``) and are cached as
+``immutable`` for a year; other files for ``MEDIA_CACHE_MAX_AGE``.
+"""
+import mimetypes
+import os
+import re
+import stat as stat_module
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .images import is_content_addressed
+
+MEDIA_SERVE_MODE = getattr(settings, 'MEDIA_SERVE_MODE', 'django')
+MEDIA_ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def parse_range(header, size):
+    """
+    ``(start, length)`` for a single-range ``Range`` header, or None to send
+    the whole file (no header, several ranges, or one we don't understand).
+    Raises RangeNotSatisfiable if the range lies outside the file.
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes
+        length = min(int(last), size)
+        if length == 0:
+            raise RangeNotSatisfiable(header)
+        return size - length, length
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, end - start + 1
+
+
+def _read_range(filelike, length, block_size):
+    while length > 0:
+        chunk = filelike.read(min(block_size, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        yield chunk
+
+
+class RangeFileResponse(FileResponse):
+    """``206 Partial Content`` with bytes ``[start, start + length)`` of a file."""
+
+    status_code = 206
+
+    def __init__(self, filelike, start, length, size, **kwargs):
+        self.range = (start, length)
+        super().__init__(filelike, **kwargs)
+        self['Content-Range'] = f'bytes {start}-{start + length - 1}/{size}'
+
+    def _set_streaming_content(self, value):
+        if not hasattr(value, 'read'):
+            # Middleware re-wrapping the already limited iterator
+            return StreamingHttpResponse._set_streaming_content(self, value)
+        start, length = self.range
+        value.seek(start)
+        super()._set_streaming_content(value)
+        # wsgi.file_wrapper (gunicorn's sendfile) starts at the file position
+        # and stops at Content-Length; servers iterating the response get
+        # exactly the range too.
+        file_to_stream = self.file_to_stream
+        StreamingHttpResponse._set_streaming_content(self, _read_range(value, length, self.block_size))
+        self.file_to_stream = file_to_stream
+        self['Content-Length'] = str(length)
+
+
+def _cache_headers(response, name, stat):
+    response['ETag'] = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    if is_content_addressed(name):
+        response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={MEDIA_CACHE_MAX_AGE}'
+    return response
+
+
+def _offload(response, name, path):
+    if MEDIA_SERVE_MODE == 'x-accel':
+        response['X-Accel-Redirect'] = quote(MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + name)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('No such file')
+    if not stat_module.S_ISREG(stat.st_mode):
+        raise Http404('No such file')
+
+    headers = _cache_headers(HttpResponse(), path, stat)
+    # Returns ``headers`` itself unless it is a 304 or 412
+    conditional = get_conditional_response(
+        request, etag=headers['ETag'], last_modified=int(stat.st_mtime), response=headers,
+    )
+    if conditional is not headers:
+        return conditional
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    if content_type is None or encoding:
+        content_type = 'application/octet-stream'  # never let a .gz be decoded on the fly
+    if MEDIA_SERVE_MODE in ('x-accel', 'x-sendfile'):
+        # The front-end server handles Range itself.
+        response = HttpResponse(content_type=content_type)
+        return _cache_headers(_offload(response, path, full_path), path, stat)
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if if_range is None or if_range in (headers['ETag'], headers['Last-Modified']):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    filelike = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(filelike, content_type=content_type)
+    else:
+        response = RangeFileResponse(filelike, *byte_range, stat.st_size, content_type=content_type)
+    return _cache_headers(response, path, stat)
@@ -0,0 +1,259 @@
+# ============================================
+# core/middleware.py
+# ============================================
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import NoReverseMatch, reverse
+
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import instrumentation, prerender, routers
+from .cache import is_cacheable_request, vary_on_cookie
+
+logger = logging.getLogger('core.requests')
+
+try:
+    from pyinstrument import Profiler as _Pyinstrument
+except ImportError:  # optional dependency
+    _Pyinstrument = None
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can also sit in an async middleware chain.
+
+    WhiteNoise 6 is sync-only, and one sync middleware makes Django run the
+    whole request, async views included, on a thread under ASGI. Static
+    files are still served synchronously (the file is opened and streamed
+    by the server); everything else is awaited.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let GET/HEAD requests read the catalogue from the replica (``core.routers``).
+
+    Unsafe requests set a cookie that keeps the visitor on the primary for
+    ``REPLICA_STICKY_SECONDS``; the admin always uses the primary.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not routers.replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self._admin_prefix = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def use_replica(self, request):
+        if request.method not in ('GET', 'HEAD') or routers.STICKY_COOKIE in request.COOKIES:
+            return False
+        if self._admin_prefix is None:
+            try:
+                self._admin_prefix = reverse('admin:index')
+            except NoReverseMatch:  # URLconf without the admin
+                self._admin_prefix = ''
+        return not (self._admin_prefix and request.path.startswith(self._admin_prefix))
+
+    @staticmethod
+    def stick_to_primary(request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                routers.STICKY_COOKIE, '1', max_age=routers.STICKY_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routers.replica_reads(self.use_replica(request)):
+            response = self.get_response(request)
+        return self.stick_to_primary(request, response)
+
+    async def __acall__(self, request):
+        with routers.replica_reads(self.use_replica(request)):
+            response = await self.get_response(request)
+        return self.stick_to_primary(request, response)
+
+
+class PrerenderedPagesMiddleware:
+    """
+    Serve ``prerender_pages`` snapshots (``core.prerender``) to anonymous
+    GET/HEAD requests without a query string, before sessions, views or the
+    database are touched. Anything else, or a page without a snapshot, goes
+    through to the view.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # autorefresh: snapshots are rewritten and deleted while we run
+        self.pages = WhiteNoise(
+            None, root=prerender.PRERENDER_DIR, autorefresh=True, index_file=True,
+            allow_all_origins=False, add_headers_function=prerender.add_headers,
+        )
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def find_page(self, request):
+        if (
+            not request.path_info.endswith('/')
+            or request.META.get('QUERY_STRING')
+            or request.headers.get(prerender.BYPASS_HEADER)
+            or not is_cacheable_request(request)
+        ):
+            return None
+        return self.pages.find_file(request.path_info)
+
+    @staticmethod
+    def serve(page, request):
+        # Added here rather than in prerender.add_headers: WhiteNoise replaces
+        # Vary with Accept-Encoding for files that have a .gz copy.
+        return vary_on_cookie(WhiteNoiseMiddleware.serve(page, request))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        page = self.find_page(request)
+        if page is not None:
+            return self.serve(page, request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        page = self.find_page(request)
+        if page is not None:
+            return self.serve(page, request)
+        return await self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record wall time, SQL count/time, template time and cache hits per request.
+
+    Results go to a ``Server-Timing`` header, one JSON log line on the
+    ``core.requests`` logger and the ``/metrics`` registry. A sampled share
+    of requests is profiled and the profile kept if the request was slow.
+
+    Disabled unless ``REQUEST_METRICS_ENABLED``; Django then drops the
+    middleware from the stack at startup, so it costs nothing. It is
+    sync-only (query timing hooks the request thread's connections), so
+    under ASGI enabling it puts each request on a thread.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_PROFILE_SAMPLE_RATE
+        self.slow_seconds = settings.REQUEST_PROFILE_SLOW_MS / 1000
+        self.profile_dir = Path(settings.REQUEST_PROFILE_DIR)
+
+    def __call__(self, request):
+        metrics, token = instrumentation.start_request()
+        profiler = self._start_profiler() if self.sample_rate and random.random() < self.sample_rate else None
+        try:
+            with ExitStack() as stack:
+                # Aliases can share a connection (test mirrors); wrap each once.
+                for conn in {id(conn): conn for conn in connections.all()}.values():
+                    stack.enter_context(conn.execute_wrapper(instrumentation.query_timer))
+                response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        duration = metrics.elapsed()
+
+        view = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        response['Server-Timing'] = self._server_timing(metrics, duration)
+        instrumentation.registry.observe(view, request.method, response.status_code, metrics, duration)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'db_queries': metrics.db_queries,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'template_ms': round(metrics.template_time * 1000, 2),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+        }))
+
+        if profiler is not None:
+            self._finish_profiler(profiler, request, view, duration)
+        return response
+
+    @staticmethod
+    def _server_timing(metrics, duration):
+        parts = [
+            f'app;dur={duration * 1000:.1f}',
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries"',
+            f'tpl;dur={metrics.template_time * 1000:.1f}',
+        ]
+        if metrics.cache_hits or metrics.cache_misses:
+            parts.append(f'cache;desc="{"hit" if metrics.cache_hits else "miss"}"')
+        return ', '.join(parts)
+
+    # --- Sampling profiler ---
+
+    @staticmethod
+    def _start_profiler():
+        if _Pyinstrument is not None:
+            profiler = _Pyinstrument()
+            profiler.start()
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def _finish_profiler(self, profiler, request, view, duration):
+        if _Pyinstrument is not None:
+            profiler.stop()
+        else:
+            profiler.disable()
+        if duration < self.slow_seconds:
+            return
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        stem = f'{time.strftime("%Y%m%d-%H%M%S")}-{view.replace(":", "_")}-{int(duration * 1000)}ms'
+        if _Pyinstrument is not None:
+            (self.profile_dir / f'{stem}.html').write_text(profiler.output_html())
+        else:
+            profiler.dump_stats(self.profile_dir / f'{stem}.prof')
+        logger.warning('Slow request %s %s took %.0fms; profile saved as %s',
+                       request.method, request.path, duration * 1000, stem)
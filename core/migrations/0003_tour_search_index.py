@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Frozen copy of the index schema and documents as of this migration; later
+# changes to core.search must not change what it creates.
+POSTGRES_TABLE = 'core_tour_search'
+SQLITE_TABLE = 'core_tour_fts'
+
+
+def document(tour):
+    parts = [tour.description]
+    for day in tour.itinerary.order_by('day_number'):
+        parts.extend([day.title, day.description, day.accommodation])
+    return tour.name, '\n'.join(p for p in parts if p)
+
+
+def create_and_populate(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ('
+            '  tour_id bigint PRIMARY KEY REFERENCES core_tour (id) ON DELETE CASCADE'
+            '    DEFERRABLE INITIALLY DEFERRED,'
+            '  document tsvector NOT NULL'
+            ')'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_gin '
+            f'ON {POSTGRES_TABLE} USING gin (document)'
+        )
+        insert = (
+            f'INSERT INTO {POSTGRES_TABLE} (tour_id, document) VALUES (%s, '
+            "setweight(to_tsvector('english', %s), 'A') || "
+            "setweight(to_tsvector('english', %s), 'B')) "
+            'ON CONFLICT (tour_id) DO UPDATE SET document = EXCLUDED.document'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} '
+            "USING fts5(name, body, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(f'DELETE FROM {SQLITE_TABLE}')
+        insert = f'INSERT INTO {SQLITE_TABLE} (rowid, name, body) VALUES (%s, %s, %s)'
+    else:
+        return
+
+    Tour = apps.get_model('core', 'Tour')
+    with schema_editor.connection.cursor() as cursor:
+        for tour in Tour.objects.all():
+            cursor.execute(insert, [tour.pk, *document(tour)])
+
+
+def drop(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {POSTGRES_TABLE}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_booking_status_itineraryday_tourimage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_and_populate, drop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['-featured', '-created_at', '-id'], name='tour_listing_order_idx'),
+        ),
+    ]
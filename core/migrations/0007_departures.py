@@ -0,0 +1,63 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+SEAT_HOLDING_STATUSES = ('pending', 'confirmed', 'paid', 'completed')
+
+
+def backfill_departures(apps, schema_editor):
+    Booking = apps.get_model('core', 'Booking')
+    Departure = apps.get_model('core', 'Departure')
+    totals = (
+        Booking.objects.filter(status__in=SEAT_HOLDING_STATUSES)
+        .values('tour_id', 'preferred_date', 'tour__max_group_size')
+        .annotate(pax=models.Sum('number_of_people'))
+        .order_by()
+    )
+    Departure.objects.bulk_create([
+        Departure(
+            tour_id=row['tour_id'],
+            date=row['preferred_date'],
+            capacity=row['tour__max_group_size'],
+            seats_taken=row['pax'],
+        )
+        for row in totals
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Departure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('capacity', models.PositiveIntegerField(help_text="Copied from the tour's max group size when created")),
+                ('seats_taken', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['tour', 'preferred_date', 'status'], name='booking_departure_idx'),
+        ),
+        migrations.AddField(
+            model_name='departure',
+            name='tour',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departures', to='core.tour'),
+        ),
+        migrations.AddConstraint(
+            model_name='departure',
+            constraint=models.UniqueConstraint(fields=('tour', 'date'), name='unique_tour_departure'),
+        ),
+        migrations.RunPython(backfill_departures, migrations.RunPython.noop),
+    ]
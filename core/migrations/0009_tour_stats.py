@@ -0,0 +1,71 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+STATUSES = ('pending', 'confirmed', 'paid', 'completed', 'cancelled')
+SEAT_HOLDING_STATUSES = ('pending', 'confirmed', 'paid', 'completed')
+REVENUE_STATUSES = ('confirmed', 'paid', 'completed')
+
+
+def backfill_tour_stats(apps, schema_editor):
+    Tour = apps.get_model('core', 'Tour')
+    Booking = apps.get_model('core', 'Booking')
+    TourStats = apps.get_model('core', 'TourStats')
+    money = models.DecimalField(max_digits=14, decimal_places=2)
+    totals = {
+        row['tour_id']: row
+        for row in Booking.objects.values('tour_id').annotate(
+            **{f'bookings_{s}': models.Count('id', filter=models.Q(status=s)) for s in STATUSES},
+            pax=models.Sum('number_of_people', filter=models.Q(status__in=SEAT_HOLDING_STATUSES)),
+            revenue=models.Sum(
+                models.F('number_of_people') * models.F('tour__price'),
+                filter=models.Q(status__in=REVENUE_STATUSES), output_field=money,
+            ),
+        ).order_by()
+    }
+    rows = []
+    for tour_id in Tour.objects.values_list('pk', flat=True):
+        row = totals.get(tour_id, {})
+        counts = {f'bookings_{s}': row.get(f'bookings_{s}', 0) for s in STATUSES}
+        rows.append(TourStats(
+            tour_id=tour_id,
+            pax=row.get('pax') or 0,
+            revenue=row.get('revenue') or 0,
+            popularity=sum(counts.values()) - counts['bookings_cancelled'],
+            **counts,
+        ))
+    TourStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourStats',
+            fields=[
+                ('tour', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='core.tour')),
+                ('bookings_pending', models.PositiveIntegerField(default=0)),
+                ('bookings_confirmed', models.PositiveIntegerField(default=0)),
+                ('bookings_paid', models.PositiveIntegerField(default=0)),
+                ('bookings_completed', models.PositiveIntegerField(default=0)),
+                ('bookings_cancelled', models.PositiveIntegerField(default=0)),
+                ('pax', models.PositiveIntegerField(default=0, help_text='Travellers on seat-holding bookings')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('popularity', models.PositiveIntegerField(default=0, help_text='Bookings that are not cancelled')),
+                ('next_departure', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'tour stats',
+                'indexes': [models.Index(fields=['-popularity', '-tour'], name='tourstats_popularity_idx')],
+            },
+        ),
+        # next_departure is filled in by `manage.py rebuild_tour_stats`
+        migrations.RunPython(backfill_tour_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_tour_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['difficulty', 'price'], name='tour_difficulty_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['duration_days'], name='tour_duration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['max_group_size'], name='tour_group_size_idx'),
+        ),
+    ]
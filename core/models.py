@@ -1,10 +1,12 @@
 # ============================================
 # core/models.py
 # ============================================
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.utils.text import slugify
 from django.urls import reverse
+from django.utils import timezone
 
 class Tour(models.Model):
     DIFFICULTY_CHOICES = [
@@ -21,6 +23,7 @@ class Tour(models.Model):
     difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES)
     max_group_size = models.PositiveIntegerField(default=12)
     image = models.ImageField(upload_to='tours/', blank=True, null=True) # Main thumbnail
+    image_variants = models.JSONField(default=dict, blank=True, editable=False) # Resized copies, see core/images.py
     featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -38,11 +41,20 @@ class Tour(models.Model):
 
     class Meta:
         ordering = ['-featured', '-created_at']
+        indexes = [
+            # Matches the tours page keyset ordering (Meta.ordering + id tie-break)
+            models.Index(fields=['-featured', '-created_at', '-id'], name='tour_listing_order_idx'),
+            # Tours page facet filters (difficulty + price, duration range, group size)
+            models.Index(fields=['difficulty', 'price'], name='tour_difficulty_price_idx'),
+            models.Index(fields=['duration_days'], name='tour_duration_idx'),
+            models.Index(fields=['max_group_size'], name='tour_group_size_idx'),
+        ]
 
 # New Model: Gallery Images
 class TourImage(models.Model):
     tour = models.ForeignKey(Tour, related_name='gallery_images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='tours/gallery/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     caption = models.CharField(max_length=200, blank=True)
 
     def __str__(self):
@@ -71,6 +83,10 @@ class Booking(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
+    # Bookings in these states occupy seats on their departure
+    SEAT_HOLDING_STATUSES = ('pending', 'confirmed', 'paid', 'completed')
+    # ...and these count towards revenue (pending ones are still inquiries)
+    REVENUE_STATUSES = ('confirmed', 'paid', 'completed')
 
     tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='bookings')
     full_name = models.CharField(max_length=200)
@@ -82,11 +98,123 @@ class Booking(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @property
+    def seat_claim(self):
+        """(tour_id, date, pax) this booking holds on a Departure, or None."""
+        if self.status not in self.SEAT_HOLDING_STATUSES:
+            return None
+        return (self.tour_id, self.preferred_date, self.number_of_people)
+
+    @property
+    def stats_state(self):
+        """(tour_id, status, pax, date): what this booking contributes to TourStats."""
+        return (self.tour_id, self.status, self.number_of_people, self.preferred_date)
+
+    def save(self, *args, check_capacity=False, **kwargs):
+        """
+        Save, move seats between departures and update the tour's stats to match.
+
+        With ``check_capacity=True`` raises ``availability.DepartureFull`` (and
+        nothing is saved) if the departure cannot take the extra travellers.
+        """
+        from . import availability, stats
+
+        with transaction.atomic():
+            previous = previous_state = None
+            if not self._state.adding:
+                stored = (
+                    Booking.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('tour_id', 'preferred_date', 'number_of_people', 'status')
+                    .first()
+                )
+                if stored:
+                    tour_id, date, pax, status = stored
+                    previous_state = (tour_id, status, pax, date)
+                    if status in self.SEAT_HOLDING_STATUSES:
+                        previous = (tour_id, date, pax)
+            super().save(*args, **kwargs)
+            availability.move_seats(previous, self.seat_claim, check_capacity=check_capacity)
+            stats.record_booking_change(previous_state, self.stats_state)
+
     def __str__(self):
         return f"{self.full_name} - {self.tour.name} ({self.get_status_display()})"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tour', 'preferred_date', 'status'], name='booking_departure_idx'),
+            # Admin changelist filters / dashboard and the default ordering
+            models.Index(fields=['status', 'preferred_date'], name='booking_status_date_idx'),
+            models.Index(fields=['created_at'], name='booking_created_idx'),
+        ]
+
+
+# Append-only log of status moves, written by core.transitions and the admin
+class BookingStatusChange(models.Model):
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True, related_name='+',
+    )
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_from_status_display()} -> {self.get_to_status_display()}"
+
+    class Meta:
+        ordering = ['changed_at']
+
+
+# Seats taken per tour and date, maintained by Booking.save() (see core/availability.py)
+class Departure(models.Model):
+    tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='departures')
+    date = models.DateField()
+    capacity = models.PositiveIntegerField(help_text="Copied from the tour's max group size when created")
+    seats_taken = models.PositiveIntegerField(default=0)
+
+    @property
+    def seats_left(self):
+        return max(self.capacity - self.seats_taken, 0)
+
+    def __str__(self):
+        return f"{self.tour.name} on {self.date} ({self.seats_taken}/{self.capacity})"
+
+    class Meta:
+        ordering = ['date']
+        indexes = [
+            models.Index(fields=['date'], name='departure_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['tour', 'date'], name='unique_tour_departure'),
+        ]
+
+
+# Denormalised booking figures per tour, maintained incrementally (see core/stats.py)
+class TourStats(models.Model):
+    tour = models.OneToOneField(Tour, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    bookings_pending = models.PositiveIntegerField(default=0)
+    bookings_confirmed = models.PositiveIntegerField(default=0)
+    bookings_paid = models.PositiveIntegerField(default=0)
+    bookings_completed = models.PositiveIntegerField(default=0)
+    bookings_cancelled = models.PositiveIntegerField(default=0)
+    pax = models.PositiveIntegerField(default=0, help_text="Travellers on seat-holding bookings")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    popularity = models.PositiveIntegerField(default=0, help_text="Bookings that are not cancelled")
+    next_departure = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for {self.tour.name}"
+
+    class Meta:
+        verbose_name_plural = 'tour stats'
+        indexes = [
+            # Backs the "popular" catalogue ordering
+            models.Index(fields=['-popularity', '-tour'], name='tourstats_popularity_idx'),
+        ]
+
 
 class ContactMessage(models.Model):
     name = models.CharField(max_length=200)
@@ -99,4 +227,88 @@ class ContactMessage(models.Model):
         return f"{self.name} - {self.subject}"
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # Default ordering, and the age cutoff of archive_old_records
+            models.Index(fields=['created_at'], name='contact_created_idx'),
+        ]
+
+
+# Archive tables: rows moved out of Booking / ContactMessage by
+# `manage.py archive_old_records` (see core/archive.py), keeping their ids.
+class ArchivedBooking(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    tour = models.ForeignKey(Tour, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    tour_name = models.CharField(max_length=200)
+    full_name = models.CharField(max_length=200)
+    email = models.EmailField()
+    phone = models.CharField(max_length=20)
+    number_of_people = models.PositiveIntegerField()
+    preferred_date = models.DateField()
+    special_requests = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    # BookingStatusChange rows as [from_status, to_status, changed_by_id, changed_at]
+    status_history = models.JSONField(default=list, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.full_name} - {self.tour_name} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='archived_booking_created_idx'),
+        ]
+
+
+class ArchivedContactMessage(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=200)
+    email = models.EmailField()
+    subject = models.CharField(max_length=200)
+    message = models.TextField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} - {self.subject}"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='archived_contact_created_idx'),
+        ]
+
+
+# Outbound mail queue: rows are written in the same transaction as the
+# Booking/ContactMessage and delivered by `manage.py send_queued_mail`.
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.TextField(help_text="Comma-separated addresses")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    def recipient_list(self):
+        return [addr for addr in self.recipients.split(',') if addr]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipients} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
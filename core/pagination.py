@@ -0,0 +1,132 @@
+# ============================================
+# core/pagination.py
+# ============================================
+"""
+Keyset (cursor) pagination.
+
+Instead of OFFSET, each page is fetched with a WHERE clause that continues
+after the last row of the previous page, so page 500 costs the same as page
+1 when an index matches the ordering. The cursor is an opaque, URL-safe
+encoding of the ordering values of that last row.
+
+The ordering must be total (end it with ``id``/``-id``) for pages to be
+stable; fields may be model fields, related lookups (``stats__popularity``)
+or annotations.
+"""
+import base64
+import json
+from dataclasses import dataclass
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    next_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+def _resolve_field(model, path):
+    field = None
+    for name in path.split('__'):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None  # annotation: values are stored JSON-native
+        model = field.related_model or model
+    return field
+
+
+def _resolve_value(obj, path):
+    for name in path.split('__'):
+        obj = getattr(obj, name)
+    return obj
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.keys = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    # --- Cursor encoding ---
+
+    def encode_cursor(self, obj):
+        values = []
+        for path, _ in self.keys:
+            value = _resolve_value(obj, path)
+            field = _resolve_field(self.queryset.model, path)
+            values.append(field.value_to_string(_Holder(field, value)) if field else value)
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(self.keys):
+                raise ValueError('cursor does not match ordering')
+            decoded = []
+            for (path, _), value in zip(self.keys, values):
+                field = _resolve_field(self.queryset.model, path)
+                decoded.append(field.to_python(value) if field else value)
+            return decoded
+        except Exception as exc:
+            raise InvalidCursor(str(exc)) from exc
+
+    # --- Paging ---
+
+    def _after(self, values):
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        for i, (path, descending) in enumerate(self.keys):
+            step = Q(**{f'{path}__{"lt" if descending else "gt"}': values[i]})
+            for j, (prev_path, _) in enumerate(self.keys[:i]):
+                step &= Q(**{prev_path: values[j]})
+            condition |= step
+        return condition
+
+    def _page_queryset(self, cursor):
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+        return queryset[:self.per_page + 1]
+
+    def page(self, cursor=None):
+        return self._make_page(list(self._page_queryset(cursor)))
+
+    async def apage(self, cursor=None):
+        return self._make_page([row async for row in self._page_queryset(cursor)])
+
+    def _make_page(self, rows):
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, next_cursor)
+
+
+class _Holder:
+    """Minimal stand-in so Field.value_to_string() can serialise a bare value."""
+
+    def __init__(self, field, value):
+        setattr(self, field.attname, value)
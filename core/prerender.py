@@ -0,0 +1,155 @@
+# ============================================
+# core/prerender.py
+# ============================================
+"""
+Prerendered HTML snapshots of the public catalogue pages.
+
+``manage.py prerender_pages`` renders home, about, tours and every tour page
+to ``PRERENDER_DIR/<url path>/index.html`` (plus a ``.gz`` copy), and
+``PrerenderedPagesMiddleware`` serves those files through WhiteNoise before
+any view, session or database work. Only requests the page cache would
+share get them: anonymous GET/HEAD without a query string.
+
+Builds are incremental. ``manifest.json`` records each tour's slug and
+``updated_at``, and only new or changed tours are re-rendered (the listing
+pages too, if any tour changed). Between builds, a catalogue change deletes
+the affected snapshots (see ``core.signals``), so visitors get the live
+view instead of a stale page. Snapshots live on local disk: build them on
+every web host (e.g. in the release step).
+"""
+import gzip
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import reverse
+
+from .cache import edge_cache_headers
+
+PRERENDER_DIR = Path(getattr(settings, 'PRERENDER_DIR', settings.BASE_DIR / 'prerendered'))
+MANIFEST_NAME = 'manifest.json'
+STATIC_PAGES = ('home', 'tours', 'about')
+LISTING_PAGES = ('home', 'tours')
+# Sent by the build so it renders the live view rather than the old snapshot
+BYPASS_HEADER = 'X-Prerender'
+
+
+def page_file(url):
+    return PRERENDER_DIR / url.strip('/') / 'index.html'
+
+
+def is_built():
+    """True once ``build()`` has run here, i.e. snapshots may be served."""
+    return (PRERENDER_DIR / MANIFEST_NAME).exists()
+
+
+def read_manifest():
+    try:
+        return json.loads((PRERENDER_DIR / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {'tours': {}}
+
+
+def _write_atomic(path, data):
+    # os.replace, so the middleware never serves a half-written file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as handle:
+        handle.write(data)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def write_page(url, content):
+    path = page_file(url)
+    _write_atomic(path, content)
+    _write_atomic(path.with_name(path.name + '.gz'), gzip.compress(content, mtime=0))
+
+
+def remove_page(url):
+    path = page_file(url)
+    for candidate in (path, path.with_name(path.name + '.gz')):
+        candidate.unlink(missing_ok=True)
+
+
+def discard(tour_id=None, slug=None):
+    """
+    Drop the snapshots a tour change makes stale: the listings and that tour's
+    page (under its built slug and its current one).
+    """
+    if not PRERENDER_DIR.is_dir():
+        return
+    for name in LISTING_PAGES:
+        remove_page(reverse(name))
+    built = read_manifest()['tours'].get(str(tour_id), {}).get('slug')
+    for tour_slug in {built, slug} - {None}:
+        remove_page(reverse('tour_detail', args=[tour_slug]))
+
+
+def add_headers(headers, path, url):
+    """WhiteNoise hook: the same edge-cache headers as live catalogue pages."""
+    keys = []
+    parts = url.strip('/').split('/')
+    if len(parts) == 2 and parts[0] == 'tours':
+        tour_ids = {entry['slug']: tour_id for tour_id, entry in read_manifest()['tours'].items()}
+        if parts[1] in tour_ids:
+            keys.append(f'tour-{tour_ids[parts[1]]}')
+    for header, value in edge_cache_headers(*keys).items():
+        headers[header] = value
+
+
+@dataclass
+class BuildResult:
+    rendered: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+
+
+def build(full=False):
+    """Render new and changed pages, drop pages of deleted tours; returns a ``BuildResult``."""
+    from django.test import Client
+
+    from .models import Tour
+
+    result = BuildResult()
+    client = Client(headers={BYPASS_HEADER: '1'})
+    previous = read_manifest()['tours']
+    built = {} if full else previous
+    current = {
+        str(pk): {'slug': slug, 'updated_at': updated_at.isoformat()}
+        for pk, slug, updated_at in Tour.objects.values_list('pk', 'slug', 'updated_at')
+    }
+
+    # A full build re-renders everything but must still drop deleted tours
+    for tour_id, entry in previous.items():
+        if current.get(tour_id, {}).get('slug') != entry['slug']:
+            url = reverse('tour_detail', args=[entry['slug']])
+            remove_page(url)
+            result.removed.append(url)
+
+    urls = []
+    for tour_id, entry in current.items():
+        url = reverse('tour_detail', args=[entry['slug']])
+        if built.get(tour_id) != entry or not page_file(url).exists():
+            urls.append(url)
+    catalogue_changed = bool(urls or result.removed or built.keys() - current.keys())
+    for name in STATIC_PAGES:
+        url = reverse(name)
+        if full or (catalogue_changed and name in LISTING_PAGES) or not page_file(url).exists():
+            urls.insert(0, url)
+
+    for url in urls:
+        response = client.get(url)
+        # Never snapshot an error or a response that sets cookies
+        if response.status_code != 200 or response.cookies:
+            remove_page(url)
+            result.skipped.append(url)
+            continue
+        write_page(url, response.content)
+        result.rendered.append(url)
+
+    _write_atomic(PRERENDER_DIR / MANIFEST_NAME, json.dumps({'tours': current}, indent=1).encode())
+    return result
@@ -0,0 +1,66 @@
+# ============================================
+# core/routers.py
+# ============================================
+"""
+Primary/replica database routing.
+
+Catalogue models (tours, their images, itinerary days and stats) are read
+from the ``replica`` alias, but only while a request has opted in:
+``ReplicaRoutingMiddleware`` does that for GET/HEAD requests from visitors
+who haven't just submitted something. Writes, every other model, the admin,
+management commands and workers always use the primary, so code that writes
+and then reads never sees replication lag.
+
+After a POST the middleware sets a short-lived cookie that pins the visitor
+to the primary for ``REPLICA_STICKY_SECONDS`` (read-your-writes).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+REPLICA_MODELS = {'core.tour', 'core.tourimage', 'core.itineraryday', 'core.tourstats'}
+STICKY_COOKIE = 'use_primary'
+STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 15)
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in connections.settings
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Let catalogue reads in this block go to the replica."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_alias(model):
+    if _replica_reads.get() and model._meta.label_lower in REPLICA_MODELS and replica_configured():
+        return REPLICA_DB_ALIAS
+    return DEFAULT_DB_ALIAS
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias(model)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication.
+        return db != REPLICA_DB_ALIAS
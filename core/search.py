@@ -0,0 +1,152 @@
+# ============================================
+# core/search.py
+# ============================================
+"""
+Full-text search over the tours catalogue.
+
+Each tour gets one row in a vendor-specific index table holding its name
+(weighted highest) and a body built from the overview plus every itinerary
+day's title, description and accommodation:
+
+* PostgreSQL -> ``core_tour_search`` with a ``tsvector`` column and GIN index
+* SQLite     -> ``core_tour_fts`` FTS5 virtual table (bm25 ranking)
+
+Any other backend falls back to the old ``icontains`` scan. The tables are
+created by migration 0003 and kept in sync by the signal handlers in
+``core.signals``.
+"""
+import re
+
+from django.db import connection, connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+POSTGRES_TABLE = 'core_tour_search'
+SQLITE_TABLE = 'core_tour_fts'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_supported(conn=connection):
+    return conn.vendor in ('postgresql', 'sqlite')
+
+
+# --- Indexing --------------------------------------------------------------
+
+def build_document(tour):
+    """Return the (name, body) pair that gets indexed for a tour."""
+    parts = [tour.description]
+    for day in tour.itinerary.all():
+        parts.extend([day.title, day.description, day.accommodation])
+    return tour.name, '\n'.join(p for p in parts if p)
+
+
+def index_tour(tour, conn=connection):
+    if not is_supported(conn):
+        return
+    name, body = build_document(tour)
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (tour_id, document) VALUES (%s, '
+                "setweight(to_tsvector('english', %s), 'A') || "
+                "setweight(to_tsvector('english', %s), 'B')) "
+                'ON CONFLICT (tour_id) DO UPDATE SET document = EXCLUDED.document',
+                [tour.pk, name, body],
+            )
+        else:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [tour.pk])
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, name, body) VALUES (%s, %s, %s)',
+                [tour.pk, name, body],
+            )
+
+
+def remove_tour(tour_id, conn=connection):
+    if not is_supported(conn):
+        return
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute(f'DELETE FROM {POSTGRES_TABLE} WHERE tour_id = %s', [tour_id])
+        else:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [tour_id])
+
+
+def clear_index(conn=connection):
+    """Drop every indexed document (for bulk loaders that empty the tours table)."""
+    if not is_supported(conn):
+        return
+    table = POSTGRES_TABLE if conn.vendor == 'postgresql' else SQLITE_TABLE
+    with conn.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+
+
+def rebuild_index(tours, conn=connection):
+    """Re-index every tour in ``tours`` (an iterable of Tour instances)."""
+    if not is_supported(conn):
+        return 0
+    count = 0
+    for tour in tours:
+        index_tour(tour, conn=conn)
+        count += 1
+    return count
+
+
+# --- Querying --------------------------------------------------------------
+
+def _fts5_query(query):
+    # Quote every token so user input can never be parsed as FTS5 syntax, and
+    # make the last one a prefix match so "serenge" finds "Serengeti".
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return ''
+    quoted = [f'"{t}"' for t in tokens]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _rank_sql(conn, outer_pk, query):
+    """
+    ``(pk_subquery, rank_subquery, params)`` for ``query``.
+
+    The first selects every matching tour id through the index; the second
+    is correlated on ``outer_pk`` and yields that tour's rank, lower is better.
+    """
+    if conn.vendor == 'postgresql':
+        tsquery = "websearch_to_tsquery('english', %s)"
+        return (
+            f'SELECT tour_id FROM {POSTGRES_TABLE} WHERE document @@ {tsquery}',
+            f'SELECT -ts_rank_cd(document, {tsquery}) FROM {POSTGRES_TABLE} WHERE tour_id = {outer_pk}',
+            [query],
+        )
+    match = _fts5_query(query)
+    return (
+        f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s',
+        f'SELECT bm25({SQLITE_TABLE}, 10.0, 1.0) FROM {SQLITE_TABLE} '
+        f'WHERE {SQLITE_TABLE} MATCH %s AND rowid = {outer_pk}',
+        [match] if match else None,
+    )
+
+
+def search_tours(queryset, query):
+    """
+    Restrict ``queryset`` to tours matching ``query``, ordered by relevance.
+
+    Every match is kept and ranked in SQL: tours are annotated with
+    ``search_rank`` (lower = better match; order by it, then ``-id``), so
+    counts, facets and pagination see the whole result set. The index is
+    queried on the database ``queryset`` reads from (the replica, when
+    routed there).
+    """
+    conn = connections[queryset.db]
+    if not is_supported(conn):
+        return queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
+
+    model = queryset.model
+    outer_pk = f'{conn.ops.quote_name(model._meta.db_table)}.{conn.ops.quote_name(model._meta.pk.column)}'
+    matching, rank, params = _rank_sql(conn, outer_pk, query)
+    if params is None:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return queryset.filter(pk__in=RawSQL(matching, params)).annotate(
+        search_rank=RawSQL(rank, params, output_field=FloatField()),
+    ).order_by('search_rank', '-pk')
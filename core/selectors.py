@@ -0,0 +1,157 @@
+# ============================================
+# core/selectors.py
+# ============================================
+"""
+Query-optimised read access for the public catalogue views.
+
+Listings never load the full ``description`` TextField; they get a short
+``summary`` annotation instead. Detail pages prefetch itinerary and gallery
+in one query each, already ordered, so templates never hit the database.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import F, Prefetch, Q, QuerySet
+from django.db.models.functions import Coalesce, Substr
+from django.shortcuts import aget_object_or_404, get_object_or_404
+
+from . import search
+from .models import ItineraryDay, Tour, TourImage
+
+# Enough characters for the card excerpts (truncatewords:20 in the templates).
+SUMMARY_LENGTH = 300
+
+LISTING_FIELDS = (
+    'id', 'name', 'slug', 'duration_days', 'price', 'difficulty',
+    'max_group_size', 'image', 'image_variants', 'featured', 'created_at', 'updated_at',
+)
+
+
+def tour_listing():
+    """Tours for card grids: listing columns plus a ``summary`` excerpt."""
+    return Tour.objects.only(*LISTING_FIELDS).annotate(
+        summary=Substr('description', 1, SUMMARY_LENGTH)
+    )
+
+
+# Keyset orderings for the tours page; each ends in a unique column so pages are stable.
+DEFAULT_ORDERING = ('-featured', '-created_at', '-id')  # Tour.Meta.ordering + tie-break
+SORT_ORDERINGS = {
+    'price-low': ('price', 'id'),
+    'price-high': ('-price', '-id'),
+    'duration': ('duration_days', 'id'),
+    'popular': ('-popularity', '-id'),  # TourStats.popularity, see core/stats.py
+}
+
+
+@dataclass
+class CatalogueSearch:
+    """
+    A tours page query: ``matching`` is everything the search and group-size
+    filter allow, ``filters`` the facet filters (``difficulty``, ``price``,
+    ``duration``) still to apply to it, as one Q each.
+    """
+    matching: QuerySet
+    filters: dict
+    ordering: tuple
+    sort: str = ''
+
+    @property
+    def tours(self):
+        tours = self.matching.filter(*self.filters.values())
+        if self.sort == 'popular':
+            tours = tours.annotate(popularity=_popularity())
+        return tours
+
+
+def _popularity():
+    # 0, not NULL, for a tour whose TourStats row is missing: keyset cursors
+    # compare with popularity__lt, which would drop NULL rows (or fail on None).
+    return Coalesce(F('stats__popularity'), 0)
+
+
+def _number(params, name, cast=int):
+    """``params[name]`` as a non-negative number, or None if missing or invalid."""
+    try:
+        value = cast(params.get(name) or '')
+    except (ValueError, ArithmeticError):
+        return None
+    if isinstance(value, Decimal) and not value.is_finite():
+        return None
+    return value if value >= 0 else None
+
+
+def _range(field, low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(**{f'{field}__gte': low})
+    if high is not None:
+        condition &= Q(**{f'{field}__lte': high})
+    return condition
+
+
+def catalogue_search(params, queryset=None):
+    """Parse the catalogue filters in ``params`` (a GET QueryDict) into a ``CatalogueSearch``."""
+    tours_list = tour_listing() if queryset is None else queryset
+    ordering = DEFAULT_ORDERING
+
+    # 1. Search (full-text index over name, description and itinerary, best match first)
+    query = params.get('q')
+    if query:
+        # Rank only where search_tours could: the index lives on the queryset's database
+        if search.is_supported(connections[tours_list.db]):
+            ordering = ('search_rank', '-id')
+        tours_list = search.search_tours(tours_list, query)
+
+    # 2. Group size: tours that take the whole party
+    group_size = _number(params, 'group_size')
+    if group_size:
+        tours_list = tours_list.filter(max_group_size__gte=group_size)
+
+    # 3. Facets: difficulty, price range (min_price/max_price), duration range (min_days/max_days)
+    difficulty = params.get('difficulty')
+    filters = {
+        'difficulty': Q(difficulty=difficulty) if difficulty else Q(),
+        'price': _range('price', _number(params, 'min_price', Decimal), _number(params, 'max_price', Decimal)),
+        'duration': _range('duration_days', _number(params, 'min_days'), _number(params, 'max_days')),
+    }
+
+    # 4. Explicit sort overrides relevance / recommended order
+    sort = params.get('sort') or ''
+    ordering = SORT_ORDERINGS.get(sort, ordering)
+    return CatalogueSearch(tours_list, filters, ordering, sort)
+
+
+def filtered_tours(params, queryset=None):
+    """
+    Apply the catalogue filters in ``params`` (a GET QueryDict).
+
+    Returns ``(queryset, ordering)``; searches default to relevance order.
+    """
+    found = catalogue_search(params, queryset)
+    return found.tours, found.ordering
+
+
+def featured_tours(limit=3):
+    """The most booked featured tours."""
+    return (
+        tour_listing().filter(featured=True).annotate(popularity=_popularity())
+        .order_by('-popularity', '-created_at')[:limit]
+    )
+
+
+def _tour_content():
+    return Tour.objects.prefetch_related(
+        Prefetch('itinerary', queryset=ItineraryDay.objects.order_by('day_number')),
+        Prefetch('gallery_images', queryset=TourImage.objects.order_by('pk')),
+    )
+
+
+def tour_with_content(slug):
+    """A single tour with its itinerary and gallery prefetched, or 404."""
+    return get_object_or_404(_tour_content(), slug=slug)
+
+
+async def atour_with_content(slug):
+    return await aget_object_or_404(_tour_content(), slug=slug)
@@ -0,0 +1,108 @@
+# ============================================
+# core/signals.py
+# ============================================
+import logging
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import availability, images, prerender, search, stats, uploads
+from .cache import invalidate_catalogue
+from .models import Booking, ItineraryDay, Tour, TourImage, TourStats
+
+logger = logging.getLogger(__name__)
+
+
+# --- Responsive image derivatives ---
+# Registered first so derivatives exist before caches are invalidated below.
+
+@receiver(post_save, sender=Tour)
+@receiver(post_save, sender=TourImage)
+def build_image_derivatives(sender, instance, raw=False, **kwargs):
+    on_save = settings.IMAGE_DERIVATIVES_ON_SAVE
+    if on_save is None:
+        # Direct S3 uploads: leave downloading and decoding to build_image_derivatives
+        on_save = not uploads.direct_uploads_enabled()
+    if raw or not on_save:
+        return
+    try:
+        images.refresh_derivatives(instance)
+    except OSError:
+        # Missing or unreadable upload: keep serving the original, backfill later.
+        logger.warning('Could not build derivatives for %r', instance, exc_info=True)
+
+
+@receiver(post_delete, sender=Tour)
+@receiver(post_delete, sender=TourImage)
+def delete_image_derivatives(sender, instance, **kwargs):
+    images.delete_derivatives(instance.image.storage, images.variant_names(instance.image_variants))
+
+
+# --- Search index sync ---
+
+@receiver(post_save, sender=Tour)
+def index_tour_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_tour(instance)
+
+
+@receiver(post_delete, sender=Tour)
+def remove_tour_from_index(sender, instance, **kwargs):
+    search.remove_tour(instance.pk)
+
+
+@receiver(post_save, sender=ItineraryDay)
+@receiver(post_delete, sender=ItineraryDay)
+def reindex_tour_on_itinerary_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The tour may already be gone when this fires during a cascade delete.
+    tour = Tour.objects.filter(pk=instance.tour_id).first()
+    if tour is not None:
+        search.index_tour(tour)
+
+
+# --- Catalogue cache invalidation ---
+
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+def invalidate_on_tour_change(sender, instance, **kwargs):
+    invalidate_catalogue()
+    prerender.discard(instance.pk, instance.slug)
+
+
+@receiver(post_save, sender=TourImage)
+@receiver(post_delete, sender=TourImage)
+@receiver(post_save, sender=ItineraryDay)
+@receiver(post_delete, sender=ItineraryDay)
+def invalidate_on_tour_content_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Touch the parent so fragments keyed on tour.updated_at are refreshed too.
+    Tour.objects.filter(pk=instance.tour_id).update(updated_at=timezone.now())
+    invalidate_catalogue()
+    prerender.discard(instance.tour_id)
+
+
+# --- Departure seat counters ---
+# Booking.save() handles creates and edits; deletes (including admin bulk
+# deletes, which bypass Model.delete) are handled here.
+
+@receiver(post_delete, sender=Booking)
+def release_seats_on_delete(sender, instance, **kwargs):
+    if instance.seat_claim:
+        availability.release_seats(*instance.seat_claim)
+    stats.record_booking_change(instance.stats_state, None)
+
+
+# --- Tour stats ---
+# Booking changes are applied by Booking.save() and the handler above; every
+# tour gets its (empty) row up front so the "popular" ordering never sees NULLs.
+
+@receiver(post_save, sender=Tour)
+def create_tour_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        TourStats.objects.get_or_create(tour=instance)
@@ -0,0 +1,45 @@
+# ============================================
+# core/sitemaps.py
+# ============================================
+"""
+``/sitemap.xml`` for crawlers: the static pages plus every tour, with
+``lastmod`` from ``Tour.updated_at`` (touched whenever the itinerary or
+gallery changes). Served through the catalogue page cache, so it is
+rebuilt only after the catalogue changes.
+"""
+from django.contrib.sitemaps import Sitemap
+from django.contrib.sitemaps import views as sitemap_views
+from django.urls import reverse
+
+from .cache import cache_catalogue_page
+from .models import Tour
+
+
+class StaticPageSitemap(Sitemap):
+    changefreq = 'weekly'
+
+    def items(self):
+        return ['home', 'tours', 'about', 'contact']
+
+    def location(self, item):
+        return reverse(item)
+
+
+class TourSitemap(Sitemap):
+    changefreq = 'weekly'
+    priority = 0.8
+
+    def items(self):
+        return Tour.objects.only('slug', 'updated_at').order_by('pk')
+
+    def lastmod(self, tour):
+        return tour.updated_at
+
+
+SITEMAPS = {'pages': StaticPageSitemap, 'tours': TourSitemap}
+
+
+@cache_catalogue_page
+def sitemap(request):
+    # Render now: the page cache stores finished responses.
+    return sitemap_views.sitemap(request, sitemaps=SITEMAPS).render()
@@ -0,0 +1,164 @@
+# ============================================
+# core/stats.py
+# ============================================
+"""
+Per-tour booking statistics (``TourStats``).
+
+One row per tour holds booking counts by status, travellers, revenue, a
+``popularity`` score (bookings that are not cancelled) and the next departure
+with travellers on it. Pages read these columns directly -- "popular" sorting
+is an indexed ORDER BY rather than a join + aggregate over every booking.
+
+Rows are adjusted in place whenever a booking changes: ``Booking.save()``
+and the ``post_delete`` handler in ``core.signals`` call
+``record_booking_change(previous, current)`` with the booking's state before
+and after, and the difference is applied as a single relative UPDATE, so
+concurrent bookings never overwrite each other's counts.
+
+Revenue is accumulated at the tour's price when each booking changes;
+``rebuild_stats()`` (``manage.py rebuild_tour_stats``) recomputes every row
+from the bookings table, e.g. after bulk loads or price changes.
+"""
+import time
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Count, DecimalField, ExpressionWrapper, F, Min, OuterRef, Q, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+# When TourStats last changed: the "popular" order (and its API validators) depend on it
+STATS_MODIFIED_KEY = 'stats:modified'
+
+
+def stats_modified():
+    """Timestamp of the last TourStats change; unknown (evicted) counts as now."""
+    modified = cache.get(STATS_MODIFIED_KEY)
+    if modified is None:
+        cache.add(STATS_MODIFIED_KEY, time.time(), timeout=None)
+        modified = cache.get(STATS_MODIFIED_KEY, time.time())
+    return modified
+
+
+def _touch():
+    cache.set(STATS_MODIFIED_KEY, time.time(), timeout=None)
+
+
+def _next_departure(tour_ref):
+    from .models import Departure
+
+    return Subquery(
+        Departure.objects.filter(tour_id=tour_ref, date__gte=timezone.localdate(), seats_taken__gt=0)
+        .order_by('date').values('date')[:1]
+    )
+
+
+def _deltas(changes):
+    """Per-tour counter changes for ``(previous, current)`` pairs of ``Booking.stats_state`` tuples (or None)."""
+    from .models import Booking
+
+    deltas = defaultdict(Counter)
+    for previous, current in changes:
+        for sign, state in ((-1, previous), (1, current)):
+            if state is None:
+                continue
+            tour_id, status, pax, _ = state
+            delta = deltas[tour_id]
+            delta[f'bookings_{status}'] += sign
+            if status != 'cancelled':
+                delta['popularity'] += sign
+            if status in Booking.SEAT_HOLDING_STATUSES:
+                delta['pax'] += sign * pax
+            if status in Booking.REVENUE_STATUSES:
+                delta['revenue_pax'] += sign * pax
+    return deltas
+
+
+def record_booking_change(previous, current):
+    """
+    Apply a booking's change from ``previous`` to ``current`` state.
+
+    States are ``Booking.stats_state`` tuples, ``None`` for a booking that
+    doesn't exist (before creation, after deletion). Must run inside a
+    transaction, after the departure seats have been moved.
+    """
+    record_booking_changes([(previous, current)])
+
+
+def record_booking_changes(changes):
+    """
+    Apply many ``(previous, current)`` booking changes at once.
+
+    The deltas are summed per tour first, so a bulk status change costs one
+    UPDATE per affected tour rather than one per booking.
+    """
+    from .models import Tour, TourStats
+
+    real = [(previous, current) for previous, current in changes if previous != current]
+    for tour_id, delta in _deltas(real).items():
+        changes = {
+            field: Greatest(F(field) + amount, 0)
+            for field, amount in delta.items()
+            if amount and field != 'revenue_pax'
+        }
+        if delta['revenue_pax']:
+            price = Subquery(Tour.objects.filter(pk=OuterRef('tour_id')).values('price')[:1])
+            changes['revenue'] = Greatest(
+                ExpressionWrapper(F('revenue') + price * delta['revenue_pax'], output_field=MONEY), Value(0),
+            )
+        # Seats moved (or the date changed): the next departure may have too.
+        changes['next_departure'] = _next_departure(OuterRef('tour_id'))
+        changes['updated_at'] = timezone.now()
+        if not TourStats.objects.filter(tour_id=tour_id).update(**changes):
+            TourStats.objects.get_or_create(tour_id=tour_id)
+            TourStats.objects.filter(tour_id=tour_id).update(**changes)
+    if real:
+        _touch()
+
+
+def rebuild_stats():
+    """
+    Recompute every tour's stats from the bookings table in one GROUP BY.
+
+    For bulk loaders (``bulk_create`` skips ``Booking.save()``) and for
+    repairing drift. Returns the number of rows written.
+    """
+    from .models import Booking, Departure, Tour, TourStats
+
+    per_status = {
+        f'bookings_{status}': Count('id', filter=Q(status=status))
+        for status, _ in Booking.STATUS_CHOICES
+    }
+    grouped = Booking.objects.values('tour_id').annotate(
+        **per_status,
+        pax=Coalesce(Sum('number_of_people', filter=Q(status__in=Booking.SEAT_HOLDING_STATUSES)), 0),
+        revenue=Coalesce(
+            Sum(F('number_of_people') * F('tour__price'), filter=Q(status__in=Booking.REVENUE_STATUSES)),
+            Value(0), output_field=MONEY,
+        ),
+    ).order_by()
+    totals = {row.pop('tour_id'): row for row in grouped}
+    next_departures = dict(
+        Departure.objects.filter(date__gte=timezone.localdate(), seats_taken__gt=0)
+        .values('tour_id').annotate(next_date=Min('date')).order_by()
+        .values_list('tour_id', 'next_date')
+    )
+
+    rows = []
+    for tour_id in Tour.objects.values_list('pk', flat=True).iterator(chunk_size=2000):
+        row = totals.get(tour_id, {})
+        rows.append(TourStats(
+            tour_id=tour_id,
+            next_departure=next_departures.get(tour_id),
+            popularity=sum(row.get(field, 0) for field in per_status) - row.get('bookings_cancelled', 0),
+            **row,
+        ))
+    with transaction.atomic():
+        TourStats.objects.all().delete()
+        TourStats.objects.bulk_create(rows, batch_size=1000)
+    _touch()
+    return len(rows)
@@ -0,0 +1,48 @@
+# ============================================
+# core/templatetags/core_assets.py
+# ============================================
+from django import template
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from core import assets
+
+register = template.Library()
+
+
+@register.simple_tag
+def critical_css():
+    """Inline ``dist/critical.css`` (empty until ``build_assets`` has run)."""
+    css = assets.critical_css()
+    # Our own build output; "</" can't appear in it, so it is safe inside <style>.
+    return mark_safe(f'<style>{css}</style>') if css else ''
+
+
+@register.simple_tag
+def preload_fonts():
+    return format_html_join(
+        '\n', '<link rel="preload" href="{}" as="font" type="font/woff2" crossorigin>',
+        ((url,) for url in assets.font_preloads()),
+    )
+
+
+@register.simple_tag
+def stylesheets(bundle='site.css'):
+    """
+    Link a CSS bundle. With critical CSS inlined, the bundle is fetched as a
+    non-blocking preload and applied once it arrives.
+    """
+    urls = assets.bundle_urls(bundle)
+    if len(urls) == 1 and assets.critical_css():
+        return format_html(
+            '<link rel="preload" href="{0}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+            '<noscript><link rel="stylesheet" href="{0}"></noscript>',
+            urls[0],
+        )
+    return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((url,) for url in urls))
+
+
+@register.simple_tag
+def scripts(bundle='site.js'):
+    """Deferred <script> tags for a JS bundle (or its sources, in order)."""
+    return format_html_join('\n', '<script src="{}" defer></script>', ((url,) for url in assets.bundle_urls(bundle)))
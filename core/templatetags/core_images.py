@@ -0,0 +1,46 @@
+# ============================================
+# core/templatetags/core_images.py
+# ============================================
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core import images
+
+register = template.Library()
+
+
+@register.filter
+def srcset(instance, fmt='jpeg'):
+    """``{{ tour|srcset:"webp" }}`` -> "…-480w.webp 480w, …-960w.webp 960w"."""
+    return ', '.join(f'{url} {width}w' for width, url in images.variant_urls(instance, fmt))
+
+
+@register.filter
+def image_url(instance, min_width=960):
+    """``{{ tour|image_url:1600 }}``: a single derivative URL, e.g. for CSS backgrounds."""
+    return images.best_url(instance, int(min_width))
+
+
+@register.simple_tag
+def picture(instance, alt='', sizes='100vw', css_class='', picture_class='', loading='lazy'):
+    """
+    Render ``<picture>`` with a WebP source and a JPEG ``<img srcset>`` fallback.
+
+    Falls back to a plain ``<img>`` of the original while derivatives are missing.
+    """
+    jpeg = images.variant_urls(instance, 'jpeg')
+    if not jpeg:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" loading="{}">',
+            instance.image.url, css_class, alt, loading,
+        )
+
+    webp_srcset = srcset(instance, 'webp')
+    source = format_html('<source type="image/webp" srcset="{}" sizes="{}">', webp_srcset, sizes) if webp_srcset else ''
+    variants = instance.image_variants
+    return format_html(
+        '<picture class="{}">{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'class="{}" alt="{}" loading="{}" decoding="async"></picture>',
+        picture_class, source, jpeg[-1][1], srcset(instance, 'jpeg'), sizes,
+        variants.get('width', ''), variants.get('height', ''), css_class, alt, loading,
+    )
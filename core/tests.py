@@ -1,3 +1,1588 @@
-from django.test import TestCase
+import csv
+import datetime
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core import mail
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse, QueryDict
+from django.db import IntegrityError, connection, connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+
+try:
+    import boto3
+    import requests
+    from moto import mock_aws
+except ImportError:  # optional test dependency
+    mock_aws = None
+
+from . import (
+    assets, async_views, availability, dashboard, exports, facets, health, images, instrumentation, mail as outbox,
+    media, routers, prerender, search, selectors, stats, throttling, transitions, uploads, urls, views,
+)
+from .cache import invalidate_catalogue
+from .middleware import ReplicaRoutingMiddleware
+from .models import (
+    ArchivedBooking, ArchivedContactMessage, Booking, BookingStatusChange, ContactMessage, Departure, ItineraryDay,
+    OutboundEmail, Tour, TourImage, TourStats,
+)
+
+
+def make_tour(name, **kwargs):
+    defaults = {
+        'description': 'A classic safari.',
+        'duration_days': 5,
+        'price': 1500,
+        'difficulty': 'easy',
+    }
+    defaults.update(kwargs)
+    return Tour.objects.create(name=name, **defaults)
+
+
+# The manifest storage needs collectstatic to have run; tests don't need hashed names.
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class SiteTestCase(TestCase):
+    databases = '__all__'  # GET requests read the catalogue through the replica alias
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Keep snapshots from a local prerender_pages run out of the tests.
+        prerender_dir = Path(tempfile.mkdtemp())
+        cls.addClassCleanup(shutil.rmtree, prerender_dir, ignore_errors=True)
+        patcher = mock.patch.object(prerender, 'PRERENDER_DIR', prerender_dir)
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        # The replica mirrors the test database. Share the connection too, so
+        # replica reads see rows written inside the test's transaction.
+        cls._replica_connection = None
+        if routers.replica_configured():
+            cls._replica_connection = connections[routers.REPLICA_DB_ALIAS]
+            connections[routers.REPLICA_DB_ALIAS] = connections['default']
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls._replica_connection is not None:
+            connections[routers.REPLICA_DB_ALIAS] = cls._replica_connection
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class TourSearchTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.mara = make_tour('Maasai Mara Migration', description='Wildebeest crossing the river.')
+        self.amboseli = make_tour('Amboseli Elephants', description='Elephants below Kilimanjaro.')
+        self.coast = make_tour('Coastal Retreat', description='Beach days after the bush.')
+
+    def search(self, q):
+        response = self.client.get(reverse('tours'), {'q': q})
+        return list(response.context['tours'])
+
+    def test_matches_name_and_description(self):
+        self.assertEqual(self.search('wildebeest'), [self.mara])
+        self.assertEqual(self.search('amboseli'), [self.amboseli])
+
+    def test_prefix_match_on_last_term(self):
+        self.assertEqual(self.search('kiliman'), [self.amboseli])
+
+    def test_name_hits_rank_above_body_hits(self):
+        self.coast.description = 'Finish with elephants on the beach.'
+        self.coast.save()
+        self.assertEqual(self.search('elephants'), [self.amboseli, self.coast])
+
+    def test_itinerary_changes_are_indexed(self):
+        day = ItineraryDay.objects.create(
+            tour=self.coast, day_number=1, title='Lamu old town', description='Dhow sailing.',
+            accommodation='Peponi Hotel',
+        )
+        self.assertEqual(self.search('peponi'), [self.coast])
+        day.delete()
+        self.assertEqual(self.search('peponi'), [])
+
+    def test_deleted_tours_leave_the_index(self):
+        self.mara.delete()
+        self.assertEqual(self.search('wildebeest'), [])
+
+    def test_every_match_is_counted_and_paged_in_rank_order(self):
+        named = [make_tour(f'Lodge Stay {i}', description='Lodge nights.') for i in range(3)]
+        body = [make_tour(f'Camp {i}', description='A lodge on the last night.') for i in range(4)]
+        first = self.client.get(reverse('api_tour_list'), {'q': 'lodge', 'limit': 2}).json()
+        self.assertEqual(first['count'], 7)
+        slugs, data = [], first
+        while True:
+            slugs += [tour['slug'] for tour in data['results']]
+            if not data['next']:
+                break
+            data = self.client.get(data['next']).json()
+        # Ties (identical documents) fall back to the newest tour first
+        self.assertEqual(slugs, [tour.slug for tour in named[::-1] + body[::-1]])
+
+    def test_ranking_follows_the_database_the_search_ran_on(self):
+        # A replica without the index falls back to icontains and recommended order
+        aliases = {'default': connection, 'replica': mock.Mock(vendor='mysql')}
+        with mock.patch.object(selectors, 'connections', aliases), mock.patch.object(search, 'connections', aliases):
+            found = selectors.catalogue_search(QueryDict('q=wildebeest'), Tour.objects.using('replica'))
+        self.assertEqual(found.ordering, selectors.DEFAULT_ORDERING)
+        self.assertEqual(list(found.tours.order_by(*found.ordering)), [self.mara])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('"mara" OR NEAR('), [])
+        self.assertEqual(self.search('***'), [])
+
+
+class CataloguePageCacheTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tour = make_tour('Samburu Desert Safari')
+
+    def test_anonymous_repeat_hits_skip_the_database(self):
+        url = self.tour.get_absolute_url()
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Samburu Desert Safari')
+
+    def test_filter_params_are_part_of_the_key(self):
+        self.client.get(reverse('tours'), {'difficulty': 'easy'})
+        response = self.client.get(reverse('tours'), {'difficulty': 'challenging'})
+        self.assertNotContains(response, 'Samburu Desert Safari')
+
+    def test_tour_change_invalidates_pages(self):
+        self.client.get(reverse('tours'))
+        self.tour.name = 'Samburu Special'
+        self.tour.save()
+        self.assertContains(self.client.get(reverse('tours')), 'Samburu Special')
+
+    def test_itinerary_change_invalidates_detail_fragment(self):
+        url = self.tour.get_absolute_url()
+        self.client.get(url)
+        ItineraryDay.objects.create(tour=self.tour, day_number=1, title='Camel trek', description='x')
+        self.assertContains(self.client.get(url), 'Camel trek')
+
+    def test_visitors_with_a_session_bypass_the_cache(self):
+        url = self.tour.get_absolute_url()
+        self.client.get(url)
+        Tour.objects.filter(pk=self.tour.pk).update(name='Renamed without signals')
+        self.assertContains(self.client.get(url), 'Samburu Desert Safari')
+        self.client.cookies['sessionid'] = 'abc'
+        self.assertContains(self.client.get(url), 'Renamed without signals')
+
+
+@override_settings(IMAGE_DERIVATIVES_ON_SAVE=False)  # gallery rows point at files that don't exist
+class QueryBudgetTests(SiteTestCase):
+    """Exact query counts for uncached page renders, so N+1 regressions fail loudly."""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            tour = make_tour(f'Tour {i}', featured=i < 3, description='word ' * 500)
+            for day in range(1, 4):
+                ItineraryDay.objects.create(tour=tour, day_number=day, title=f'Day {day}', description='x')
+            TourImage.objects.create(tour=tour, image=f'tours/gallery/{i}.jpg')
+        self.tour = tour
+
+    def test_home(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('home'))
+
+    def test_tours_listing(self):
+        with self.assertNumQueries(2):  # page + facet counts (with the total)
+            response = self.client.get(reverse('tours'))
+        self.assertEqual(len(response.context['tours']), 5)
+
+    def test_tours_search(self):
+        with self.assertNumQueries(2):  # page + facet counts, both ranked/filtered through the index
+            self.client.get(reverse('tours'), {'q': 'tour'})
+
+    def test_listing_does_not_load_descriptions(self):
+        response = self.client.get(reverse('tours'))
+        self.assertIn('description', response.context['tours'][0].get_deferred_fields())
+
+    def test_tour_detail(self):
+        with self.assertNumQueries(3):  # tour + itinerary + gallery
+            response = self.client.get(self.tour.get_absolute_url())
+        self.assertContains(response, 'Day 3')
+        self.assertContains(response, 'tours/gallery/4.jpg')
+
+
+class MailOutboxTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tour = make_tour('Lake Nakuru Flamingos')
+
+    def book(self):
+        return self.client.post(reverse('booking', args=[self.tour.slug]), {
+            'full_name': 'Jane Doe', 'email': 'jane@example.com', 'phone': '+254700000000',
+            'number_of_people': 2, 'preferred_date': '2030-01-15',
+        })
+
+    def test_booking_queues_mail_instead_of_sending(self):
+        self.book()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.filter(status='queued').count(), 2)
+
+    def test_worker_delivers_over_one_connection(self):
+        self.book()
+        self.client.post(reverse('contact'), {
+            'name': 'Jane', 'email': 'jane@example.com', 'subject': 'Hi', 'message': 'Hello',
+        })
+        call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(outbox.queue_stats()['sent'], 3)
+        self.assertEqual(mail.outbox[0].to, ['jane@example.com'])
+
+    def test_failures_back_off_then_give_up(self):
+        email = outbox.queue_mail('Subject', 'Body', ['a@example.com'])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=ConnectionError('smtp down')):
+            self.assertEqual(outbox.deliver_due(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, 1)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertIn('smtp down', email.last_error)
+            self.assertEqual(outbox.deliver_due(), (0, 0))  # not due yet
+
+            OutboundEmail.objects.update(attempts=outbox.MAX_ATTEMPTS - 1, next_attempt_at=timezone.now())
+            outbox.deliver_due()
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'failed')
+
+    def test_connection_failures_reschedule_the_batch(self):
+        emails = [outbox.queue_mail('Subject', 'Body', [f'{i}@example.com']) for i in range(2)]
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open',
+                        side_effect=ConnectionRefusedError('connection refused')), \
+                self.assertLogs('core.mail', 'WARNING'):
+            call_command('send_queued_mail', stdout=StringIO())
+        for email in emails:
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ('queued', 1))
+            self.assertIn('connection refused', email.last_error)
+            # Backed off by retry_delay(1), not left to wait out the lease
+            self.assertGreater(email.next_attempt_at, timezone.now() + datetime.timedelta(seconds=30))
+            self.assertLess(email.next_attempt_at, timezone.now() + datetime.timedelta(seconds=outbox.LEASE_SECONDS))
+
+
+class TourPaginationTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tours = [
+            make_tour(f'Tour {i:02d}', featured=i % 5 == 0, price=1000 + (i * 37) % 500)
+            for i in range(30)
+        ]
+
+    def collect(self, **params):
+        """Walk the fragment endpoint from the first page to the end."""
+        response = self.client.get(reverse('tours'), params)
+        names = [t.name for t in response.context['tours']]
+        next_url = response.context['next_fragment_url']
+        while next_url:
+            response = self.client.get(next_url)
+            names += [t.name for t in response.context['tours']]
+            next_url = response.context['next_fragment_url']
+        return names
+
+    def test_pages_are_bounded(self):
+        response = self.client.get(reverse('tours'))
+        self.assertEqual(len(response.context['tours']), views.TOURS_PER_PAGE)
+        self.assertEqual(response.context['total_count'], 30)
+        self.assertContains(response, 'tours-sentinel')
+
+    def test_recommended_order_matches_queryset_ordering(self):
+        expected = list(Tour.objects.order_by('-featured', '-created_at', '-id').values_list('name', flat=True))
+        self.assertEqual(self.collect(), expected)
+
+    def test_sorted_pages_have_no_gaps_or_duplicates(self):
+        expected = list(Tour.objects.order_by('-price', '-id').values_list('name', flat=True))
+        self.assertEqual(self.collect(sort='price-high'), expected)
+
+    def test_fragment_endpoint_renders_cards_only(self):
+        first = self.client.get(reverse('tours'))
+        response = self.client.get(first.context['next_fragment_url'])
+        self.assertNotContains(response, '<html')
+        self.assertContains(response, 'tour-item', count=views.TOURS_PER_PAGE)
+
+    def test_bad_cursor_is_404(self):
+        response = self.client.get(reverse('tours_page'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_any_slug_reaches_its_detail_page(self):
+        tour = make_tour('More', slug='more')
+        response = self.client.get(tour.get_absolute_url())
+        self.assertEqual(response.context['tour'], tour)
+
+
+def make_jpeg(width, height, name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 120, 40)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageDerivativeTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_upload_generates_webp_and_jpeg_widths(self):
+        tour = make_tour('Mara', image=make_jpeg(2000, 1000))
+        tour.refresh_from_db()
+        variants = tour.image_variants
+        self.assertEqual(variants['source'], tour.image.name)
+        self.assertEqual([w for w, _ in variants['webp']], [480, 960, 1600])
+        self.assertEqual([w for w, _ in variants['jpeg']], [480, 960, 1600])
+        self.assertTrue(variants['webp'][0][1].endswith('-480w.webp'))
+        with tour.image.storage.open(variants['jpeg'][1][1]) as fh:
+            self.assertEqual(Image.open(fh).size, (960, 480))
+
+    def test_small_original_is_not_upscaled(self):
+        tour = make_tour('Mara', image=make_jpeg(300, 200))
+        tour.refresh_from_db()
+        self.assertEqual([w for w, _ in tour.image_variants['jpeg']], [300])
+
+    def test_templates_render_srcset(self):
+        tour = make_tour('Mara', image=make_jpeg(1200, 800))
+        TourImage.objects.create(tour=tour, image=make_jpeg(1000, 750, 'g.jpg'))
+        response = self.client.get(tour.get_absolute_url())
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '-480w.webp 480w')
+        self.assertContains(response, '-960w.jpg')  # hero background derivative
+
+    def test_rebuilds_expire_cached_fragments(self):
+        tour = make_tour('Mara', image=make_jpeg(1000, 500))
+        TourImage.objects.create(tour=tour, image=make_jpeg(600, 400, 'g.jpg'))
+        before = Tour.objects.get(pk=tour.pk).updated_at
+        self.client.get(tour.get_absolute_url())  # caches the gallery fragment
+        call_command('build_image_derivatives', workers=1, force=True, stdout=StringIO())
+        self.assertGreater(Tour.objects.get(pk=tour.pk).updated_at, before)
+        current = images.variant_names(TourImage.objects.get(tour=tour).image_variants)
+        response = self.client.get(tour.get_absolute_url())
+        self.assertTrue(all(name in response.content.decode() for name in current))
+
+    def test_replaced_and_deleted_images_take_their_derivatives_along(self):
+        storage = Tour._meta.get_field('image').storage
+        with self.captureOnCommitCallbacks(execute=True):
+            tour = make_tour('Mara', image=make_jpeg(1000, 500))
+            gallery = TourImage.objects.create(tour=tour, image=make_jpeg(600, 400, 'g.jpg'))
+        first = images.variant_names(Tour.objects.get(pk=tour.pk).image_variants)
+        self.assertTrue(all(storage.exists(name) for name in first))
+
+        tour.image = make_jpeg(800, 400, 'new.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            tour.save()
+        self.assertFalse(any(storage.exists(name) for name in first))
+        tour.refresh_from_db()
+        current = images.variant_names(tour.image_variants) | images.variant_names(gallery.image_variants)
+        self.assertTrue(all(storage.exists(name) for name in current))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tour.delete()
+        self.assertFalse(any(storage.exists(name) for name in current))
+
+    def test_backfill_command(self):
+        with override_settings(IMAGE_DERIVATIVES_ON_SAVE=False):
+            tour = make_tour('Mara', image=make_jpeg(1000, 500))
+        self.assertEqual(Tour.objects.get(pk=tour.pk).image_variants, {})
+        call_command('build_image_derivatives', workers=1, stdout=StringIO())
+        self.assertEqual(len(Tour.objects.get(pk=tour.pk).image_variants['jpeg']), 2)
+
+
+class DepartureCapacityTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tour = make_tour('Gorilla Trek', max_group_size=6)
+        self.date = datetime.date(2030, 3, 1)
+
+    def make_booking(self, pax, **kwargs):
+        booking = Booking(
+            tour=self.tour, full_name='Guest', email='g@example.com', phone='1',
+            number_of_people=pax, preferred_date=self.date, **kwargs
+        )
+        booking.save(check_capacity=True)
+        return booking
+
+    def departure(self):
+        return Departure.objects.get(tour=self.tour, date=self.date)
+
+    def test_counter_follows_creates_edits_and_deletes(self):
+        booking = self.make_booking(2)
+        self.make_booking(3)
+        self.assertEqual(self.departure().seats_taken, 5)
+
+        booking.number_of_people = 1
+        booking.save()
+        self.assertEqual(self.departure().seats_taken, 4)
+
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertEqual(self.departure().seats_taken, 3)
+
+        booking.status = 'confirmed'
+        booking.save()
+        self.assertEqual(self.departure().seats_taken, 4)
+
+        Booking.objects.filter(pk=booking.pk).delete()
+        self.assertEqual(self.departure().seats_taken, 3)
+
+    def test_moving_date_moves_seats(self):
+        booking = self.make_booking(2)
+        booking.preferred_date = datetime.date(2030, 4, 1)
+        booking.save()
+        self.assertEqual(self.departure().seats_taken, 0)
+        self.assertEqual(Departure.objects.get(date=booking.preferred_date).seats_taken, 2)
+
+    def test_full_departure_is_rejected_atomically(self):
+        self.make_booking(5)
+        with self.assertRaises(availability.DepartureFull) as ctx:
+            self.make_booking(2)
+        self.assertEqual(ctx.exception.seats_left, 1)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(self.departure().seats_taken, 5)
+
+    def test_booking_form_rejects_full_departure(self):
+        self.make_booking(6)
+        response = self.client.post(reverse('booking', args=[self.tour.slug]), {
+            'full_name': 'Late', 'email': 'late@example.com', 'phone': '1',
+            'number_of_people': 1, 'preferred_date': '2030-03-01',
+        })
+        self.assertContains(response, 'fully booked')
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(OutboundEmail.objects.count(), 0)
+
+    def test_claim_is_checked_even_if_form_precheck_passed(self):
+        # Simulates a concurrent request taking the seats between clean() and save().
+        with mock.patch('core.availability.seats_left', return_value=6):
+            self.make_booking(4)
+            response = self.client.post(reverse('booking', args=[self.tour.slug]), {
+                'full_name': 'Racer', 'email': 'r@example.com', 'phone': '1',
+                'number_of_people': 3, 'preferred_date': '2030-03-01',
+            })
+        self.assertContains(response, 'only 2 seats are left')
+        self.assertEqual(self.departure().seats_taken, 4)
+
+
+class CatalogueApiTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tour = make_tour('Serengeti Explorer', difficulty='moderate', price=3500)
+        ItineraryDay.objects.create(tour=self.tour, day_number=1, title='Arusha', description='Arrive.')
+        make_tour('Beach Retreat', difficulty='easy', price=1200)
+
+    def test_list_applies_catalogue_filters(self):
+        data = self.client.get(reverse('api_tour_list'), {'difficulty': 'moderate'}).json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual([t['slug'] for t in data['results']], ['serengeti-explorer'])
+        data = self.client.get(reverse('api_tour_list'), {'max_price': 2000}).json()
+        self.assertEqual([t['name'] for t in data['results']], ['Beach Retreat'])
+
+    def test_list_pages_with_cursor(self):
+        data = self.client.get(reverse('api_tour_list'), {'limit': 1}).json()
+        self.assertEqual(len(data['results']), 1)
+        second = self.client.get(data['next']).json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+        self.assertNotEqual(data['results'][0]['slug'], second['results'][0]['slug'])
+
+    def test_detail_embeds_itinerary_and_gallery(self):
+        response = self.client.get(reverse('api_tour_detail', args=[self.tour.slug]))
+        data = response.json()
+        self.assertEqual(data['itinerary'][0]['title'], 'Arusha')
+        self.assertEqual(data['gallery'], [])
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_unknown_tour_is_json_404(self):
+        response = self.client.get(reverse('api_tour_detail', args=['nope']))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Not found'})
+
+    def test_conditional_get_returns_304_until_content_changes(self):
+        url = reverse('api_tour_detail', args=[self.tour.slug])
+        etag = self.client.get(url)['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        with self.assertNumQueries(1):  # just the ETag lookup
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        ItineraryDay.objects.create(tour=self.tour, day_number=2, title='Serengeti', description='Drive.')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_tracks_additions(self):
+        url = reverse('api_tour_list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        make_tour('Samburu')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_validators_follow_changes_outside_updated_at(self):
+        detail = reverse('api_tour_detail', args=[self.tour.slug])
+        popular = reverse('api_tour_list') + '?sort=popular'
+        etags = {url: self.client.get(url)['ETag'] for url in (detail, popular)}
+        # Derivative backfills save with QuerySet.update and only bump the catalogue version
+        invalidate_catalogue()
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etags[detail]).status_code, 200)
+
+        etag = self.client.get(popular)['ETag']
+        Booking.objects.create(
+            tour=self.tour, full_name='Guest', email='g@example.com', phone='1',
+            number_of_people=2, preferred_date=timezone.localdate(), status='confirmed',
+        )
+        response = self.client.get(popular, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t['slug'] for t in response.json()['results']][0], self.tour.slug)
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True, METRICS_TOKEN='', REQUEST_PROFILE_SAMPLE_RATE=0)
+class RequestMetricsTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        make_tour('Serengeti Explorer')
+        instrumentation.registry = instrumentation.Registry()
+
+    def test_server_timing_reports_queries_and_cache(self):
+        with self.assertLogs('core.requests', 'INFO') as logs:
+            response = self.client.get(reverse('tours'))
+            cached = self.client.get(reverse('tours'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertIn('cache;desc="miss"', response['Server-Timing'])
+        self.assertIn('desc="0 queries"', cached['Server-Timing'])
+        self.assertIn('cache;desc="hit"', cached['Server-Timing'])
+        self.assertIn('"view": "tours"', logs.output[0])
+
+    def test_metrics_endpoint_exposes_prometheus_text(self):
+        with self.assertLogs('core.requests', 'INFO'):
+            self.client.get(reverse('home'))
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+            self.client.force_login(User.objects.create_user('ops', is_staff=True))
+            body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('mmsafaris_requests_total{view="home",method="GET",status="200"} 1', body)
+        self.assertIn('mmsafaris_request_duration_seconds_count{view="home"} 1', body)
+        self.assertIn('mmsafaris_outbox_queued 0', body)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_metrics_token_is_enforced(self):
+        with self.assertLogs('core.requests', 'INFO'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+            wrong = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3crex')
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual((wrong.status_code, response.status_code), (403, 200))
+
+    @override_settings(REQUEST_METRICS_ENABLED=False, METRICS_TOKEN='s3cret')
+    def test_metrics_are_not_found_when_disabled(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 404)
+
+    def test_slow_sampled_requests_are_profiled(self):
+        with tempfile.TemporaryDirectory() as profile_dir, override_settings(
+            REQUEST_PROFILE_SAMPLE_RATE=1.0, REQUEST_PROFILE_SLOW_MS=0, REQUEST_PROFILE_DIR=profile_dir,
+        ), self.assertLogs('core.requests', 'INFO'):
+            self.client.get(reverse('about'))
+            self.assertEqual(len(list(Path(profile_dir).iterdir())), 1)
+
+
+class PopulateDbTests(SiteTestCase):
+    def populate(self, **options):
+        call_command('populate_db', stdout=StringIO(), **options)
+
+    def test_prerendered_snapshots_are_rebuilt(self):
+        patcher = mock.patch.object(prerender, 'PRERENDER_DIR', Path(tempfile.mkdtemp()))
+        self.addCleanup(shutil.rmtree, patcher.start())
+        self.addCleanup(patcher.stop)
+        old = make_tour('Old Safari')
+        prerender.build()
+        self.populate(tours=2, bookings=0, messages=0)
+        self.assertFalse(prerender.page_file(old.get_absolute_url()).exists())
+        for tour in Tour.objects.all():
+            self.assertTrue(prerender.page_file(tour.get_absolute_url()).exists())
+        self.assertEqual(set(prerender.read_manifest()['tours']), {str(tour.pk) for tour in Tour.objects.all()})
+
+    def test_bulk_load_in_batches(self):
+        self.populate(tours=20, bookings=500, messages=8, itinerary=True, batch_size=64)
+        self.assertEqual(Tour.objects.count(), 20)
+        self.assertEqual(Booking.objects.count(), 500)
+        self.assertEqual(ContactMessage.objects.count(), 8)
+        self.assertEqual(
+            ItineraryDay.objects.count(), sum(Tour.objects.values_list('duration_days', flat=True))
+        )
+        self.assertTrue(Tour.objects.filter(slug='maasai-mara-great-migration-safari').exists())
+
+        # Derived data skipped by bulk_create is rebuilt at the end.
+        held = Booking.objects.filter(status__in=Booking.SEAT_HOLDING_STATUSES)
+        self.assertEqual(
+            sum(d.seats_taken for d in Departure.objects.all()),
+            sum(b.number_of_people for b in held),
+        )
+        response = self.client.get(reverse('tours'), {'q': 'flamingos'})
+        self.assertContains(response, 'Lake Nakuru Flamingo Spectacle')
+
+    def test_same_seed_same_data_and_reruns_replace(self):
+        self.populate(tours=15, bookings=50, seed=7)
+        first = list(Booking.objects.order_by('pk').values_list('tour__slug', 'email', 'preferred_date'))
+        self.populate(tours=15, bookings=50, seed=7)
+        self.assertEqual(Booking.objects.count(), 50)
+        self.assertEqual(
+            list(Booking.objects.order_by('pk').values_list('tour__slug', 'email', 'preferred_date')), first
+        )
+
+
+class AssetPipelineTests(SiteTestCase):
+    def make_sources(self, root):
+        shutil.copytree(settings.STATICFILES_DIRS[0] / 'css', root / 'css')
+        shutil.copytree(settings.STATICFILES_DIRS[0] / 'js', root / 'js')
+        fake_vendor = {
+            'vendor/bootstrap/css/bootstrap.min.css':
+                '/*! Bootstrap */:root{--bs-blue:#0d6efd}.navbar{display:flex}.card{display:flex}',
+            'vendor/fontawesome/css/all.min.css':
+                '@font-face{font-family:"Font Awesome 6 Free";src:url(../webfonts/fa-solid-900.woff2) format("woff2")}',
+            assets.FONTS_CSS: "/* latin */\n@font-face {font-family: 'Poppins'; src: url(poppins.woff2);"
+                              " unicode-range: U+0000-00FF;}\n",
+            'vendor/swiper/swiper-bundle.min.css': '.swiper{position:relative}',
+            'vendor/bootstrap/js/bootstrap.bundle.min.js': '!function(){}();',
+            'vendor/swiper/swiper-bundle.min.js': 'var Swiper=function(){};',
+        }
+        for path, content in fake_vendor.items():
+            (root / path).parent.mkdir(parents=True, exist_ok=True)
+            (root / path).write_text(content)
+
+    def test_minify_css_keeps_strings_and_license_comments(self):
+        css = '/*! MIT */\n/* note */\n.a  >  .b {\n  content: "a , b";\n  color: red;\n}\n'
+        self.assertEqual(assets.minify_css(css), '/*! MIT */.a>.b{content:"a , b";color:red}')
+
+    def test_build_bundles_and_critical_css(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            self.make_sources(root)
+            assets.build_all(root)
+
+            site_css = (root / 'dist/site.css').read_text()
+            # url()s are rebased from the vendor file onto dist/
+            self.assertIn('url(../vendor/fontawesome/webfonts/fa-solid-900.woff2)', site_css)
+            self.assertIn('url(../vendor/fonts/poppins.woff2)', site_css)
+            self.assertNotIn('/* Custom Animated Hamburger Menu */', site_css)
+            self.assertIn('!function(){}();', (root / 'dist/site.js').read_text())
+
+            critical = (root / 'dist/critical.css').read_text()
+            self.assertIn('.navbar{display:flex}', critical)
+            self.assertIn('.hero h1{', critical)
+            self.assertIn("font-family:'Poppins'", critical)
+            self.assertNotIn('.card{', critical)
+            self.assertNotIn('Font Awesome', critical)
+
+    def test_pages_link_sources_until_bundles_are_built(self):
+        response = self.client.get(reverse('about'))
+        self.assertNotContains(response, '--navbar-height')  # no inline site CSS any more
+        self.assertContains(response, '/static/css/base.css')
+        self.assertContains(response, '<script src="/static/js/base.js" defer></script>', html=False)
+
+
+class BookingAdminTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('ops', 'ops@example.com', 'pw'))
+        self.mara = make_tour('Mara', price=1000, max_group_size=10)
+        self.trek = make_tour('Trek', price=2000, max_group_size=4)
+        self.date = timezone.localdate().replace(day=10)
+
+    def book(self, tour, pax, status='confirmed', date=None):
+        return Booking.objects.create(
+            tour=tour, full_name='Guest', email='g@example.com', phone='1',
+            number_of_people=pax, preferred_date=date or self.date, status=status,
+        )
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse('admin:core_booking_changelist')).status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.book(self.mara, 1)
+        few = self.changelist_queries()
+        for _ in range(20):
+            self.book(self.trek, 1, date=self.date + datetime.timedelta(days=1))
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_dashboard_aggregates_revenue_and_occupancy(self):
+        self.book(self.mara, 2)
+        self.book(self.mara, 3, status='paid')
+        self.book(self.mara, 1, status='pending')  # holds seats, not revenue
+        self.book(self.trek, 4, status='cancelled')
+        response = self.client.get(reverse('admin:core_booking_dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+        mara = next(row for row in response.context['tour_months'] if row['tour_id'] == self.mara.pk)
+        self.assertEqual((mara['bookings'], mara['pax'], mara['revenue']), (2, 5, 5000))
+        self.assertEqual(mara['occupancy'], 60.0)  # 6 of 10 seats, pending included
+        statuses = {row['status']: row['bookings'] for row in response.context['statuses']}
+        self.assertEqual(statuses, {'pending': 1, 'confirmed': 1, 'paid': 1, 'completed': 0, 'cancelled': 1})
+        self.assertContains(response, '$5,000')
+
+    def test_dashboard_needs_view_permission_and_a_valid_window(self):
+        url = reverse('admin:core_booking_dashboard')
+        self.assertEqual(self.client.get(url, {'start': '2025-06-01', 'end': '2025-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': 'june'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2025-01-15', 'end': '2025-01-20'}).status_code, 200)
+
+        self.client.force_login(User.objects.create_user('clerk', 'clerk@example.com', 'pw', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_dashboard_is_cached_until_refreshed(self):
+        start, end = dashboard.month_window()
+        with self.assertNumQueries(3):
+            dashboard.booking_dashboard(start, end)
+        self.book(self.mara, 2)
+        with self.assertNumQueries(0):
+            cached = dashboard.booking_dashboard(start, end)
+        self.assertEqual(cached['tour_months'], [])
+        self.assertEqual(len(dashboard.booking_dashboard(start, end, refresh=True)['tour_months']), 1)
+
+
+class TourStatsTests(SiteTestCase):
+    FIELDS = (
+        'bookings_pending', 'bookings_confirmed', 'bookings_paid', 'bookings_completed',
+        'bookings_cancelled', 'pax', 'revenue', 'popularity', 'next_departure',
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.mara = make_tour('Mara', price=1000, max_group_size=10)
+        self.trek = make_tour('Trek', price=2000, max_group_size=10)
+        self.date = timezone.localdate() + datetime.timedelta(days=30)
+
+    def book(self, tour, pax, status='confirmed', date=None):
+        return Booking.objects.create(
+            tour=tour, full_name='Guest', email='g@example.com', phone='1',
+            number_of_people=pax, preferred_date=date or self.date, status=status,
+        )
+
+    def snapshot(self):
+        return {
+            row['tour_id']: row
+            for row in TourStats.objects.values('tour_id', *self.FIELDS)
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        stats.rebuild_stats()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_new_tours_get_an_empty_row(self):
+        row = TourStats.objects.get(tour=self.mara)
+        self.assertEqual((row.popularity, row.pax, row.revenue, row.next_departure), (0, 0, 0, None))
+
+    def test_incremental_updates_match_a_full_rebuild(self):
+        booking = self.book(self.mara, 2)
+        self.book(self.mara, 3, status='paid')
+        self.book(self.mara, 1, status='pending')
+        self.assertMatchesRebuild()
+        row = TourStats.objects.get(tour=self.mara)
+        self.assertEqual((row.popularity, row.pax, row.revenue), (3, 6, 5000))
+        self.assertEqual(row.next_departure, self.date)
+
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertMatchesRebuild()
+
+        later = self.date + datetime.timedelta(days=7)
+        booking.status, booking.number_of_people, booking.preferred_date = 'confirmed', 4, later
+        booking.save()
+        self.assertMatchesRebuild()
+
+        booking.tour = self.trek
+        booking.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(TourStats.objects.get(tour=self.trek).next_departure, later)
+
+        booking.delete()
+        self.assertMatchesRebuild()
+        self.assertEqual(TourStats.objects.get(tour=self.trek).popularity, 0)
+
+    def test_popular_sort_orders_by_bookings(self):
+        for _ in range(2):
+            self.book(self.trek, 1)
+        self.book(self.mara, 1)
+        self.book(self.mara, 1, status='cancelled')
+        response = self.client.get(reverse('tours'), {'sort': 'popular'})
+        self.assertEqual([t.name for t in response.context['tours']], ['Trek', 'Mara'])
+
+    def test_tours_without_stats_stay_on_popular_pages(self):
+        self.book(self.trek, 1)
+        TourStats.objects.filter(tour=self.mara).delete()
+        slugs, data = [], self.client.get(reverse('api_tour_list'), {'sort': 'popular', 'limit': 1}).json()
+        while True:
+            slugs += [tour['slug'] for tour in data['results']]
+            if not data['next']:
+                break
+            data = self.client.get(data['next']).json()
+        self.assertEqual(slugs, [self.trek.slug, self.mara.slug])
+        Tour.objects.update(featured=True)
+        self.assertEqual(list(selectors.featured_tours()), [self.trek, self.mara])
+
+    def test_rebuild_command_repairs_drift(self):
+        self.book(self.mara, 2)
+        TourStats.objects.filter(tour=self.mara).update(popularity=99, pax=0)
+        out = StringIO()
+        call_command('rebuild_tour_stats', stdout=out)
+        self.assertIn('2 tours', out.getvalue())
+        row = TourStats.objects.get(tour=self.mara)
+        self.assertEqual((row.popularity, row.pax), (1, 2))
+
+
+# Lets AsyncViewTests route the public pages to core.async_views.
+urlpatterns = urls.page_patterns(async_views)
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class AsyncViewTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tour = make_tour('Mara Migration', max_group_size=4, featured=True)
+        self.date = timezone.localdate() + datetime.timedelta(days=30)
+
+    async def test_catalogue_pages_render(self):
+        for url in (reverse('home'), reverse('tours'), self.tour.get_absolute_url()):
+            response = await self.async_client.get(url)
+            self.assertContains(response, 'Mara Migration')
+        response = await self.async_client.get(reverse('tours'), {'q': 'migration', 'sort': 'popular'})
+        self.assertEqual([t.name for t in response.context['tours']], ['Mara Migration'])
+        self.assertEqual(response.context['total_count'], 1)
+
+    async def test_bad_slug_and_cursor_are_404(self):
+        self.assertEqual((await self.async_client.get('/tours/missing/')).status_code, 404)
+        self.assertEqual((await self.async_client.get(reverse('tours'), {'cursor': '!!'})).status_code, 404)
+
+    async def test_pages_are_served_from_the_page_cache(self):
+        url = self.tour.get_absolute_url()
+        await self.async_client.get(url)
+        await Tour.objects.filter(pk=self.tour.pk).aupdate(name='Renamed without signals')
+        self.assertContains(await self.async_client.get(url), 'Mara Migration')
+
+    async def test_booking_saves_and_queues_mail(self):
+        url = reverse('booking', args=[self.tour.slug])
+        self.assertEqual((await self.async_client.get(url)).status_code, 200)
+        data = {
+            'full_name': 'Ann', 'email': 'ann@example.com', 'phone': '1',
+            'number_of_people': 3, 'preferred_date': self.date,
+        }
+        response = await self.async_client.post(url, data)
+        self.assertRedirects(response, self.tour.get_absolute_url(), fetch_redirect_response=False)
+        self.assertEqual(await Booking.objects.filter(tour=self.tour).acount(), 1)
+        self.assertEqual(await OutboundEmail.objects.acount(), 2)
+
+        response = await self.async_client.post(url, data)
+        self.assertContains(response, 'only 1 seats are left')
+
+    async def test_contact_saves_and_queues_mail(self):
+        data = {'name': 'Ann', 'email': 'ann@example.com', 'subject': 'Hi', 'message': 'Hello'}
+        response = await self.async_client.post(reverse('contact'), data)
+        self.assertRedirects(response, reverse('contact'), fetch_redirect_response=False)
+        self.assertEqual(await ContactMessage.objects.acount(), 1)
+        self.assertEqual(await OutboundEmail.objects.acount(), 1)
+
+
+class ReplicaRoutingTests(SiteTestCase):
+    def route(self, request):
+        """The aliases Tour and Booking reads use while ``request`` is handled."""
+        seen = {}
+
+        def view(request):
+            seen['tour'] = Tour.objects.all().db
+            seen['booking'] = Booking.objects.all().db
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return (seen['tour'], seen['booking']), response
+
+    def test_catalogue_reads_use_the_replica_only_in_get_requests(self):
+        self.assertEqual(Tour.objects.all().db, 'default')  # commands, workers, shell
+        aliases, response = self.route(RequestFactory().get('/tours/'))
+        self.assertEqual(aliases, ('replica', 'default'))
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.route(RequestFactory().get(reverse('admin:index')))[0], ('default', 'default'))
+
+    def test_post_pins_the_visitor_to_the_primary(self):
+        aliases, response = self.route(RequestFactory().post('/contact/'))
+        self.assertEqual(aliases, ('default', 'default'))
+        cookie = response.cookies[routers.STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], routers.STICKY_SECONDS)
+
+        request = RequestFactory().get('/tours/')
+        request.COOKIES[routers.STICKY_COOKIE] = '1'
+        self.assertEqual(self.route(request)[0], ('default', 'default'))
+
+    def test_writes_and_relations_across_aliases(self):
+        with routers.replica_reads():
+            tour = Tour.objects.get(pk=make_tour('Mara').pk)
+        self.assertEqual(tour._state.db, 'replica')
+        booking = Booking.objects.create(
+            tour=tour, full_name='Guest', email='g@example.com', phone='1',
+            number_of_people=1, preferred_date=datetime.date(2030, 1, 1),
+        )
+        self.assertEqual(booking._state.db, 'default')
+
+    def test_healthz_checks_every_database_and_the_cache(self):
+        response = self.client.get(reverse('healthz'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok', 'failing': []})
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with mock.patch.object(health, 'check_cache', side_effect=ConnectionError('redis://secret@cache down')), \
+                self.assertLogs('core.health', 'ERROR') as logs:
+            response = self.client.get(reverse('healthz'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'status': 'error', 'failing': ['cache']})
+        self.assertIn('redis://secret@cache down', logs.output[0])
+
+    @override_settings(HEALTH_TOKEN='s3cret')
+    def test_healthz_details_need_staff_or_the_token(self):
+        with mock.patch.object(health, 'check_cache', side_effect=ConnectionError('down')), \
+                self.assertLogs('core.health', 'ERROR'):
+            self.assertNotIn('checks', self.client.get(reverse('healthz'), HTTP_AUTHORIZATION='Bearer nope').json())
+            response = self.client.get(reverse('healthz'), HTTP_AUTHORIZATION='Bearer s3cret')
+            self.assertEqual(response.json()['checks']['cache'], 'ConnectionError: down')
+            self.assertEqual(response.json()['checks']['database:default'], 'ok')
+            self.client.force_login(User.objects.create_user('ops', 'ops@example.com', 'pw', is_staff=True))
+            self.assertIn('checks', self.client.get(reverse('healthz')).json())
+
+
+class BookingExportTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.tour = make_tour('Mara', price=1200, max_group_size=20)
+        self.book(2, 'confirmed', datetime.date(2030, 1, 10))
+        self.book(1, 'cancelled', datetime.date(2030, 1, 20))
+        self.book(3, 'paid', datetime.date(2030, 3, 1))
+
+    def book(self, pax, status, date):
+        return Booking.objects.create(
+            tour=self.tour, full_name='Guest', email='g@example.com', phone='1',
+            number_of_people=pax, preferred_date=date, status=status,
+        )
+
+    def export(self, *args):
+        output = self.tmp / 'out.csv'
+        call_command('export_bookings', '--output', str(output), *args, stdout=StringIO())
+        return list(csv.DictReader(output.read_text().splitlines()))
+
+    def test_csv_filtered_by_travel_dates_and_status(self):
+        rows = self.export('--start', '2030-01-01', '--end', '2030-01-31', '--status', 'confirmed,paid')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['tour_name'], 'Mara')
+        self.assertEqual((rows[0]['status'], rows[0]['number_of_people']), ('confirmed', '2'))
+        self.assertEqual(Decimal(rows[0]['amount']), 2400)
+        self.assertEqual(list(rows[0]), [header for header, _, _ in exports.COLUMNS])
+
+    @mock.patch.object(exports, 'EXPORT_WATERMARK_LAG', 0)
+    def test_watermark_file_exports_only_new_bookings(self):
+        watermark = self.tmp / 'watermark'
+        self.assertEqual(len(self.export('--watermark-file', str(watermark))), 3)
+        self.assertEqual(self.export('--watermark-file', str(watermark)), [])
+        latest = self.book(4, 'pending', datetime.date(2030, 5, 1))
+        rows = self.export('--watermark-file', str(watermark))
+        self.assertEqual([row['booking_id'] for row in rows], [str(latest.pk)])
+        self.assertEqual(watermark.read_text(), latest.created_at.isoformat())
+
+    def test_recent_bookings_wait_for_the_next_incremental_run(self):
+        watermark = self.tmp / 'watermark'
+        Booking.objects.update(created_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(len(self.export('--watermark-file', str(watermark))), 3)
+        # Inserted a minute ago but committed only now: still exported next time
+        late = self.book(4, 'pending', datetime.date(2030, 5, 1))
+        self.assertEqual(self.export('--watermark-file', str(watermark)), [])
+        Booking.objects.filter(pk=late.pk).update(created_at=timezone.now() - datetime.timedelta(minutes=10))
+        rows = self.export('--watermark-file', str(watermark))
+        self.assertEqual([row['booking_id'] for row in rows], [str(late.pk)])
+
+    def test_csv_neutralises_formulas(self):
+        Booking.objects.update(full_name='=HYPERLINK("http://x")', phone='+255 700')
+        row = self.export()[0]
+        self.assertEqual((row['full_name'], row['phone']), ('\'=HYPERLINK("http://x")', "'+255 700"))
+        self.assertEqual(row['status'], 'confirmed')
+
+    def test_rows_are_fetched_in_chunks(self):
+        with self.assertNumQueries(1):
+            chunks = list(exports.write_csv(exports.booking_rows(), chunk_size=2))
+        self.assertEqual(len(chunks), 3)  # header, two rows, one row
+
+    def test_admin_action_streams_the_selection(self):
+        self.client.force_login(User.objects.create_superuser('ops', 'ops@example.com', 'pw'))
+        response = self.client.post(reverse('admin:core_booking_changelist') + '?status__exact=paid', {
+            'action': 'export_csv', 'select_across': '1', 'index': '0',
+            '_selected_action': Booking.objects.values_list('pk', flat=True)[:1],
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="bookings-', response['Content-Disposition'])
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row['status'] for row in rows], ['paid'])
+
+    @skipUnless(exports.pyarrow, 'pyarrow is not installed')
+    def test_parquet_round_trip(self):
+        import pyarrow.parquet
+
+        data = b''.join(exports.write_parquet(exports.booking_rows(statuses=['paid']), chunk_size=1))
+        table = pyarrow.parquet.read_table(BytesIO(data))
+        self.assertEqual(table.column_names, [header for header, _, _ in exports.COLUMNS])
+        self.assertEqual(table.column('amount').to_pylist(), [Decimal('3600.00')])
+
+
+class TourFacetTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        make_tour('Short Easy', duration_days=2, price=1200, max_group_size=6)
+        make_tour('Week Easy', duration_days=6, price=2500, max_group_size=12)
+        make_tour('Week Moderate', duration_days=7, price=3500, max_group_size=4, difficulty='moderate')
+        make_tour('Long Challenging', duration_days=16, price=7000, difficulty='challenging')
+
+    def facets(self, response):
+        return {
+            facet.name: {option.label: (option.count, option.selected) for option in facet.options}
+            for facet in response.context['facets']
+        }
+
+    def test_counts_come_from_one_query(self):
+        found = selectors.catalogue_search(QueryDict())
+        with self.assertNumQueries(1):
+            counts = facets.facet_counts(found)
+        self.assertEqual(counts['total'], 4)
+        self.assertEqual(
+            [counts[f'difficulty_{value}'] for value, _ in Tour.DIFFICULTY_CHOICES], [2, 1, 1],
+        )
+        self.assertEqual([counts[f'price_{i}'] for i in range(4)], [1, 2, 0, 1])
+        self.assertEqual([counts[f'duration_{i}'] for i in range(4)], [1, 2, 0, 1])
+
+    def test_each_facet_ignores_its_own_selection(self):
+        response = self.client.get(reverse('tours'), {'difficulty': 'easy'})
+        self.assertEqual(response.context['total_count'], 2)
+        counts = self.facets(response)
+        self.assertEqual(counts['difficulty']['Easy'], (2, True))
+        self.assertEqual(counts['difficulty']['Moderate'], (1, False))
+        self.assertEqual(counts['duration']['4–7 days'], (1, False))
+        self.assertContains(response, 'Under $2,000')
+
+    def test_bucket_links_set_the_range_and_toggle_off(self):
+        counts = facets.facet_counts(selectors.catalogue_search(QueryDict()))
+        price = facets.facet_groups(QueryDict('cursor=abc&sort=price-low'), counts)[1].options[1]
+        self.assertEqual(price.url, '?sort=price-low&min_price=2000&max_price=3999.99')
+
+        response = self.client.get(reverse('tours') + price.url)
+        self.assertEqual([tour.name for tour in response.context['tours']], ['Week Easy', 'Week Moderate'])
+        selected = response.context['facets'][1].options[1]
+        self.assertTrue(selected.selected)
+        self.assertEqual(selected.url, '?sort=price-low')
+
+    def test_duration_and_group_size_filters(self):
+        response = self.client.get(reverse('tours'), {'min_days': 5, 'max_days': 10, 'group_size': 5})
+        self.assertEqual([tour.name for tour in response.context['tours']], ['Week Easy'])
+        self.assertEqual(self.facets(response)['duration']['4–7 days'], (1, False))
+
+    def test_invalid_numbers_are_ignored(self):
+        response = self.client.get(reverse('tours'), {'min_days': 'x', 'max_price': 'NaN', 'group_size': '-2'})
+        self.assertEqual(response.context['total_count'], 4)
+
+
+@mock.patch.object(throttling, 'THROTTLE_RATES', {
+    'booking': {'ip': '3/m', 'email': '2/m'},
+    'contact': {'ip': '2/m'},
+})
+class ThrottlingTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tour = make_tour('Amboseli')
+
+    def book(self, email='jane@example.com', ip='10.0.0.1'):
+        return self.client.post(reverse('booking', args=[self.tour.slug]), {
+            'full_name': 'Jane', 'email': email, 'phone': '1',
+            'number_of_people': 1, 'preferred_date': '2030-01-15',
+        }, REMOTE_ADDR=ip)
+
+    def test_email_limit_returns_429_before_validation(self):
+        self.assertEqual(self.book().status_code, 302)
+        self.assertEqual(self.book(email='JANE@example.com ', ip='10.0.0.2').status_code, 302)
+        with self.assertNumQueries(0), self.assertLogs('core.throttling', 'WARNING'):
+            response = self.book(ip='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertEqual(self.book(email='other@example.com').status_code, 302)
+
+    def test_ip_limit_and_gets_are_not_counted(self):
+        with self.assertLogs('core.throttling', 'WARNING'):
+            for i in range(3):
+                self.client.get(reverse('contact'))
+                self.client.post(reverse('contact'), {
+                    'name': 'A', 'email': f'{i}@example.com', 'subject': 'S', 'message': 'M',
+                })
+        self.assertEqual(ContactMessage.objects.count(), 2)
+        self.assertEqual(self.client.get(reverse('contact')).status_code, 200)
+
+    def test_clients_behind_the_proxy_get_their_own_limits(self):
+        emails = (f'{i}@example.com' for i in range(10))  # only the IP limit applies
+
+        def post(forwarded_for):
+            return self.client.post(reverse('contact'), {
+                'name': 'A', 'email': next(emails), 'subject': 'S', 'message': 'M',
+            }, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=forwarded_for)
+
+        with mock.patch.object(throttling, 'THROTTLE_PROXY_HOPS', 1), self.assertLogs('core.throttling', 'WARNING'):
+            statuses = [post(ip).status_code for ip in ('1.1.1.1', '1.1.1.1', '2.2.2.2', '1.1.1.1')]
+            # A forged leftmost entry doesn't buy a fresh bucket
+            forged = post('9.9.9.9, 1.1.1.1').status_code
+        self.assertEqual(statuses, [302, 302, 302, 429])
+        self.assertEqual(forged, 429)
+
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 3.3.3.3, 10.0.0.2')
+        with mock.patch.object(throttling, 'THROTTLE_PROXY_HOPS', 2):
+            self.assertEqual(throttling.client_ip(request), '3.3.3.3')
+        self.assertEqual(throttling.client_ip(request), '10.0.0.1')
+
+    def test_sliding_window_weights_the_previous_window(self):
+        request = RequestFactory().post('/', {'email': 'a@example.com'})
+        rate = throttling.Rate.parse('2/m')
+        self.assertEqual(rate, throttling.Rate(2, 60))
+        self.assertEqual(throttling.check('booking', request, now=59), 0)
+        self.assertEqual(throttling.check('booking', request, now=59), 0)
+        # 15s into the next window 3/4 of the previous two still count
+        self.assertEqual(throttling.check('booking', request, now=75), 45)
+        self.assertEqual(throttling.check('booking', request, now=120), 0)
+
+    @override_settings(ROOT_URLCONF='core.tests')
+    async def test_async_views_are_throttled(self):
+        data = {'name': 'A', 'email': 'a@example.com', 'subject': 'S', 'message': 'M'}
+        with self.assertLogs('core.throttling', 'WARNING'):
+            statuses = [(await self.async_client.post(reverse('contact'), data)).status_code for _ in range(3)]
+        self.assertEqual(statuses, [302, 302, 429])
+
+
+class SeoCachingTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tour = make_tour('Serengeti Explorer')
+
+    def test_sitemap_lists_tours_with_lastmod(self):
+        response = self.client.get(reverse('sitemap'))
+        self.assertContains(response, f'<loc>http://testserver{self.tour.get_absolute_url()}</loc>')
+        self.assertContains(response, f'<lastmod>{self.tour.updated_at.date().isoformat()}</lastmod>')
+        self.assertContains(response, '<loc>http://testserver/about/</loc>')
+        with self.assertNumQueries(0):
+            self.client.get(reverse('sitemap'))
+
+    def test_shared_pages_carry_edge_cache_headers(self):
+        response = self.client.get(self.tour.get_absolute_url())
+        self.assertEqual(response['Cache-Control'], 'public, max-age=0, s-maxage=300')
+        self.assertEqual(response['Surrogate-Key'], f'catalogue tour-{self.tour.pk}')
+        self.assertEqual(response['Last-Modified'], http_date(self.tour.updated_at.timestamp()))
+        for url in (reverse('home'), reverse('tours'), reverse('sitemap')):
+            self.assertIn('Cookie', self.client.get(url)['Vary'])
+
+        revalidated = self.client.get(self.tour.get_absolute_url(), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        self.client.cookies['messages'] = 'x'
+        self.assertIn('private', self.client.get(reverse('tours'))['Cache-Control'])
+
+    def test_prerendered_pages_are_served_without_queries(self):
+        call_command('prerender_pages', stdout=StringIO())
+        url = self.tour.get_absolute_url()
+        self.assertTrue(prerender.page_file(url).exists())
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertIn(b'Serengeti Explorer', b''.join(response.streaming_content))
+        self.assertEqual(response['Surrogate-Key'], f'catalogue tour-{self.tour.pk}')
+        self.assertEqual(response['Vary'], 'Accept-Encoding, Cookie')
+        # Query strings and visitors with a session get the live view
+        self.assertFalse(self.client.get(reverse('tours'), {'difficulty': 'easy'}).streaming)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'x'
+        self.assertFalse(self.client.get(url).streaming)
+
+    def test_builds_are_incremental_and_changes_discard_snapshots(self):
+        other = make_tour('Ngorongoro Crater')
+        result = prerender.build()
+        self.assertEqual(len(result.rendered), 5)  # home, tours, about + two tours
+        self.assertEqual(prerender.build().rendered, [])
+
+        self.tour.name = 'Serengeti Migration'
+        self.tour.slug = 'serengeti-migration'
+        self.tour.save()
+        self.assertFalse(prerender.page_file(reverse('tours')).exists())
+        self.assertTrue(prerender.page_file(other.get_absolute_url()).exists())
+
+        result = prerender.build()
+        self.assertEqual(result.rendered, [reverse('tours'), reverse('home'), self.tour.get_absolute_url()])
+        self.assertEqual(result.removed, ['/tours/serengeti-explorer/'])
+        self.assertFalse(prerender.page_file('/tours/serengeti-explorer/').exists())
+
+
+@skipUnless(mock_aws, 'moto is not installed')
+@override_settings(IMAGE_DERIVATIVES_ON_SAVE=False)
+class DirectUploadTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='mmsafaris-test')
+        # Media on (moto's) S3, as in production
+        s3 = uploads.S3Storage(
+            bucket_name='mmsafaris-test', region_name='us-east-1', access_key='testing', secret_key='testing',
+        )
+        patcher = mock.patch.object(default_storage, '_wrapped', s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(User.objects.create_superuser('ops', 'ops@example.com', 'pw'))
+
+    def sign(self, kind, *names):
+        return self.client.post(reverse('admin:core_tour_sign_uploads'), {
+            'kind': kind, 'files': [{'name': name, 'type': 'image/jpeg'} for name in names],
+        }, content_type='application/json')
+
+    def upload(self, kind, name, content=None):
+        signed = self.sign(kind, name).json()['uploads'][0]
+        if content is None:
+            content = BytesIO()
+            Image.new('RGB', (40, 30), 'orange').save(content, 'JPEG')
+            content = content.getvalue()
+        response = requests.post(signed['url'], data=signed['fields'], files={'file': (name, content)})
+        self.assertEqual(response.status_code, 204)
+        return signed['token']
+
+    def tour_form(self, **extra):
+        data = {
+            'name': 'Selous Boat Safari', 'slug': 'selous-boat-safari', 'description': 'River trip',
+            'duration_days': 4, 'price': 2100, 'difficulty': 'easy', 'max_group_size': 8,
+            'gallery_images-TOTAL_FORMS': 0, 'gallery_images-INITIAL_FORMS': 0,
+            'itinerary-TOTAL_FORMS': 0, 'itinerary-INITIAL_FORMS': 0,
+        }
+        data.update(extra)
+        return data
+
+    def test_uploaded_keys_are_recorded_on_the_tour_and_gallery(self):
+        image = self.upload('tour', 'main shot.jpg')
+        gallery = [self.upload('gallery', f'boat-{i}.jpg') for i in range(2)]
+        response = self.client.post(reverse('admin:core_tour_add'), self.tour_form(
+            image_upload=image, gallery_uploads=' '.join(gallery),
+        ))
+        self.assertEqual(response.status_code, 302)
+        tour = Tour.objects.get(slug='selous-boat-safari')
+        self.assertRegex(tour.image.name, r'^tours/[0-9a-f]{12}-main_shot\.jpg$')
+        names = sorted(tour.gallery_images.values_list('image', flat=True))
+        self.assertEqual(len(names), 2)
+        self.assertTrue(all(name.startswith('tours/gallery/') for name in names))
+
+    @override_settings(IMAGE_DERIVATIVES_ON_SAVE=None)
+    def test_admin_save_leaves_derivatives_to_the_backfill(self):
+        image = self.upload('tour', 'main.jpg')
+        gallery = self.upload('gallery', 'boat.jpg')
+        with mock.patch.object(images, 'generate_derivatives') as generate:
+            response = self.client.post(reverse('admin:core_tour_add'), self.tour_form(
+                image_upload=image, gallery_uploads=gallery,
+            ))
+        self.assertEqual(response.status_code, 302)
+        generate.assert_not_called()
+        tour = Tour.objects.get(slug='selous-boat-safari')
+        self.assertEqual(tour.image_variants, {})
+        self.assertEqual(tour.gallery_images.get().image_variants, {})
+
+    def test_server_side_verification(self):
+        bogus = self.upload('gallery', 'notes.jpg', content=b'not an image')
+        response = self.client.post(reverse('admin:core_tour_add'), self.tour_form(
+            gallery_uploads=f'{bogus} {self.upload("tour", "main.jpg")}',
+        ))
+        self.assertContains(response, 'is not a valid image')
+        self.assertContains(response, 'belongs to a different image field')
+        self.assertFalse(Tour.objects.exists())
+
+        never_uploaded = self.sign('tour', 'ghost.jpg').json()['uploads'][0]['token']
+        with self.assertRaisesMessage(ValidationError, 'never reached storage'):
+            uploads.verify(never_uploaded, 'tour')
+        with self.assertRaisesMessage(ValidationError, 'tampered'):
+            uploads.verify(never_uploaded + 'x', 'tour')
+
+    def test_verification_reads_only_the_head_of_the_object(self):
+        token = self.upload('tour', 'main.jpg')
+        s3 = default_storage.connection.meta.client
+        with mock.patch.object(s3, 'get_object', wraps=s3.get_object) as get_object, \
+                mock.patch.object(default_storage, 'open') as open_:
+            name = uploads.verify(token, 'tour')
+        get_object.assert_called_once()
+        self.assertEqual(get_object.call_args.kwargs['Range'], f'bytes=0-{uploads.SNIFF_BYTES - 1}')
+        open_.assert_not_called()
+
+        with mock.patch.object(uploads, 'MAX_UPLOAD_BYTES', 100), \
+                self.assertRaisesMessage(ValidationError, 'larger than'):
+            uploads.verify(token, 'tour')
+        self.assertFalse(default_storage.exists(name))
+
+    def test_sign_rejects_non_images(self):
+        response = self.client.post(reverse('admin:core_tour_sign_uploads'), {
+            'kind': 'gallery', 'files': [{'name': 'x.exe', 'type': 'application/octet-stream'}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertContains(self.client.get(reverse('admin:core_tour_add')), 'data-sign-url')
+
+
+class MediaServingTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        (media_root / 'tours').mkdir()
+        (media_root / 'tours' / 'lion.jpg').write_bytes(b'0123456789')
+        (media_root / 'tours' / 'lion.3f2a9c1b7e-960w.webp').write_bytes(b'webp')
+        self.url = '/media/tours/lion.jpg'
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.body(response), b'0123456789')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get('/media/tours/lion.3f2a9c1b7e-960w.webp')['Cache-Control'],
+            'public, max-age=31536000, immutable',
+        )
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.file_to_stream.tell(), 2)  # file_wrapper / sendfile starts at the range
+        self.assertEqual(self.body(response), b'2345')
+        self.assertEqual((response['Content-Range'], response['Content-Length']), ('bytes 2-5/10', '4'))
+
+        self.assertEqual(self.body(self.client.get(self.url, HTTP_RANGE='bytes=-3')), b'789')
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=10-').status_code, 416)
+        # A stale If-Range gets the whole (changed) file
+        stale = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"old"')
+        self.assertEqual((stale.status_code, self.body(stale)), (200, b'0123456789'))
+
+    def test_offload_to_the_web_server(self):
+        with mock.patch.object(media, 'MEDIA_SERVE_MODE', 'x-accel'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/tours/lion.jpg')
+        self.assertEqual(response.content, b'')
+        with mock.patch.object(media, 'MEDIA_SERVE_MODE', 'x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], str(settings.MEDIA_ROOT / 'tours' / 'lion.jpg'))
+
+    def test_missing_and_outside_files_are_404(self):
+        self.assertEqual(self.client.get('/media/tours/tiger.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/tours/').status_code, 404)
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+
+class AnonymousSessionTests(SiteTestCase):
+    def test_form_submits_write_no_session(self):
+        tour = make_tour('Amboseli')
+        response = self.client.post(reverse('booking', args=[tour.slug]), {
+            'full_name': 'Jane', 'email': 'jane@example.com', 'phone': '1',
+            'number_of_people': 1, 'preferred_date': '2030-01-15',
+        }, follow=True)
+        # The flash message made it through the messages cookie
+        self.assertContains(response, views.BOOKING_SUCCESS_MESSAGE)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        self.assertFalse(Session.objects.exists())
+
+    def test_staff_still_get_sessions(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.assertTrue(self.client.login(username='admin', password='pw'))
+        self.assertEqual(self.client.get(reverse('admin:index')).status_code, 200)
+
+    def test_purge_deletes_expired_sessions_in_batches(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key=f'old{i}', session_data='', expire_date=now - datetime.timedelta(days=1))
+        Session.objects.create(session_key='live', session_data='', expire_date=now + datetime.timedelta(days=1))
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('purge_sessions', batch_size=2, stdout=out)
+        self.assertIn('Deleted 5 expired sessions', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+        deletes = [q['sql'] for q in queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+
+
+class BookingTransitionTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_superuser('ops', 'ops@example.com', 'pw')
+        self.client.force_login(self.user)
+        self.mara = make_tour('Mara', price=1000, max_group_size=20)
+        self.date = timezone.localdate() + datetime.timedelta(days=30)
+
+    def book(self, pax, status='pending', date=None):
+        return Booking.objects.create(
+            tour=self.mara, full_name='Guest', email='g@example.com', phone='1',
+            number_of_people=pax, preferred_date=date or self.date, status=status,
+        )
+
+    def stats_row(self):
+        return TourStats.objects.values(*TourStatsTests.FIELDS).get(tour=self.mara)
+
+    def test_admin_action_moves_only_allowed_bookings(self):
+        pending = [self.book(1), self.book(2)]
+        paid = self.book(3, status='paid')
+        response = self.client.post(reverse('admin:core_booking_changelist'), {
+            'action': 'confirm', '_selected_action': [b.pk for b in [*pending, paid]],
+        }, follow=True)
+        self.assertContains(response, '2 bookings moved to Confirmed.')
+        self.assertContains(response, '1 bookings skipped')
+        self.assertEqual(
+            sorted(Booking.objects.values_list('status', flat=True)), ['confirmed', 'confirmed', 'paid'],
+        )
+        history = BookingStatusChange.objects.values_list('booking_id', 'from_status', 'to_status', 'changed_by')
+        self.assertEqual(sorted(history), [(b.pk, 'pending', 'confirmed', self.user.pk) for b in pending])
+        self.assertEqual(
+            list(OutboundEmail.objects.filter(subject__startswith='Booking Confirmed').values_list('recipients', flat=True)),
+            ['g@example.com'] * 2,
+        )
+
+    def test_statements_do_not_grow_with_the_selection(self):
+        def confirm_all():
+            with CaptureQueriesContext(connection) as ctx:
+                transitions.apply('confirm', Booking.objects.filter(status='pending'))
+            return len(ctx.captured_queries)
+
+        self.book(1)
+        few = confirm_all()
+        for day in range(20):
+            self.book(1, date=self.date + datetime.timedelta(days=day % 2))
+        self.assertEqual(confirm_all(), few)
+
+    def test_cancel_releases_seats_and_matches_rebuilt_stats(self):
+        other_day = self.date + datetime.timedelta(days=1)
+        self.book(2, status='confirmed')
+        self.book(3, status='paid')
+        self.book(4, status='confirmed', date=other_day)
+        result = transitions.apply('cancel', Booking.objects.filter(preferred_date=self.date), user=self.user)
+        self.assertEqual((result.moved, result.skipped), (2, 0))
+        self.assertEqual(Departure.objects.get(date=self.date).seats_taken, 0)
+        self.assertEqual(Departure.objects.get(date=other_day).seats_taken, 4)
+        incremental = self.stats_row()
+        stats.rebuild_stats()
+        self.assertEqual(incremental, self.stats_row())
+        self.assertEqual((incremental['bookings_cancelled'], incremental['revenue']), (2, 4000))
+
+    def test_status_edits_in_the_change_form_are_recorded(self):
+        booking = self.book(2)
+        url = reverse('admin:core_booking_change', args=[booking.pk])
+        data = {
+            'tour': self.mara.pk, 'full_name': 'Guest', 'email': 'g@example.com', 'phone': '1',
+            'number_of_people': 2, 'preferred_date': self.date, 'status': 'confirmed', 'special_requests': '',
+            'status_changes-TOTAL_FORMS': 0, 'status_changes-INITIAL_FORMS': 0,
+        }
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        self.assertEqual(
+            list(booking.status_changes.values_list('from_status', 'to_status')), [('pending', 'confirmed')],
+        )
+
+
+class ArchiveTests(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.mara = make_tour('Mara', price=1000)
+        self.date = timezone.localdate() - datetime.timedelta(days=400)
+        self.long_ago = timezone.now() - datetime.timedelta(days=500)
+
+    def book(self, status, old=True):
+        booking = Booking.objects.create(
+            tour=self.mara, full_name='Guest', email='g@example.com', phone='1',
+            number_of_people=2, preferred_date=self.date, status=status,
+        )
+        if old:
+            Booking.objects.filter(pk=booking.pk).update(created_at=self.long_ago)
+        return booking
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command('archive_old_records', '--batch-size', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_moves_old_finished_bookings_and_messages(self):
+        completed = self.book('completed')
+        BookingStatusChange.objects.create(booking=completed, from_status='paid', to_status='completed')
+        self.book('cancelled')
+        kept = [self.book('confirmed'), self.book('completed', old=False)]
+        old_message = ContactMessage.objects.create(name='A', email='a@example.com', subject='S', message='M')
+        ContactMessage.objects.filter(pk=old_message.pk).update(created_at=self.long_ago)
+        ContactMessage.objects.create(name='B', email='b@example.com', subject='S', message='M')
+
+        output = self.archive()
+        self.assertIn('Archived 2 bookings.', output)
+        self.assertIn('Archived 1 contact messages.', output)
+        self.assertEqual(set(Booking.objects.values_list('pk', flat=True)), {b.pk for b in kept})
+        archived = ArchivedBooking.objects.get(pk=completed.pk)
+        self.assertEqual((archived.tour_name, archived.status), ('Mara', 'completed'))
+        self.assertEqual([change[:2] for change in archived.status_history], [['paid', 'completed']])
+        self.assertFalse(BookingStatusChange.objects.exists())
+        self.assertEqual(ArchivedContactMessage.objects.get().pk, old_message.pk)
+        self.assertEqual(ContactMessage.objects.get().name, 'B')
+
+        # Seats and stats now count only the bookings left in the hot table
+        self.assertEqual(Departure.objects.get(date=self.date).seats_taken, 4)
+        incremental = TourStats.objects.values(*TourStatsTests.FIELDS).get(tour=self.mara)
+        stats.rebuild_stats()
+        self.assertEqual(incremental, TourStats.objects.values(*TourStatsTests.FIELDS).get(tour=self.mara))
+
+    def test_runs_can_stop_and_resume(self):
+        for _ in range(3):
+            self.book('cancelled')
+        self.assertIn('Archived 1 bookings.', self.archive('--max-batches', '1'))
+        self.assertEqual((Booking.objects.count(), ArchivedBooking.objects.count()), (2, 1))
+        self.assertIn('Archived 2 bookings.', self.archive())
+        self.assertEqual((Booking.objects.count(), ArchivedBooking.objects.count()), (0, 3))
+        self.assertIn('Archived 0 bookings.', self.archive())
+
+    def test_id_collision_rolls_the_batch_back(self):
+        booking = self.book('cancelled')
+        ArchivedBooking.objects.create(
+            id=booking.pk, tour_name='Other', full_name='X', email='x@example.com', phone='1',
+            number_of_people=1, preferred_date=self.date, status='cancelled', created_at=self.long_ago,
+        )
+        with self.assertRaises(IntegrityError):
+            self.archive()
+        self.assertTrue(Booking.objects.filter(pk=booking.pk).exists())
+        self.assertEqual(ArchivedBooking.objects.get().full_name, 'X')
+
+    def test_archive_admin_is_read_only(self):
+        self.book('cancelled')
+        self.archive()
+        self.client.force_login(User.objects.create_superuser('ops', 'ops@example.com', 'pw'))
+        self.assertContains(self.client.get(reverse('admin:core_archivedbooking_changelist')), 'Guest')
+        self.assertEqual(self.client.get(reverse('admin:core_archivedbooking_add')).status_code, 403)
+        pk = ArchivedBooking.objects.get().pk
+        response = self.client.get(reverse('admin:core_archivedbooking_change', args=[pk]))
+        self.assertNotContains(response, 'name="_save"')
@@ -0,0 +1,181 @@
+# ============================================
+# core/throttling.py
+# ============================================
+"""
+Rate limits for the public POST endpoints (bookings, contact messages).
+
+Each limit is a sliding-window counter in the cache: one counter per fixed
+window, bumped with ``cache.incr`` (atomic on Redis and locmem), and the
+previous window's count weighted by how much of it still overlaps the
+sliding window. That's two cache reads and one increment per key, no
+database work, so the check runs before the form is even validated.
+
+Limits are set per view in ``THROTTLE_RATES``, keyed by client IP and by
+the submitted email address::
+
+    THROTTLE_RATES = {'booking': {'ip': '10/h', 'email': '5/h'}}
+
+A request over any limit gets ``429 Too Many Requests`` with
+``Retry-After``. Every attempt counts, rejected ones included, so a flood
+stays throttled until it stops.
+"""
+import hashlib
+import logging
+import math
+import time
+from dataclasses import dataclass
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+logger = logging.getLogger('core.throttling')
+
+THROTTLE_ENABLED = getattr(settings, 'THROTTLE_ENABLED', True)
+THROTTLE_RATES = getattr(settings, 'THROTTLE_RATES', {})
+# How many trusted proxies append to X-Forwarded-For in front of the app
+THROTTLE_PROXY_HOPS = getattr(settings, 'THROTTLE_PROXY_HOPS', 0)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+THROTTLED_MESSAGE = 'Too many requests. Please wait a little and try again.'
+
+
+@dataclass(frozen=True)
+class Rate:
+    limit: int
+    window: int  # seconds
+
+    @classmethod
+    def parse(cls, value):
+        """'10/h' -> Rate(10, 3600); also '5/m', '100/d', '3/30s'."""
+        limit, _, period = value.partition('/')
+        count = period[:-1] or '1'
+        if period[-1:] not in PERIODS or not count.isdigit() or not limit.isdigit():
+            raise ValueError(f'Invalid throttle rate {value!r}; use e.g. "10/h".')
+        return cls(int(limit), int(count) * PERIODS[period[-1]])
+
+
+def client_ip(request):
+    """
+    The address ``THROTTLE_PROXY_HOPS`` entries from the right of
+    X-Forwarded-For: the one our outermost proxy saw. Entries further left
+    come from the client and can be forged.
+    """
+    if THROTTLE_PROXY_HOPS:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if forwarded:
+            return forwarded[-min(THROTTLE_PROXY_HOPS, len(forwarded))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _identities(request):
+    """Throttle subjects for ``request``: the client IP and, if given, the email."""
+    identities = {'ip': client_ip(request)}
+    email = request.POST.get('email', '').strip().lower()
+    if email:
+        identities['email'] = email
+    return identities
+
+
+def _keys(scope, kind, identity, window, now):
+    digest = hashlib.md5(identity.encode()).hexdigest()  # bounded key length, no raw emails
+    current = int(now // window)
+    return f'throttle:{scope}:{kind}:{digest}:{current}', f'throttle:{scope}:{kind}:{digest}:{current - 1}'
+
+
+def _bump(key, window):
+    cache.add(key, 0, timeout=window * 2)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add and incr
+        cache.set(key, 1, timeout=window * 2)
+        return 1
+
+
+async def _abump(key, window):
+    await cache.aadd(key, 0, timeout=window * 2)
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, timeout=window * 2)
+        return 1
+
+
+def _retry_after(rate, current, previous, now):
+    """
+    0 if this request (already in ``current``) is within ``rate``, otherwise
+    the seconds until one more request would be.
+    """
+    elapsed = now % rate.window
+    if previous * (1 - elapsed / rate.window) + current <= rate.limit:
+        return 0
+    if current < rate.limit and previous:
+        # Room opens up in this window as the previous one slides out
+        wait = rate.window * (1 - (rate.limit - current - 1) / previous) - elapsed
+    else:
+        # This window's count has to slide out far enough during the next one
+        wait = rate.window - elapsed + rate.window * (1 - (rate.limit - 1) / current)
+    return max(1, math.ceil(wait))
+
+
+def _limits(scope, request):
+    for kind, identity in _identities(request).items():
+        if kind in THROTTLE_RATES.get(scope, {}):
+            yield kind, identity, Rate.parse(THROTTLE_RATES[scope][kind])
+
+
+def check(scope, request, now=None):
+    """Count this request against ``scope``'s limits; seconds to wait if over one, else 0."""
+    now = time.time() if now is None else now
+    wait = 0
+    for kind, identity, rate in _limits(scope, request):
+        current_key, previous_key = _keys(scope, kind, identity, rate.window, now)
+        current = _bump(current_key, rate.window)
+        previous = cache.get(previous_key, 0)
+        wait = max(wait, _retry_after(rate, current, previous, now))
+    return wait
+
+
+async def acheck(scope, request, now=None):
+    now = time.time() if now is None else now
+    wait = 0
+    for kind, identity, rate in _limits(scope, request):
+        current_key, previous_key = _keys(scope, kind, identity, rate.window, now)
+        current = await _abump(current_key, rate.window)
+        previous = await cache.aget(previous_key, 0)
+        wait = max(wait, _retry_after(rate, current, previous, now))
+    return wait
+
+
+def throttled_response(scope, request, wait):
+    logger.warning('Throttled %s POST from %s (retry in %ss)', scope, client_ip(request), wait)
+    response = HttpResponse(THROTTLED_MESSAGE, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(wait)
+    return response
+
+
+def throttle(scope):
+    """Apply ``THROTTLE_RATES[scope]`` to POSTs to the decorated view (sync or async)."""
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if THROTTLE_ENABLED and request.method == 'POST':
+                    wait = await acheck(scope, request)
+                    if wait:
+                        return throttled_response(scope, request, wait)
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if THROTTLE_ENABLED and request.method == 'POST':
+                wait = check(scope, request)
+                if wait:
+                    return throttled_response(scope, request, wait)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,128 @@
+# ============================================
+# core/transitions.py
+# ============================================
+"""
+Bulk booking status changes for the admin.
+
+Each ``Transition`` names the statuses a booking may move from and the one
+it moves to (``pending -> confirmed``, ``confirmed -> paid`` ...); bookings
+in any other status are skipped rather than forced. ``apply()`` moves a
+whole selection in one transaction with a handful of statements however
+many bookings it holds:
+
+* the status is set with ``UPDATE ... WHERE id IN (...)``;
+* departure seats are released or claimed once per departure, and
+  ``TourStats`` adjusted once per tour (``stats.record_booking_changes``);
+* one ``BookingStatusChange`` row per booking goes in with ``bulk_create``;
+* customer notifications are queued in the outbox with a single
+  ``bulk_create`` (``mail.queue_mass_mail``), for the worker to send.
+"""
+from collections import Counter
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+
+from . import availability, stats
+from .mail import queue_mass_mail
+from .models import Booking, BookingStatusChange
+
+# Keeps each ``IN (...)`` list well under SQLite's bound-parameter limit
+UPDATE_BATCH_SIZE = 500
+
+
+@dataclass(frozen=True)
+class Transition:
+    name: str
+    sources: tuple
+    target: str
+    # Email to the customer; formatted with the booking's name, tour and date
+    subject: str = ''
+    message: str = ''
+
+
+TRANSITIONS = {
+    t.name: t for t in (
+        Transition(
+            'confirm', ('pending',), 'confirmed',
+            subject='Booking Confirmed: {tour}',
+            message='Hi {name},\n\nGood news: your booking for {tour} on {date} is confirmed.\n\n'
+                    'We will send payment details shortly.\n\nBest,\nM&M Africa Safaris',
+        ),
+        Transition(
+            'mark_paid', ('confirmed',), 'paid',
+            subject='Payment Received: {tour}',
+            message='Hi {name},\n\nThank you, we have received full payment for {tour} on {date}.\n\n'
+                    'See you soon!\n\nBest,\nM&M Africa Safaris',
+        ),
+        Transition('complete', ('paid',), 'completed'),
+        Transition(
+            'cancel', ('pending', 'confirmed', 'paid'), 'cancelled',
+            subject='Booking Cancelled: {tour}',
+            message='Hi {name},\n\nYour booking for {tour} on {date} has been cancelled.\n\n'
+                    'Reply to this email if you have any questions.\n\nBest,\nM&M Africa Safaris',
+        ),
+    )
+}
+
+
+@dataclass
+class TransitionResult:
+    moved: int = 0
+    skipped: int = 0
+
+
+def apply(name, queryset, user=None):
+    """
+    Move every booking in ``queryset`` that allows it through transition ``name``.
+
+    Returns a ``TransitionResult``; bookings already elsewhere in their
+    lifecycle (or already there) are counted as skipped.
+    """
+    transition = TRANSITIONS[name]
+    with transaction.atomic():
+        rows = list(
+            # of=self: the tour__name join must not lock Tour rows too
+            Booking.objects.select_for_update(of=('self',))
+            .filter(pk__in=queryset.values('pk'))
+            .values_list('pk', 'tour_id', 'preferred_date', 'number_of_people', 'status',
+                         'full_name', 'email', 'tour__name')
+        )
+        movable = [row for row in rows if row[4] in transition.sources]
+        ids = [row[0] for row in movable]
+        for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+            Booking.objects.filter(pk__in=ids[start:start + UPDATE_BATCH_SIZE]).update(status=transition.target)
+
+        _move_seats(movable, transition.target)
+        stats.record_booking_changes(
+            ((tour_id, status, pax, date), (tour_id, transition.target, pax, date))
+            for _, tour_id, date, pax, status, *_ in movable
+        )
+        BookingStatusChange.objects.bulk_create([
+            BookingStatusChange(booking_id=pk, from_status=status, to_status=transition.target, changed_by=user)
+            for pk, _, _, _, status, *_ in movable
+        ], batch_size=1000)
+        if transition.subject:
+            queue_mass_mail([
+                (
+                    transition.subject.format(tour=tour_name),
+                    transition.message.format(name=full_name, tour=tour_name, date=date),
+                    settings.DEFAULT_FROM_EMAIL,
+                    [email],
+                )
+                for _, _, date, _, _, full_name, email, tour_name in movable
+            ])
+    return TransitionResult(moved=len(movable), skipped=len(rows) - len(movable))
+
+
+def _move_seats(rows, target):
+    # Net seat change per departure, so each one is updated at most once
+    holds = target in Booking.SEAT_HOLDING_STATUSES
+    net = Counter()
+    for _, tour_id, date, pax, status, *_ in rows:
+        net[tour_id, date] += (holds - (status in Booking.SEAT_HOLDING_STATUSES)) * pax
+    for (tour_id, date), pax in net.items():
+        if pax > 0:
+            availability.claim_seats(tour_id, date, pax)
+        elif pax < 0:
+            availability.release_seats(tour_id, date, -pax)
@@ -0,0 +1,141 @@
+# ============================================
+# core/uploads.py
+# ============================================
+"""
+Browser-direct uploads of tour and gallery images to S3.
+
+The admin asks ``presign()`` for a presigned POST per file, the browser
+sends the files straight to the bucket (several at once), and the form
+then submits only the returned ``token``s. ``verify()`` checks that a
+token was issued by us for that kind of image, that the object landed with
+an allowed size and type (``HEAD``), and that its header is an image
+Pillow recognises (a ranged ``GET`` of the first ``SNIFF_BYTES``), before
+the key is stored on ``Tour.image`` / ``TourImage.image``. Form validation
+never downloads the whole file, and neither does the save: with S3 media
+derivatives are built by ``build_image_derivatives`` (a worker or cron), not
+on save, unless ``IMAGE_DERIVATIVES_ON_SAVE`` is set to 1.
+
+Only available when media is on S3 (``S3Boto3Storage``); with local
+storage the admin keeps its regular file inputs. The bucket needs a CORS
+rule allowing ``POST`` from the admin's origin.
+"""
+import posixpath
+import uuid
+from io import BytesIO
+
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.storage import default_storage
+from django.utils.text import get_valid_filename
+from PIL import Image, UnidentifiedImageError
+
+try:
+    from botocore.exceptions import ClientError
+    from storages.backends.s3 import S3Storage
+except ImportError:  # optional dependency
+    ClientError = S3Storage = None
+
+# kind: upload_to of the field the key ends up on
+UPLOAD_PREFIXES = {
+    'tour': 'tours/',
+    'gallery': 'tours/gallery/',
+}
+CONTENT_TYPES = {'image/jpeg', 'image/png', 'image/webp', 'image/gif'}
+FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP', 'GIF'}  # Pillow's names for the above (MPO: multi-frame camera JPEGs)
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+PRESIGN_EXPIRES = 15 * 60  # seconds the browser has to start the upload
+TOKEN_MAX_AGE = 6 * 60 * 60  # seconds the admin form may stay open afterwards
+SNIFF_BYTES = 64 * 1024  # enough for any image header (JPEG EXIF segments max out at 64 KB)
+SIGNING_SALT = 'core.uploads'
+
+
+def direct_uploads_enabled():
+    return S3Storage is not None and isinstance(default_storage, S3Storage)
+
+
+def _object_key(name):
+    location = default_storage.location
+    return posixpath.join(location, name) if location else name
+
+
+def presign(kind, filename, content_type):
+    """
+    Presigned POST for one file: ``{'url', 'fields', 'token'}``.
+
+    The browser posts ``fields`` plus the file (last) to ``url`` and hands
+    ``token`` back with the admin form.
+    """
+    if kind not in UPLOAD_PREFIXES:
+        raise ValidationError(f'Unknown upload kind {kind!r}.')
+    if content_type not in CONTENT_TYPES:
+        raise ValidationError(f'{filename}: only JPEG, PNG, WebP or GIF images can be uploaded.')
+    try:
+        stem, ext = posixpath.splitext(get_valid_filename(posixpath.basename(filename)))
+    except SuspiciousFileOperation:
+        raise ValidationError(f'Invalid file name {filename!r}.')
+    # Unique, and short enough for the ImageField's max_length of 100
+    name = f'{UPLOAD_PREFIXES[kind]}{uuid.uuid4().hex[:12]}-{stem[:50]}{ext[:8]}'
+    client = default_storage.connection.meta.client
+    post = client.generate_presigned_post(
+        Bucket=default_storage.bucket_name,
+        Key=_object_key(name),
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, MAX_UPLOAD_BYTES],
+        ],
+        ExpiresIn=PRESIGN_EXPIRES,
+    )
+    token = signing.dumps({'kind': kind, 'name': name}, salt=SIGNING_SALT)
+    return {'url': post['url'], 'fields': post['fields'], 'token': token}
+
+
+def _head(name):
+    try:
+        return default_storage.connection.meta.client.head_object(
+            Bucket=default_storage.bucket_name, Key=_object_key(name),
+        )
+    except ClientError:
+        return None
+
+
+def _sniff_format(name):
+    """Pillow's format name from the first ``SNIFF_BYTES`` of the object, or None."""
+    response = default_storage.connection.meta.client.get_object(
+        Bucket=default_storage.bucket_name, Key=_object_key(name), Range=f'bytes=0-{SNIFF_BYTES - 1}',
+    )
+    # Image.open only parses the header; pixels are decoded by the derivative job
+    try:
+        with Image.open(BytesIO(response['Body'].read())) as image:
+            return image.format
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        return None
+
+
+def _reject(name, message):
+    default_storage.delete(name)
+    raise ValidationError(message)
+
+
+def verify(token, kind):
+    """
+    Storage name for an uploaded ``token``; raises ValidationError if it doesn't check out.
+
+    Costs a HEAD and a ranged GET of the first few KB, never a full download.
+    """
+    try:
+        data = signing.loads(token, salt=SIGNING_SALT, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        raise ValidationError('The upload expired or was tampered with; please upload the file again.')
+    if data.get('kind') != kind:
+        raise ValidationError('That upload belongs to a different image field.')
+    name = data['name']
+    label = posixpath.basename(name)
+    head = _head(name)
+    if head is None:
+        raise ValidationError(f'{label} never reached storage; please upload it again.')
+    if head['ContentLength'] > MAX_UPLOAD_BYTES:
+        _reject(name, f'{label} is larger than {MAX_UPLOAD_BYTES // 2**20} MB.')
+    if head.get('ContentType') not in CONTENT_TYPES or _sniff_format(name) not in FORMATS:
+        _reject(name, f'{label} is not a valid image.')
+    return name
@@ -1,14 +1,35 @@
 # ============================================
 # core/urls.py
 # ============================================
+from django.conf import settings
 from django.urls import path
-from . import views
-
-urlpatterns = [
-    path('', views.home, name='home'),
-    path('tours/', views.tours, name='tours'),
-    path('tours/<slug:slug>/', views.tour_detail, name='tour_detail'),
-    path('tours/<slug:slug>/book/', views.booking, name='booking'),
-    path('about/', views.about, name='about'),
-    path('contact/', views.contact, name='contact'),
+from . import api, async_views, health, instrumentation, sitemaps, views
+
+
+def page_patterns(pages):
+    """Public pages served by ``pages`` (``core.views`` or ``core.async_views``)."""
+    return [
+        path('', pages.home, name='home'),
+        path('tours/', pages.tours, name='tours'),
+        path('tours/<slug:slug>/', pages.tour_detail, name='tour_detail'),
+        path('tours/<slug:slug>/book/', pages.booking, name='booking'),
+        path('about/', views.about, name='about'),
+        path('contact/', pages.contact, name='contact'),
+        # "Load more" fragment; outside tours/ so every slug reaches its detail page
+        path('fragments/tours/', pages.tours_page, name='tours_page'),
+    ]
+
+
+urlpatterns = page_patterns(async_views if settings.ASYNC_VIEWS else views) + [
+    # Read-only JSON API
+    path('api/v1/tours/', api.tour_list, name='api_tour_list'),
+    path('api/v1/tours/<slug:slug>/', api.tour_detail, name='api_tour_detail'),
+
+    # For crawlers; lastmod from Tour.updated_at
+    path('sitemap.xml', sitemaps.sitemap, name='sitemap'),
+
+    # Prometheus scrape target (see REQUEST_METRICS_* settings)
+    path('metrics', instrumentation.metrics, name='metrics'),
+    # Load balancer / uptime health check (databases and cache)
+    path('healthz', health.healthz, name='healthz'),
 ]
@@ -1,138 +1,181 @@
 # ============================================
 # core/views.py
 # ============================================
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.conf import settings
-from django.db.models import Q
+from django.db import transaction
+from . import facets, selectors
+from .cache import cache_catalogue_page, tag_response
+from .throttling import throttle
+from .availability import DepartureFull
+from .mail import queue_mail
+from .pagination import InvalidCursor, KeysetPaginator
 from .models import Tour, Booking, ContactMessage
 from .forms import BookingForm, ContactForm
 
+TOURS_PER_PAGE = 12
+BOOKING_SUCCESS_MESSAGE = 'Your booking request has been submitted! Check your email for confirmation.'
+CONTACT_SUCCESS_MESSAGE = 'Thank you for contacting us! We will get back to you soon.'
 
+
+@cache_catalogue_page
 def home(request):
-    featured_tours = Tour.objects.filter(featured=True)[:3]
+    featured_tours = selectors.featured_tours()
     context = {'featured_tours': featured_tours}
     return render(request, 'core/home.html', context)
 
 
+def _tours_page(request):
+    found = selectors.catalogue_search(request.GET)
+    paginator = KeysetPaginator(found.tours, found.ordering, per_page=TOURS_PER_PAGE)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404('Invalid page cursor')
+    return found, page
+
+
+def _next_page_url(request, viewname, page):
+    if not page.has_next:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = page.next_cursor
+    return f"{reverse(viewname)}?{params.urlencode()}"
+
+
+@cache_catalogue_page
 def tours(request):
-    # Start with all tours
-    tours_list = Tour.objects.all()
-
-    # 1. Search (Name or Description)
-    query = request.GET.get('q')
-    if query:
-        tours_list = tours_list.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query)
-        )
-
-    # 2. Filter by Difficulty
-    difficulty = request.GET.get('difficulty')
-    if difficulty:
-        tours_list = tours_list.filter(difficulty=difficulty)
-
-    # 3. Filter by Price (Max Price)
-    max_price = request.GET.get('max_price')
-    if max_price:
-        try:
-            tours_list = tours_list.filter(price__lte=max_price)
-        except ValueError:
-            pass  # Ignore invalid price inputs
+    found, page = _tours_page(request)
+    # One aggregate query for every facet count and the total
+    counts = facets.facet_counts(found)
 
     context = {
-        'tours': tours_list,
-        # Pass current filters back to template to keep fields populated
-        'current_difficulty': difficulty,
-        'current_price': max_price,
-        'current_query': query
+        'tours': page,
+        'total_count': counts['total'],
+        'facets': facets.facet_groups(request.GET, counts),
+        'next_page_url': _next_page_url(request, 'tours', page),
+        'next_fragment_url': _next_page_url(request, 'tours_page', page),
+        **_current_filters(request),
     }
     return render(request, 'core/tours.html', context)
 
 
+def _current_filters(request):
+    # Pass current filters back to template to keep fields populated
+    return {
+        'current_difficulty': request.GET.get('difficulty'),
+        'current_min_price': request.GET.get('min_price'),
+        'current_price': request.GET.get('max_price'),
+        'current_min_days': request.GET.get('min_days'),
+        'current_max_days': request.GET.get('max_days'),
+        'current_group_size': request.GET.get('group_size'),
+        'current_query': request.GET.get('q'),
+        'current_sort': request.GET.get('sort', ''),
+    }
+
+
+@cache_catalogue_page
+def tours_page(request):
+    """Next batch of tour cards as an HTML fragment, for infinite scroll."""
+    _, page = _tours_page(request)
+    context = {
+        'tours': page,
+        'next_page_url': _next_page_url(request, 'tours', page),
+        'next_fragment_url': _next_page_url(request, 'tours_page', page),
+    }
+    return render(request, 'core/partials/tour_cards.html', context)
+
+
+@cache_catalogue_page
 def tour_detail(request, slug):
-    tour = get_object_or_404(Tour, slug=slug)
-    # The template can now access tour.gallery_images.all and tour.itinerary.all
+    # Itinerary and gallery come prefetched (tour.itinerary.all / tour.gallery_images.all)
+    tour = selectors.tour_with_content(slug)
     context = {'tour': tour}
-    return render(request, 'core/tour_detail.html', context)
+    response = render(request, 'core/tour_detail.html', context)
+    return tag_response(response, f'tour-{tour.pk}', last_modified=tour.updated_at)
+
+
+def save_booking(form, tour):
+    """
+    Save a valid BookingForm for ``tour`` and queue its two emails.
+
+    Queued in the same transaction as the booking; the send_queued_mail
+    worker delivers them, so the request never waits on SMTP. Raises
+    ``DepartureFull`` if the seats went in the meantime.
+    """
+    booking = form.save(commit=False)
+    booking.tour = tour
+
+    # --- Email Notification Logic ---
+    with transaction.atomic():
+        booking.save(check_capacity=True)
 
+        # 1. Send Receipt to Customer
+        subject_user = f"Booking Received: {tour.name}"
+        message_user = f"Hi {booking.full_name},\n\nWe have received your booking request for {tour.name} on {booking.preferred_date}.\n\nWe will review availability and get back to you shortly with a quote and payment details.\n\nBest,\nM&M Africa Safaris"
+        queue_mail(subject_user, message_user, [booking.email])
 
+        # 2. Notify Admin
+        subject_admin = f"New Booking Request: {booking.full_name}"
+        message_admin = f"New booking for {tour.name}.\nDate: {booking.preferred_date}\nPax: {booking.number_of_people}\nEmail: {booking.email}\nPhone: {booking.phone}"
+        admin_email = getattr(settings, 'ADMIN_EMAIL', 'info@mmsafaris.com')
+        queue_mail(subject_admin, message_admin, [admin_email])
+    # --------------------------------
+    return booking
+
+
+@throttle('booking')
 def booking(request, slug):
     tour = get_object_or_404(Tour, slug=slug)
 
     if request.method == 'POST':
-        form = BookingForm(request.POST)
+        form = BookingForm(request.POST, tour=tour)
         if form.is_valid():
-            booking = form.save(commit=False)
-            booking.tour = tour
-            booking.save()
-
-            # --- Email Notification Logic ---
-            # 1. Send Receipt to Customer
-            subject_user = f"Booking Received: {tour.name}"
-            message_user = f"Hi {booking.full_name},\n\nWe have received your booking request for {tour.name} on {booking.preferred_date}.\n\nWe will review availability and get back to you shortly with a quote and payment details.\n\nBest,\nM&M Africa Safaris"
-
-            send_mail(
-                subject_user,
-                message_user,
-                settings.DEFAULT_FROM_EMAIL,
-                [booking.email],
-                fail_silently=True,
-            )
-
-            # 2. Notify Admin
-            subject_admin = f"New Booking Request: {booking.full_name}"
-            message_admin = f"New booking for {tour.name}.\nDate: {booking.preferred_date}\nPax: {booking.number_of_people}\nEmail: {booking.email}\nPhone: {booking.phone}"
-
-            # Assuming you have an ADMINS list or a specific receiver email
-            admin_email = getattr(settings, 'ADMIN_EMAIL', 'info@mmsafaris.com')
-
-            send_mail(
-                subject_admin,
-                message_admin,
-                settings.DEFAULT_FROM_EMAIL,
-                [admin_email],
-                fail_silently=True,
-            )
-            # --------------------------------
-
-            messages.success(request, 'Your booking request has been submitted! Check your email for confirmation.')
-            return redirect('tour_detail', slug=tour.slug)
+            try:
+                save_booking(form, tour)
+            except DepartureFull as full:
+                form.add_error(None, form.full_departure_message(full.seats_left))
+            else:
+                messages.success(request, BOOKING_SUCCESS_MESSAGE)
+                return redirect('tour_detail', slug=tour.slug)
     else:
-        form = BookingForm()
+        form = BookingForm(tour=tour)
 
     context = {'form': form, 'tour': tour}
     return render(request, 'core/booking.html', context)
 
 
+@cache_catalogue_page
 def about(request):
     return render(request, 'core/about.html')
 
 
+def save_contact_message(form):
+    """Save a valid ContactForm and queue the admin notification."""
+    with transaction.atomic():
+        contact_msg = form.save()
+
+        # Notify Admin (delivered by the send_queued_mail worker)
+        subject = f"New Contact Message from {contact_msg.name}"
+        message = f"Subject: {contact_msg.subject}\n\nMessage:\n{contact_msg.message}\n\nFrom: {contact_msg.email}"
+        admin_email = getattr(settings, 'ADMIN_EMAIL', 'info@mmsafaris.com')
+        queue_mail(subject, message, [admin_email])
+    return contact_msg
+
+
+@throttle('contact')
 def contact(request):
     if request.method == 'POST':
         form = ContactForm(request.POST)
         if form.is_valid():
-            contact_msg = form.save()
-
-            # Notify Admin
-            subject = f"New Contact Message from {contact_msg.name}"
-            message = f"Subject: {contact_msg.subject}\n\nMessage:\n{contact_msg.message}\n\nFrom: {contact_msg.email}"
-            admin_email = getattr(settings, 'ADMIN_EMAIL', 'info@mmsafaris.com')
-
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [admin_email],
-                fail_silently=True,
-            )
-
-            messages.success(request, 'Thank you for contacting us! We will get back to you soon.')
+            save_contact_message(form)
+            messages.success(request, CONTACT_SUCCESS_MESSAGE)
             return redirect('contact')
     else:
         form = ContactForm()
 
     context = {'form': form}
-    return render(request, 'core/contact.html', context)
\ No newline at end of file
+    return render(request, 'core/contact.html', context)
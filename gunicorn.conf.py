@@ -0,0 +1,41 @@
+"""
+Gunicorn settings, picked up automatically when gunicorn starts in this directory.
+
+Sync (WSGI) workers -- the default:
+    gunicorn
+
+ASGI with uvicorn workers and the async views (core/async_views.py). Each
+worker runs an event loop, so a request waiting on the database, cache or
+mail no longer blocks the whole worker:
+    ASYNC_VIEWS=1 gunicorn
+
+Or plain uvicorn, e.g. locally:
+    ASYNC_VIEWS=1 uvicorn mmsafaris.asgi:application --workers 4 --lifespan off
+
+Under ASGI Django closes database connections after every request
+(CONN_MAX_AGE is 0 when ASYNC_VIEWS is on); put PgBouncer in front of
+PostgreSQL so new connections are cheap.
+
+Environment: PORT, WEB_CONCURRENCY (workers), GUNICORN_THREADS (sync
+workers only), GUNICORN_TIMEOUT.
+"""
+import multiprocessing
+import os
+
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '') == '1'
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+# Recycle workers now and then so slow leaks can't accumulate.
+max_requests = 2000
+max_requests_jitter = 200
+accesslog = '-'
+
+if ASYNC_VIEWS:
+    wsgi_app = 'mmsafaris.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'mmsafaris.wsgi:application'
+    threads = int(os.environ.get('GUNICORN_THREADS', 1))
@@ -2,6 +2,8 @@
 ASGI config for mmsafaris project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Set ASYNC_VIEWS=1 to serve the public pages from core.async_views; see
+gunicorn.conf.py for running it with uvicorn workers.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -35,6 +35,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.humanize',
+    'django.contrib.sitemaps',
     # Third party
     'core',
     'crispy_forms',
@@ -43,8 +45,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',  # no-op unless REQUEST_METRICS_ENABLED
+    'core.middleware.ReplicaRoutingMiddleware',  # catalogue reads -> replica (core.routers)
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise here
+    'django.middleware.http.ConditionalGetMiddleware',  # 304s from ETag / Last-Modified
+    'core.middleware.StaticFilesMiddleware',  # WhiteNoise, usable from async views too
+    'core.middleware.PrerenderedPagesMiddleware',  # prerender_pages snapshots for anonymous GETs
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,6 +78,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'mmsafaris.wsgi.application'
+ASGI_APPLICATION = 'mmsafaris.asgi.application'
+
+# Route the catalogue and form pages to core.async_views. Only worth it under
+# an ASGI server (gunicorn with uvicorn workers, see gunicorn.conf.py).
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '') == '1'
 
 
 # ==============================================
@@ -80,12 +91,163 @@ WSGI_APPLICATION = 'mmsafaris.wsgi.application'
 # Automatically switches:
 # Local -> SQLite
 # Render -> PostgreSQL
+#
+# DATABASE_REPLICA_URL adds a read replica: catalogue reads in GET requests
+# go there (core.routers), writes and everything else stay on the primary.
+# Locally a second SQLite file stands in, refreshed with
+# `python manage.py sync_replica`; without it a "replica" alias on the same
+# file keeps the routing exercised.
+#
+# DATABASE_POOLER=pgbouncer when connecting through PgBouncer in transaction
+# mode: server-side cursors are disabled and connections are still reused
+# (CONN_MAX_AGE) so each worker holds one cheap pooler connection.
+
+DATABASE_POOLER = os.environ.get('DATABASE_POOLER', '')
+# Under ASGI every request gets its own thread, so persistent connections
+# would pile up; use a pooler (PgBouncer) instead.
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 0 if ASYNC_VIEWS else 600))
+
+
+def database_config(url):
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        # Ping reused connections before a request uses them, so a restarted
+        # database or pooler doesn't surface as one failed request per worker.
+        conn_health_checks=DATABASE_CONN_MAX_AGE > 0,
+    )
+    if DATABASE_POOLER == 'pgbouncer':
+        config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return config
+
 
 DATABASES = {
-    'default': dj_database_url.config(
-        default='sqlite:///' + str(BASE_DIR / 'db.sqlite3'),
-        conn_max_age=600
-    )
+    'default': database_config(
+        os.environ.get('DATABASE_URL') or 'sqlite:///' + str(BASE_DIR / 'db.sqlite3')
+    ),
+}
+if os.environ.get('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = database_config(os.environ['DATABASE_REPLICA_URL'])
+elif DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['replica'] = dict(DATABASES['default'])
+if 'replica' in DATABASES:
+    # Tests read back what they write, so the replica mirrors the test database.
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Seconds a visitor keeps reading from the primary after a POST, so they see
+# their own writes while the replica catches up.
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 15))
+
+
+# ==============================================
+# CACHE
+# ==============================================
+# REDIS_URL set -> Redis (needs the `redis` package)
+# CACHE_DIR set -> file-based cache shared by all workers on the host
+# otherwise     -> per-process local memory
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif os.environ.get('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'mmsafaris',
+        }
+    }
+
+# Sessions only exist for staff using the admin. Visitors' flash messages
+# ("booking received") travel in a signed cookie, so an anonymous form
+# submit never creates a django_session row.
+# SESSION_BACKEND: 'cached_db' (reads from the cache above, rows kept so a
+# cache flush doesn't log staff out) or 'signed_cookies' (no table at all,
+# but logging out can't revoke a copied cookie).
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get('SESSION_BACKEND', 'cached_db')
+SESSION_COOKIE_AGE = int(os.environ.get('SESSION_COOKIE_AGE', 14 * 24 * 60 * 60))
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Seconds a rendered catalogue page is kept (it is invalidated on any tour change anyway)
+CATALOGUE_CACHE_TIMEOUT = int(os.environ.get('CATALOGUE_CACHE_TIMEOUT', 600))
+
+# Cache-Control max-age for the JSON API; clients revalidate with ETags after that
+API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', 60))
+
+# s-maxage for shared catalogue pages, so a CDN in front can absorb crawler traffic
+# (responses carry Surrogate-Key headers for purging by tour)
+EDGE_CACHE_TIMEOUT = int(os.environ.get('EDGE_CACHE_TIMEOUT', 300))
+
+# Where `manage.py prerender_pages` writes static snapshots of the catalogue pages
+PRERENDER_DIR = Path(os.environ.get('PRERENDER_DIR', BASE_DIR / 'prerendered'))
+
+# POST rate limits per client IP and per submitted email (core.throttling).
+# Counters live in the cache above, so use Redis when running several processes.
+THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', '1') == '1'
+# Reverse proxies in front of the app that append to X-Forwarded-For. Behind
+# them REMOTE_ADDR is the proxy, so every visitor would share one IP limit.
+# Render's load balancer is one hop; 0 uses REMOTE_ADDR (local, direct).
+THROTTLE_PROXY_HOPS = int(os.environ.get('THROTTLE_PROXY_HOPS', 1 if 'RENDER' in os.environ else 0))
+THROTTLE_RATES = {
+    'booking': {
+        'ip': os.environ.get('THROTTLE_BOOKING_IP_RATE', '10/h'),
+        'email': os.environ.get('THROTTLE_BOOKING_EMAIL_RATE', '5/h'),
+    },
+    'contact': {
+        'ip': os.environ.get('THROTTLE_CONTACT_IP_RATE', '5/h'),
+        'email': os.environ.get('THROTTLE_CONTACT_EMAIL_RATE', '3/h'),
+    },
+}
+
+
+# ==============================================
+# REQUEST METRICS & PROFILING
+# ==============================================
+# When enabled every response carries a Server-Timing header, each request
+# logs one JSON line to `core.requests` and /metrics serves Prometheus text
+# (a 404 otherwise).
+
+REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', '') == '1'
+# /metrics answers only staff sessions and `Authorization: Bearer <METRICS_TOKEN>`
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# /healthz names failing checks to anyone; the error details only go to staff
+# sessions and `Authorization: Bearer <HEALTH_TOKEN>`
+HEALTH_TOKEN = os.environ.get('HEALTH_TOKEN', '')
+
+# Profile this share of requests (0.0 - 1.0); profiles of requests slower than
+# REQUEST_PROFILE_SLOW_MS are written to REQUEST_PROFILE_DIR (pyinstrument HTML
+# if installed, otherwise cProfile .prof files for snakeviz/pstats).
+REQUEST_PROFILE_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILE_SAMPLE_RATE', 0))
+REQUEST_PROFILE_SLOW_MS = int(os.environ.get('REQUEST_PROFILE_SLOW_MS', 500))
+REQUEST_PROFILE_DIR = os.environ.get('REQUEST_PROFILE_DIR', str(BASE_DIR / 'profiles'))
+
+if REQUEST_METRICS_ENABLED:
+    TEMPLATES[0]['BACKEND'] = 'core.instrumentation.InstrumentedDjangoTemplates'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_line': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'requests': {'class': 'logging.StreamHandler', 'formatter': 'json_line'},
+    },
+    'loggers': {
+        'core.requests': {'handlers': ['requests'], 'level': 'INFO', 'propagate': False},
+    },
 }
 
 
@@ -140,6 +302,21 @@ else:
     # Local fallback
     MEDIA_URL = '/media/'
     MEDIA_ROOT = BASE_DIR / 'media'
+    # Who sends /media/ files (core/media.py): 'django' (FileResponse, sendfile
+    # under gunicorn), 'x-accel' (nginx, via an internal MEDIA_ACCEL_PREFIX
+    # location aliased to MEDIA_ROOT) or 'x-sendfile' (Apache / lighttpd)
+    MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'django')
+    MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+    MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 3600))
+
+# 3. Responsive image derivatives (WebP + JPEG) generated when a tour image is saved.
+# Backfill existing uploads with: python manage.py build_image_derivatives
+# IMAGE_DERIVATIVES_ON_SAVE: '1' builds them in the request that saved the
+# image, '0' leaves all decoding to that command (run from a worker/cron).
+# Unset (None): on, except with S3 media, where the admin uploads straight to
+# the bucket and the request must not download and decode the originals.
+IMAGE_DERIVATIVES_ON_SAVE = {'1': True, '0': False}.get(os.environ.get('IMAGE_DERIVATIVES_ON_SAVE'))
+IMAGE_DERIVATIVE_WIDTHS = (480, 960, 1600)
 
 
 # ==============================================
@@ -162,4 +339,16 @@ DEFAULT_FROM_EMAIL = 'noreply@mmsafaris.com'
 # EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 
 # Email Backend (Console for now, change to SMTP for real emails)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Outbound mail is queued in the database and delivered by a separate worker:
+#   python manage.py send_queued_mail --loop
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE_SECONDS = 60  # doubles after each failed attempt
+# Async views also start delivery in the background right after a submission
+OUTBOX_DELIVER_ON_SUBMIT = os.environ.get('OUTBOX_DELIVER_ON_SUBMIT', '') == '1'
+
+# Completed/cancelled bookings and contact messages older than this many days
+# are moved to the archive tables by: python manage.py archive_old_records
+ARCHIVE_BOOKINGS_AFTER_DAYS = int(os.environ.get('ARCHIVE_BOOKINGS_AFTER_DAYS', 365))
+ARCHIVE_MESSAGES_AFTER_DAYS = int(os.environ.get('ARCHIVE_MESSAGES_AFTER_DAYS', 365))
@@ -0,0 +1,86 @@
+// Tour admin: upload images straight to S3 with presigned POSTs (core/uploads.py).
+// The server hands out one presigned POST per file; files are sent in parallel
+// and only the returned tokens are submitted with the tour form.
+(function() {
+    const panel = document.getElementById('direct-upload');
+    if (!panel) return;
+
+    const form = panel.closest('form');
+    const status = panel.querySelector('.direct-upload-status');
+    const submitButtons = form.querySelectorAll('input[type="submit"], button[type="submit"]');
+    const PARALLEL_UPLOADS = 4;
+    let pending = 0;
+
+    function csrfToken() {
+        return form.querySelector('input[name="csrfmiddlewaretoken"]').value;
+    }
+
+    function setBusy(delta) {
+        pending += delta;
+        submitButtons.forEach(function(button) { button.disabled = pending > 0; });
+    }
+
+    function report(file) {
+        const item = document.createElement('li');
+        item.textContent = file.name + ': uploading...';
+        status.appendChild(item);
+        return item;
+    }
+
+    async function sign(kind, files) {
+        const response = await fetch(panel.dataset.signUrl, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken()},
+            body: JSON.stringify({kind: kind, files: files.map(function(f) { return {name: f.name, type: f.type}; })}),
+        });
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || response.statusText);
+        return data.uploads;
+    }
+
+    async function upload(file, signed, item) {
+        const body = new FormData();
+        Object.entries(signed.fields).forEach(function([name, value]) { body.append(name, value); });
+        body.append('file', file);  // must come after the policy fields
+        const response = await fetch(signed.url, {method: 'POST', body: body});
+        if (!response.ok) throw new Error('storage answered ' + response.status);
+        item.textContent = file.name + ': uploaded';
+        return signed.token;
+    }
+
+    async function uploadAll(input) {
+        const files = Array.from(input.files);
+        const target = document.getElementById(input.dataset.target);
+        if (!files.length || !target) return;
+        setBusy(1);
+        try {
+            const signed = await sign(input.dataset.kind, files);
+            const items = files.map(report);
+            const tokens = [];
+            // A few uploads at a time: parallel, without saturating the uplink
+            for (let start = 0; start < files.length; start += PARALLEL_UPLOADS) {
+                const batch = files.slice(start, start + PARALLEL_UPLOADS).map(function(file, i) {
+                    const index = start + i;
+                    return upload(file, signed[index], items[index]).catch(function(error) {
+                        items[index].textContent = file.name + ': failed (' + error.message + ')';
+                        return null;
+                    });
+                });
+                tokens.push.apply(tokens, await Promise.all(batch));
+            }
+            const done = tokens.filter(Boolean);
+            target.value = input.multiple ? [target.value].concat(done).join(' ').trim() : (done[0] || target.value);
+        } catch (error) {
+            const item = document.createElement('li');
+            item.textContent = 'Upload failed: ' + error.message;
+            status.appendChild(item);
+        } finally {
+            input.value = '';
+            setBusy(-1);
+        }
+    }
+
+    panel.querySelectorAll('input[type="file"]').forEach(function(input) {
+        input.addEventListener('change', function() { uploadAll(input); });
+    });
+})();